@@ -9,6 +9,9 @@ from ._resources import resources, Resources
 from ._httpclient._storage import StorageFile, DeletedFile, CloudMachineStorage
 from ._httpclient._servicebus import CloudMachineServiceBus, Message, LockedMessage
 from ._httpclient._documents import CloudMachineDocumentIndex, Document
+from ._httpclient._metrics import metrics, MetricsRegistry, OpenTelemetryMetricsExporter
+from ._httpclient._transport import build_transport, build_async_transport
+from ._httpclient._embedding_cache import SqliteEmbeddingCache, TableEmbeddingCache
 
 __all__ = [
     'resources',
@@ -23,5 +26,12 @@ __all__ = [
     'Message',
     'LockedMessage',
     'CloudMachineDocumentIndex',
-    'Document'
+    'Document',
+    'metrics',
+    'MetricsRegistry',
+    'OpenTelemetryMetricsExporter',
+    'build_transport',
+    'build_async_transport',
+    'SqliteEmbeddingCache',
+    'TableEmbeddingCache',
 ]
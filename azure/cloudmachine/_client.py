@@ -5,11 +5,21 @@
 # --------------------------------------------------------------------------
 
 import os
+import re
+import csv
+import copy
+import json
+import uuid
+import functools
+from contextlib import contextmanager
 from enum import Enum
+from urllib.parse import quote
+from dataclasses import dataclass, field
 from typing import (
     Any,
     Dict,
     Generator,
+    List,
     NamedTuple,
     Literal,
     Mapping,
@@ -19,13 +29,17 @@ from typing import (
     Callable,
     Union,
     Generic,
+    IO,
+    Iterable,
+    Iterator,
     Tuple,
     overload,
     TypeVar,
     TYPE_CHECKING
 )
-from threading import Thread
-from concurrent.futures import Executor, ThreadPoolExecutor
+from threading import Event, Lock, Thread
+from queue import Full, Queue
+from concurrent.futures import Executor, Future, ThreadPoolExecutor, wait
 
 from dotenv import load_dotenv, dotenv_values
 
@@ -34,28 +48,46 @@ from azure.core.credentials import (
     AzureSasCredential,
     SupportsTokenInfo,
 )
+from azure.core import MatchConditions
+from azure.core.exceptions import (
+    HttpResponseError,
+    ResourceExistsError,
+    ResourceModifiedError,
+    ResourceNotFoundError,
+)
+from azure.core.pipeline.policies import SansIOHTTPPolicy
 from azure.core.pipeline.transport import HttpTransport
-from azure.data.tables import TableServiceClient, TableClient
 
 from ._resources._resources import resources as global_resources
+from ._resources._resource_map import DEFAULT_API_VERSIONS
 from ._resources._client_types import ClientType, WithSettings, SyncClientWithSettings
 from ._resources._client_settings import (
     ClientSettings,
     TransportInputTypes,
     CredentialInputTypes
 )
-from .provisioning import CloudMachineDeployment
-from .provisioning._deployment import azd_env_name, CloudMachineDeployment
 from ._httpclient._eventlistener import EventListener
 from ._httpclient import TransportWrapper
+from ._httpclient._transport import build_transport
+from ._httpclient._utils import LRUCache
 from ._httpclient._servicebus import CloudMachineServiceBus
 from ._httpclient._config import CloudMachinePipelineConfig
-from ._httpclient._storage import CloudMachineStorage
-from ._httpclient._base import CloudMachineClientlet
+from ._httpclient._storage import CloudMachineStorage, StorageHeadersPolicy
+from ._httpclient._base import CloudMachineClientlet, fan_out_executor, mark_worker_thread, run_as_worker
 from ._httpclient._documents import CloudMachineDocumentIndex
+from ._httpclient._embedding_cache import TableEmbeddingCache
+from ._httpclient._tables import (
+    CloudMachineTable,
+    TableSharedKeyPolicy,
+    build_create_table_request,
+    serialize_entity,
+    deserialize_entity,
+)
 
 if TYPE_CHECKING:
     from ._resources._client_types import *
+    from .provisioning import CloudMachineDeployment
+    from ._local import LocalBlobStorage, LocalServiceBus, LocalTable
 
 class _CMDefault(str, Enum):
     token = "0"
@@ -63,6 +95,23 @@ class _CMDefault(str, Enum):
 
 CloudmachineDefault = _CMDefault.token
 
+_MAX_BATCH_OPERATIONS = 100
+_MAX_BATCH_SIZE = 4 * 1024 * 1024
+_BATCH_OPERATION_OVERHEAD = 1024  # Multipart changeset headers per operation.
+_MAX_FILTER_COMPARISONS = 15
+_ROLLUP_TABLE = "cloudmachinerollups"
+_ROLLUP_RETRIES = 10
+_INDEX_TABLE = "cloudmachineindexes"
+_INDEX_BUILT = "built"
+_EXPORT_CHUNK_SIZE = 1000
+_EXPORT_QUEUE_SIZE = 16  # Chunks buffered between the scanning threads and the writer.
+_EXPORT_BOUNDARIES = list("123456789abcdef")
+_IMPORT_CHUNK_SIZE = 5000
+_FORMAT_SUFFIXES = {'.jsonl': 'jsonl', '.ndjson': 'jsonl', '.json': 'jsonl', '.csv': 'csv', '.parquet': 'parquet'}
+ExportFormat = Literal['jsonl', 'csv', 'parquet']
+_INDEX_FILTER = re.compile(r"^\s*(\w+)\s+eq\s+(?:@(\w+)|'((?:[^']|'')*)')\s*$")
+TableOperation = Tuple[Any, ...]
+
 
 class DataModel(Protocol):
     def __init__(self, **kwargs) -> None:
@@ -74,7 +123,268 @@ class DataModel(Protocol):
     
     def model_dump(self, *, by_alias: bool = False, **kwargs) -> Dict[str, Any]:
         ...
-    
+
+
+class TableBatchError(HttpResponseError):
+    succeeded: List[Mapping[str, Any]]
+    failed: List[Tuple[Mapping[str, Any], HttpResponseError]]
+
+    def __init__(
+            self,
+            *args,
+            succeeded: List[Mapping[str, Any]],
+            failed: List[Tuple[Mapping[str, Any], HttpResponseError]],
+            **kwargs):
+        self.succeeded = succeeded
+        self.failed = failed
+        super().__init__(*args, **kwargs)
+
+
+@dataclass
+class Aggregate:
+    count: int = 0
+    sum: Dict[str, float] = field(default_factory=dict)
+
+    def mean(self, name: str) -> float:
+        return self.sum.get(name, 0) / self.count if self.count else 0.0
+
+
+class _Rollup(NamedTuple):
+    table: str
+    group_by: str
+    fields: List[str]
+
+    @property
+    def partition(self) -> str:
+        return f"{self.table}:{self.group_by}"
+
+
+class _ModelCodec(NamedTuple):
+    model: Type['DataModel']
+    columns: List[str]
+    fields: Dict[str, str]
+    # Whether model_dump would return the field values unchanged.
+    plain: bool
+
+    def construct(self, entity: Mapping[str, Any]) -> 'DataModel':
+        # Skips validation, so the entity values are trusted to match the field types.
+        return self.model.model_construct(**{f: entity[c] for c, f in self.fields.items() if c in entity})
+
+    def dump(self, instance: 'DataModel') -> Dict[str, Any]:
+        if not self.plain:
+            return instance.model_dump(by_alias=True)
+        return {c: getattr(instance, f) for c, f in self.fields.items()}
+
+
+@functools.lru_cache(maxsize=None)
+def _model_codec(model: Type['DataModel']) -> _ModelCodec:
+    # Table entities are flat, so a model maps one field to one column.
+    fields = {
+        f.serialization_alias or f.alias or n: n for n, f in model.model_fields.items()
+    }
+    decorators = getattr(model, '__pydantic_decorators__', None)
+    plain = not (
+        decorators is None or
+        decorators.field_serializers or
+        decorators.model_serializers or
+        decorators.computed_fields or
+        any(f.exclude for f in model.model_fields.values())
+    )
+    return _ModelCodec(model=model, columns=list(fields), fields=fields, plain=plain)
+
+
+def _column(table: Union[str, Type['DataModel']], name: str) -> str:
+    try:
+        model_field = table.model_fields[name]
+        return model_field.serialization_alias or model_field.alias or name
+    except (AttributeError, KeyError):
+        return name
+
+
+def _row_decoder(
+        table: Union[str, Type['DataModel']],
+        columns: Optional[List[str]],
+        validate: bool,
+        tuples: bool,
+) -> Callable[[Mapping[str, Any]], Any]:
+    if tuples:
+        if not columns:
+            raise ValueError("Tuple rows require the columns to be specified with 'select'.")
+        return lambda entity: tuple(entity.get(c) for c in columns)
+    if not hasattr(table, '__table__'):
+        return lambda entity: entity
+    if validate:
+        return lambda entity: table(**entity)
+    return _model_codec(table).construct
+
+
+def _split_transactions(batch: List[TableOperation]) -> Generator[List[TableOperation], None, None]:
+    # A transaction must target a single partition, and is limited to 100 operations
+    # with a total payload of 4MB.
+    partitions: Dict[str, List[TableOperation]] = {}
+    for operation in batch:
+        partitions.setdefault(operation[1]['PartitionKey'], []).append(operation)
+    for operations in partitions.values():
+        transaction: List[TableOperation] = []
+        transaction_size = 0
+        for operation in operations:
+            operation_size = len(json.dumps(operation[1], default=str)) + _BATCH_OPERATION_OVERHEAD
+            if transaction and (
+                    len(transaction) == _MAX_BATCH_OPERATIONS or
+                    transaction_size + operation_size > _MAX_BATCH_SIZE):
+                yield transaction
+                transaction = []
+                transaction_size = 0
+            transaction.append(operation)
+            transaction_size += operation_size
+        if transaction:
+            yield transaction
+
+
+def _is_merge(operation: TableOperation) -> bool:
+    options = operation[2] if len(operation) > 2 else {}
+    return operation[0] in ('upsert', 'update') and str(options.get('mode', 'merge')).lower() == 'merge'
+
+
+def _changes_columns(operation: TableOperation, columns: List[str]) -> bool:
+    # Whether an operation may change the stored values of the columns of an existing
+    # entity. A merge leaves the columns it doesn't specify untouched.
+    if operation[0] == 'create':
+        return False
+    return not _is_merge(operation) or any(c in operation[1] for c in columns)
+
+
+def _index_partition(table: str, column: str, value: Any) -> str:
+    return f"{table}:{column}:{quote(str(value), safe='')}"
+
+
+def _index_marker(table: str, column: str) -> str:
+    # Sorts before the partitions of the index values, so it isn't mistaken for one.
+    return f"{table}:{column}"
+
+
+def _index_row(table: str, column: str, value: Any, pk: str, rk: str) -> Dict[str, Any]:
+    # The key lengths keep the row key unambiguous, the keys themselves are stored
+    # as properties so they don't need to be parsed back out.
+    return {
+        'PartitionKey': _index_partition(table, column, value),
+        'RowKey': f"{len(pk)}:{pk}{rk}",
+        'partition': pk,
+        'row': rk,
+    }
+
+
+def _build_select(
+        table: Optional[Type[DataModel]],
+        select: Optional[Union[str, List[str]]]
+) -> Optional[List[str]]:
+    # By default a model only fetches the columns it declares, while a table
+    # name fetches full entities. Passing '*' always fetches full entities.
+    if select == '*':
+        return None
+    if select:
+        return [select] if isinstance(select, str) else list(select)
+    try:
+        return list(_model_codec(table).columns)
+    except AttributeError:
+        return None
+
+
+def _key_ranges(boundaries: List[str]) -> List[Tuple[Optional[str], Optional[str]]]:
+    # Consecutive boundaries define PartitionKey ranges, with the first and last ranges
+    # left open so that every key is covered. The default boundaries spread evenly over
+    # the hex ids (uuids, hashes) that are typically used as partition keys.
+    bounds = sorted(set(boundaries))
+    return list(zip([None, *bounds], [*bounds, None]))
+
+
+def _infer_format(target: Union[str, os.PathLike, IO], format: Optional[ExportFormat]) -> ExportFormat:
+    if format:
+        return format
+    if isinstance(target, (str, os.PathLike)):
+        return _FORMAT_SUFFIXES.get(os.path.splitext(os.fspath(target))[1].lower(), 'jsonl')
+    return 'jsonl'
+
+
+@contextmanager
+def _open_target(target: Union[str, os.PathLike, IO], mode: str) -> Generator[IO, None, None]:
+    if not isinstance(target, (str, os.PathLike)):
+        yield target
+    elif 'b' in mode:
+        with open(target, mode) as f:
+            yield f
+    else:
+        with open(target, mode, encoding='utf-8', newline='') as f:
+            yield f
+
+
+def _write_jsonl(target: IO, chunks: Iterable[List[Mapping[str, Any]]]) -> int:
+    # Lines are written in the Table service wire format, so that types are preserved on import.
+    count = 0
+    for chunk in chunks:
+        target.writelines(json.dumps(serialize_entity(e)) + "\n" for e in chunk)
+        count += len(chunk)
+    return count
+
+
+def _write_csv(target: IO, chunks: Iterable[List[Mapping[str, Any]]], columns: Optional[List[str]]) -> int:
+    # Without a model or select, the columns are taken from the first chunk of entities.
+    count = 0
+    writer = None
+    for chunk in chunks:
+        if writer is None:
+            if not columns:
+                columns = ['PartitionKey', 'RowKey']
+                columns.extend(k for e in chunk for k in e if k not in columns)
+            writer = csv.DictWriter(target, fieldnames=columns, extrasaction='ignore')
+            writer.writeheader()
+        writer.writerows(serialize_entity(e) for e in chunk)
+        count += len(chunk)
+    return count
+
+
+def _write_parquet(target: IO, chunks: Iterable[List[Mapping[str, Any]]]) -> int:
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise ImportError("Please install pyarrow to export tables to Parquet.") from e
+    count = 0
+    writer = None
+    try:
+        for chunk in chunks:
+            rows = [{k: str(v) if isinstance(v, uuid.UUID) else v for k, v in e.items()} for e in chunk]
+            if writer is None:
+                batch = pa.Table.from_pylist(rows)
+                writer = pq.ParquetWriter(target, batch.schema)
+            else:
+                batch = pa.Table.from_pylist(rows, schema=writer.schema)
+            writer.write_table(batch)
+            count += len(chunk)
+    finally:
+        if writer:
+            writer.close()
+    return count
+
+
+def _read_rows(source: IO, format: ExportFormat) -> Iterator[Dict[str, Any]]:
+    if format == 'jsonl':
+        for line in source:
+            if line.strip():
+                yield dict(deserialize_entity(json.loads(line)))
+    elif format == 'csv':
+        # Empty cells are treated as missing properties.
+        for row in csv.DictReader(source):
+            yield {k: v for k, v in row.items() if v != ''}
+    else:
+        try:
+            import pyarrow.parquet as pq
+        except ImportError as e:
+            raise ImportError("Please install pyarrow to import tables from Parquet.") from e
+        for batch in pq.ParquetFile(source).iter_batches(batch_size=_EXPORT_CHUNK_SIZE):
+            for row in batch.to_pylist():
+                yield {k: v for k, v in row.items() if v is not None}
+
 
 class CloudMachineTableData(CloudMachineClientlet):
     _id: Literal['storage:table'] = 'storage:table'
@@ -89,36 +399,462 @@ class CloudMachineTableData(CloudMachineClientlet):
             executor: Optional[Executor] = None,
             config: Optional[CloudMachinePipelineConfig] = None,
             scope: str,
+            entity_cache_size: Optional[int] = None,
+            entity_cache_ttl: Optional[float] = None,
             **kwargs
     ):
-        # super().__init__(
-        #     endpoint=endpoint,
-        #     credential=credential,
-        #     transport=transport,
-        #     api_version=api_version,
-        #     executor=executor,
-        #     config=config,
-        #     scope=scope,
-        #     **kwargs
-        # )
-        self.endpoint = endpoint
-        self._client = TableServiceClient(
+        headers_policy = StorageHeadersPolicy(**kwargs)
+        super().__init__(
             endpoint=endpoint,
-            api_version=api_version,
             credential=credential,
             transport=transport,
+            api_version=api_version,
+            executor=executor,
+            config=config,
+            scope=scope,
+            headers_policy=headers_policy,
             **kwargs
         )
-        self._tables: Dict[str, TableClient] = {}
+        self.endpoint = endpoint
+        self._init_tables(entity_cache_size, entity_cache_ttl)
 
-    def _get_table_client(self, tablename: str) -> TableClient:
+    def _build_auth_policy(self, credential: Any, scope: str) -> Any:
+        if isinstance(credential, AzureNamedKeyCredential):
+            return TableSharedKeyPolicy(credential)
+        return super()._build_auth_policy(credential, scope)
+
+    def _init_tables(self, entity_cache_size: Optional[int], entity_cache_ttl: Optional[float]) -> None:
+        self._tables: Dict[str, CloudMachineTable] = {}
+        self._rollups: Dict[str, List[_Rollup]] = {}
+        self._indexes: Dict[str, List[str]] = {}
+        self._built_indexes: Dict[Tuple[str, str], bool] = {}
+        # Values may be resolved from settings, in which case they arrive as strings.
+        self._cache: Optional[LRUCache] = None
+        if entity_cache_size:
+            self._cache = LRUCache(
+                maxsize=int(entity_cache_size),
+                ttl=float(entity_cache_ttl) if entity_cache_ttl else None
+            )
+
+    def _get_table_client(self, tablename: str) -> CloudMachineTable:
         try:
             return self._tables[tablename]
         except KeyError:
-            table_client = self._client.create_table_if_not_exists(tablename)
+            table_client = CloudMachineTable(
+                self._client,
+                self._endpoint,
+                tablename,
+                self._config,
+                create_table=self._create_table
+            )
             self._tables[tablename] = table_client
             return table_client
 
+    def _create_table(self, tablename: str, **kwargs) -> None:
+        kwargs['version'] = self._config.api_version
+        request = build_create_table_request(self._endpoint, tablename, kwargs)
+        response = self._client.send_request(request, **kwargs)
+        if ((response.status_code in [201, 204]) or
+            (response.status_code == 409 and response.headers.get('x-ms-error-code') == 'TableAlreadyExists')):
+            return
+        raise HttpResponseError(response=response)
+
+    def _get_model_client(self, model: Union[DataModel, Type[DataModel]]) -> CloudMachineTable:
+        tablename = model.__table__
+        model_type = model if isinstance(model, type) else type(model)
+        for name in getattr(model_type, '__indexes__', []):
+            column = _column(model_type, name)
+            if column not in self._indexes.setdefault(tablename, []):
+                self._indexes[tablename].append(column)
+        return self._get_table_client(tablename)
+
+    def _submit_batch(self, table_client: CloudMachineTable, batch: List[TableOperation]) -> None:
+        rollups = self._rollups.get(table_client.table_name)
+        indexes = self._indexes.get(table_client.table_name)
+        columns = [c for r in rollups or [] for c in (r.group_by, *r.fields)] + (indexes or [])
+        previous = self._prefetch_previous(table_client, columns, batch) if columns else {}
+        if indexes:
+            self._write_index_rows(table_client.table_name, indexes, batch, previous)
+        transactions = list(_split_transactions(batch))
+        executor = fan_out_executor(self._executor)
+        if executor and len(transactions) > 1:
+            results = [
+                (t, executor.submit(run_as_worker, table_client.submit_transaction, t)) for t in transactions
+            ]
+        else:
+            results = [(t, None) for t in transactions]
+        succeeded: List[TableOperation] = []
+        failed = []
+        for transaction, future in results:
+            try:
+                if future:
+                    future.result()
+                else:
+                    table_client.submit_transaction(transaction)
+                succeeded.extend(transaction)
+            except HttpResponseError as e:
+                # Transactions are atomic, so every entity in a failed transaction is reported.
+                failed.extend((o[1], e) for o in transaction)
+        if self._cache is not None:
+            for operation in batch:
+                entity = operation[1]
+                self._cache.pop((table_client.table_name, entity['PartitionKey'], entity['RowKey']))
+        for rollup in rollups or []:
+            self._maintain_rollup(rollup, succeeded, previous)
+        if indexes:
+            self._remove_index_rows(table_client.table_name, indexes, succeeded, previous)
+        if failed:
+            raise TableBatchError(
+                f"{len(failed)} of {len(batch)} entities failed to write to table '{table_client.table_name}'.",
+                succeeded=[o[1] for o in succeeded],
+                failed=failed
+            )
+
+    def _get_entity(
+            self,
+            table_client: CloudMachineTable,
+            pk: str,
+            rk: str,
+            select: Optional[List[str]]
+    ) -> Mapping[str, Any]:
+        if self._cache is None:
+            return table_client.get_entity(pk, rk, select=select)
+        key = (table_client.table_name, pk, rk)
+        columns = tuple(select) if select else None
+        try:
+            cached_columns, entity = self._cache.get(key, stale=True)
+        except KeyError:
+            cached_columns, entity = None, None
+        if entity is not None and cached_columns == columns:
+            try:
+                self._cache.get(key)
+                return copy.copy(entity)
+            except KeyError:
+                pass
+            # The entry has expired, so check whether the stored entity has changed
+            # before fetching it again in full.
+            current = table_client.get_entity(pk, rk, select=['PartitionKey'])
+            if current.metadata['etag'] == entity.metadata['etag']:
+                self._cache.touch(key)
+                return copy.copy(entity)
+        entity = table_client.get_entity(pk, rk, select=select)
+        self._cache.set(key, (columns, entity))
+        return copy.copy(entity)
+
+    def _write_index_rows(
+            self,
+            table: str,
+            columns: List[str],
+            batch: List[TableOperation],
+            previous: Dict[Tuple[str, str], Mapping[str, Any]]
+    ) -> None:
+        # Index rows are written before the entities, so an entity is never missing from
+        # its index. Rows left behind by a failed write are filtered out when read.
+        rows: Dict[Tuple[str, str], TableOperation] = {}
+        for operation in batch:
+            entity = operation[1]
+            if operation[0] == 'delete':
+                continue
+            pk, rk = entity['PartitionKey'], entity['RowKey']
+            old = previous.get((pk, rk), {})
+            for column in columns:
+                value = entity.get(column)
+                if value is not None and value != old.get(column):
+                    row = _index_row(table, column, value, pk, rk)
+                    rows[(row['PartitionKey'], row['RowKey'])] = ("upsert", row, {'mode': 'replace'})
+        self._submit_batch(self._get_table_client(_INDEX_TABLE), list(rows.values()))
+
+    def _remove_index_rows(
+            self,
+            table: str,
+            columns: List[str],
+            operations: List[TableOperation],
+            previous: Dict[Tuple[str, str], Mapping[str, Any]]
+    ) -> None:
+        rows: Dict[Tuple[str, str], TableOperation] = {}
+        for operation in operations:
+            entity = operation[1]
+            pk, rk = entity['PartitionKey'], entity['RowKey']
+            old = previous.get((pk, rk))
+            if not old:
+                continue
+            merge = _is_merge(operation)
+            for column in columns:
+                value = old.get(column)
+                if value is None:
+                    continue
+                if operation[0] == 'delete' or (column not in entity and not merge) or (
+                        column in entity and entity[column] != value):
+                    row = _index_row(table, column, value, pk, rk)
+                    rows[(row['PartitionKey'], row['RowKey'])] = ("delete", row)
+        try:
+            self._submit_batch(self._get_table_client(_INDEX_TABLE), list(rows.values()))
+        except TableBatchError:
+            # Stale index rows are skipped when read, so this isn't fatal.
+            pass
+
+    def _match_index(
+            self,
+            table: str,
+            query: str,
+            parameters: Optional[Dict[str, Any]]
+    ) -> Optional[Tuple[str, Any]]:
+        # Only a single equality comparison on an indexed column can be answered by the index.
+        match = _INDEX_FILTER.match(query)
+        if not match or match.group(1) not in self._indexes.get(table, []):
+            return None
+        if not self._index_built(table, match.group(1)):
+            return None
+        if match.group(2):
+            try:
+                return match.group(1), parameters[match.group(2)]
+            except (KeyError, TypeError):
+                return None
+        return match.group(1), match.group(3).replace("''", "'")
+
+    def _index_built(self, table: str, column: str) -> bool:
+        # Until an index has been built, entities written before it was declared are missing
+        # from it. The marker row written by the build is looked up once per client.
+        try:
+            return self._built_indexes[(table, column)]
+        except KeyError:
+            pass
+        try:
+            self._get_table_client(_INDEX_TABLE).get_entity(
+                _index_marker(table, column), _INDEX_BUILT, select=['PartitionKey']
+            )
+            built = True
+        except ResourceNotFoundError:
+            built = False
+        self._built_indexes[(table, column)] = built
+        return built
+
+    def _query_index(
+            self,
+            table: Union[str, Type[DataModel]],
+            column: str,
+            value: Any,
+            select: Optional[Union[str, List[str]]],
+            decode: Callable[[Mapping[str, Any]], Any],
+    ) -> Generator[Any, None, None]:
+        tablename = getattr(table, '__table__', table)
+        model = table if tablename is not table else None
+        partition = _index_partition(tablename, column, value)
+        keys = [
+            (row['partition'], row['row']) for row in self._get_table_client(_INDEX_TABLE).query_entities(
+                "PartitionKey eq @index",
+                parameters={'index': partition},
+                select=['partition', 'row']
+            )
+        ]
+        columns = _build_select(model, select)
+        if columns is not None and column not in columns:
+            columns.append(column)
+        entities = self.query_many(tablename, *keys, select=columns or '*')
+        for key in keys:
+            for entity in entities[key]:
+                if _index_partition(tablename, column, entity.get(column)) == partition:
+                    yield decode(entity)
+
+    def _prefetch_previous(
+            self,
+            table_client: CloudMachineTable,
+            columns: List[str],
+            batch: List[TableOperation]
+    ) -> Dict[Tuple[str, str], Mapping[str, Any]]:
+        # The stored values of the columns, for the entities that the batch may change them on.
+        keys = [(o[1]['PartitionKey'], o[1]['RowKey']) for o in batch if _changes_columns(o, columns)]
+        if not keys:
+            return {}
+        existing = self.query_many(
+            table_client.table_name,
+            *keys,
+            select=list(dict.fromkeys(['PartitionKey', 'RowKey', *columns]))
+        )
+        return {k: v[0] for k, v in existing.items() if v}
+
+    def _maintain_rollup(
+            self,
+            rollup: _Rollup,
+            operations: List[TableOperation],
+            previous: Dict[Tuple[str, str], Mapping[str, Any]]
+    ) -> None:
+        # Each write takes the previous values of an entity out of their group and adds the
+        # new values to theirs, so entities that change group move between rollup rows.
+        deltas: Dict[Any, Aggregate] = {}
+        for operation in operations:
+            entity = operation[1]
+            old = previous.get((entity['PartitionKey'], entity['RowKey']))
+            if operation[0] == 'delete':
+                new = None
+            elif _is_merge(operation):
+                new = dict(old or {}, **entity)
+            else:
+                new = entity
+            for values, sign in ((old, -1), (new, 1)):
+                group = values.get(rollup.group_by) if values else None
+                if group is None:
+                    continue
+                delta = deltas.setdefault(group, Aggregate())
+                delta.count += sign
+                for column in rollup.fields:
+                    delta.sum[column] = delta.sum.get(column, 0) + sign * (values.get(column) or 0)
+        for group, delta in deltas.items():
+            if delta.count or any(delta.sum.values()):
+                self._apply_rollup_delta(rollup, group, delta)
+
+    def _rollup_row(self, rollup: _Rollup, group: Any, aggregate: Aggregate) -> Dict[str, Any]:
+        row = {'PartitionKey': rollup.partition, 'RowKey': str(group), 'count': aggregate.count}
+        row.update((f"sum_{c}", float(aggregate.sum.get(c, 0))) for c in rollup.fields)
+        return row
+
+    def _apply_rollup_delta(self, rollup: _Rollup, group: Any, delta: Aggregate) -> None:
+        rollup_client = self._get_table_client(_ROLLUP_TABLE)
+        for _ in range(_ROLLUP_RETRIES):
+            try:
+                existing = rollup_client.get_entity(rollup.partition, str(group))
+            except ResourceNotFoundError:
+                if delta.count <= 0:
+                    # Entities left a group that has no row, so the rollup has drifted.
+                    break
+                try:
+                    rollup_client.create_entity(self._rollup_row(rollup, group, delta))
+                    return
+                except ResourceExistsError:
+                    continue
+            current = Aggregate(
+                count=existing['count'] + delta.count,
+                sum={c: existing.get(f"sum_{c}", 0) + delta.sum.get(c, 0) for c in rollup.fields}
+            )
+            try:
+                if current.count > 0:
+                    rollup_client.update_entity(
+                        self._rollup_row(rollup, group, current),
+                        mode='replace',
+                        etag=existing.metadata['etag'],
+                        match_condition=MatchConditions.IfNotModified
+                    )
+                else:
+                    # The last entity left the group.
+                    rollup_client.delete_entity(
+                        rollup.partition,
+                        str(group),
+                        etag=existing.metadata['etag'],
+                        match_condition=MatchConditions.IfNotModified
+                    )
+                return
+            except (ResourceModifiedError, ResourceNotFoundError):
+                continue
+        # Too much contention on this row, or it has drifted, fall back to a recount of the group.
+        self._recompute_rollup_row(rollup, group)
+
+    def _recompute_rollup_row(self, rollup: _Rollup, group: Any) -> None:
+        table_client = self._get_table_client(rollup.table)
+        aggregate = Aggregate()
+        for entity in table_client.query_entities(
+                f"{rollup.group_by} eq @group",
+                parameters={'group': group},
+                select=[rollup.group_by, *rollup.fields]):
+            aggregate.count += 1
+            for column in rollup.fields:
+                aggregate.sum[column] = aggregate.sum.get(column, 0) + (entity.get(column) or 0)
+        rollup_client = self._get_table_client(_ROLLUP_TABLE)
+        if aggregate.count:
+            rollup_client.upsert_entity(self._rollup_row(rollup, group, aggregate), mode='replace')
+        else:
+            try:
+                rollup_client.delete_entity(rollup.partition, str(group))
+            except ResourceNotFoundError:
+                pass
+
+    def add_rollup(
+            self,
+            table: Union[str, Type[DataModel]],
+            *,
+            group_by: str,
+            fields: List[str],
+            rebuild: bool = False
+    ) -> None:
+        """Maintain a materialized count and sum of `fields` for each value of `group_by`.
+
+        Rollup rows are updated incrementally by the insert, upsert, update and delete
+        calls made through this client, from the previous values of the entities written,
+        and are used by `aggregate` in place of a table scan. Writes made by other clients
+        are not tracked, use `rebuild=True` to recount the rollup from the table.
+        """
+        tablename = getattr(table, '__table__', table)
+        rollup = _Rollup(
+            table=tablename,
+            group_by=_column(table, group_by),
+            fields=[_column(table, f) for f in fields]
+        )
+        rollups = self._rollups.setdefault(tablename, [])
+        if rollup not in rollups:
+            rollups.append(rollup)
+        if rebuild:
+            aggregates = self._scan_aggregate(
+                self._get_table_client(tablename),
+                rollup.group_by,
+                {c: c for c in rollup.fields}
+            )
+            rollup_client = self._get_table_client(_ROLLUP_TABLE)
+            stale = [
+                e for e in rollup_client.query_entities(
+                    "PartitionKey eq @rollup",
+                    parameters={'rollup': rollup.partition},
+                    select=['PartitionKey', 'RowKey'])
+                if e['RowKey'] not in aggregates
+            ]
+            self._submit_batch(rollup_client, [("delete", e) for e in stale])
+            self._submit_batch(
+                rollup_client,
+                [("upsert", self._rollup_row(rollup, g, a), {'mode': 'replace'}) for g, a in aggregates.items()]
+            )
+
+    def add_index(
+            self,
+            table: Union[str, Type[DataModel]],
+            *,
+            fields: List[str],
+            rebuild: bool = False
+    ) -> None:
+        """Maintain a secondary index on `fields`, so that equality queries on them don't scan the table.
+
+        Models can instead declare their indexed fields in an `__indexes__` class variable.
+        Index rows are kept in a sidecar table by the insert, upsert, update and delete calls
+        made through this client. Use `rebuild=True` to index the existing entities, after which
+        a `query` filter of the form "<field> eq @<param>" is answered from the index by every
+        client created from then on. Until then, such queries scan the table.
+        """
+        tablename = getattr(table, '__table__', table)
+        columns = self._indexes.setdefault(tablename, [])
+        added = [_column(table, f) for f in fields]
+        columns.extend(c for c in added if c not in columns)
+        if rebuild:
+            index_client = self._get_table_client(_INDEX_TABLE)
+            rows: Dict[Tuple[str, str], Dict[str, Any]] = {}
+            for entity in self._get_table_client(tablename).list_entities(
+                    select=['PartitionKey', 'RowKey', *added]):
+                for column in added:
+                    if entity.get(column) is not None:
+                        row = _index_row(tablename, column, entity[column], entity['PartitionKey'], entity['RowKey'])
+                        rows[(row['PartitionKey'], row['RowKey'])] = row
+            stale = [
+                e for column in added for e in index_client.query_entities(
+                    "PartitionKey ge @start and PartitionKey lt @end",
+                    parameters={'start': f"{tablename}:{column}:", 'end': f"{tablename}:{column};"},
+                    select=['PartitionKey', 'RowKey'])
+                if (e['PartitionKey'], e['RowKey']) not in rows
+            ]
+            self._submit_batch(index_client, [("delete", e) for e in stale])
+            self._submit_batch(index_client, [("upsert", r, {'mode': 'replace'}) for r in rows.values()])
+            self._submit_batch(
+                index_client,
+                [("upsert", {'PartitionKey': _index_marker(tablename, c), 'RowKey': _INDEX_BUILT}) for c in added]
+            )
+            for column in added:
+                self._built_indexes[(tablename, column)] = True
+
     @overload
     def insert(self, table: str, *entities: Mapping[str, Any]) -> None:
         ...
@@ -129,12 +865,12 @@ class CloudMachineTableData(CloudMachineClientlet):
         if not args:
             return
         try:
-            table_client = self._get_table_client(args[0].__table__)
-            batch = [("create", e.model_dump(by_alias=True)) for e in args]
+            table_client = self._get_model_client(args[0])
+            batch = [("create", _model_codec(type(e)).dump(e)) for e in args]
         except AttributeError:
             table_client = self._get_table_client(args[0])
             batch = [("create", e) for e in args[1:]]
-        table_client.submit_transaction(batch)
+        self._submit_batch(table_client, batch)
 
     @overload
     def upsert(self, table: str, *entities: Mapping[str, Any], overwrite: bool = True) -> None:
@@ -147,12 +883,12 @@ class CloudMachineTableData(CloudMachineClientlet):
             return
         mode = 'replace' if overwrite else 'merge'
         try:
-            table_client = self._get_table_client(args[0].__table__)
-            batch = [("upsert", e.model_dump(by_alias=True), {'mode': mode}) for e in args]
+            table_client = self._get_model_client(args[0])
+            batch = [("upsert", _model_codec(type(e)).dump(e), {'mode': mode}) for e in args]
         except AttributeError:
             table_client = self._get_table_client(args[0])
             batch = [("upsert", e, {'mode': mode}) for e in args[1:]]
-        table_client.submit_transaction(batch)
+        self._submit_batch(table_client, batch)
 
     @overload
     def update(self, table: str, *entities: Mapping[str, Any], overwrite: bool = True) -> None:
@@ -165,12 +901,12 @@ class CloudMachineTableData(CloudMachineClientlet):
             return
         mode = 'replace' if overwrite else 'merge'
         try:
-            table_client = self._get_table_client(args[0].__table__)
-            batch = [("update", e.model_dump(by_alias=True), {'mode': mode}) for e in args]
+            table_client = self._get_model_client(args[0])
+            batch = [("update", _model_codec(type(e)).dump(e), {'mode': mode}) for e in args]
         except AttributeError:
             table_client = self._get_table_client(args[0])
             batch = [("update", e, {'mode': mode}) for e in args[1:]]
-        table_client.submit_transaction(batch)
+        self._submit_batch(table_client, batch)
 
     @overload
     def delete(self, table: str, *entities: Mapping[str, Any]) -> None:
@@ -182,47 +918,109 @@ class CloudMachineTableData(CloudMachineClientlet):
         if not args:
             return
         try:
-            table_client = self._get_table_client(args[0].__table__)
-            batch = [("delete", e.model_dump(by_alias=True)) for e in args]
+            table_client = self._get_model_client(args[0])
+            batch = [("delete", _model_codec(type(e)).dump(e)) for e in args]
         except AttributeError:
             table_client = self._get_table_client(args[0])
             batch = [("delete", e) for e in args[1:]]
-        table_client.submit_transaction(batch)
+        self._submit_batch(table_client, batch)
 
-    def list(self, table: Union[str, DataModel]) -> Generator[Mapping[str, Any], None, None]:
+    def list(
+            self,
+            table: Union[str, Type[DataModel]],
+            *,
+            select: Optional[Union[str, List[str]]] = None,
+            pagesize: Optional[int] = None,
+            validate: bool = True,
+            tuples: bool = False,
+    ) -> Generator[Any, None, None]:
+        """List every entity in the table.
+
+        Set `validate=False` to construct models without validation, for data that was written
+        by the model, or `tuples=True` to yield a tuple of the selected columns for each entity.
+        """
         try:
-            table_client = self._get_table_client(table.__table__)
-            for entity in table_client.list_entities():
-                yield table(**entity)
+            table_client = self._get_model_client(table)
         except AttributeError:
             table_client = self._get_table_client(table)
-            yield from table_client.list_entities()
+        columns = _build_select(table, select)
+        decode = _row_decoder(table, columns, validate, tuples)
+        for entity in table_client.list_entities(select=columns, results_per_page=pagesize):
+            yield decode(entity)
 
     @overload
-    def query(self, table: str, partition: str, row: str, /) -> Generator[Mapping[str, Any], None, None]:
+    def query(
+            self,
+            table: str,
+            partition: str,
+            row: str,
+            /, *,
+            select: Optional[Union[str, List[str]]] = None,
+            pagesize: Optional[int] = None,
+            validate: bool = True,
+            tuples: bool = False,
+    ) -> Generator[Mapping[str, Any], None, None]:
         ...
     @overload
-    def query(self, table: str, *, query: str, parameters: Optional[Dict[str, Any]] = None) -> Generator[Mapping[str, Any], None, None]:
+    def query(
+            self,
+            table: str,
+            *,
+            query: str,
+            parameters: Optional[Dict[str, Any]] = None,
+            select: Optional[Union[str, List[str]]] = None,
+            pagesize: Optional[int] = None,
+            validate: bool = True,
+            tuples: bool = False,
+    ) -> Generator[Mapping[str, Any], None, None]:
         ...
     @overload
-    def query(self, table: Type[DataModel], partition: str, row: str, /) -> Generator[DataModel, None, None]:
+    def query(
+            self,
+            table: Type[DataModel],
+            partition: str,
+            row: str,
+            /, *,
+            select: Optional[Union[str, List[str]]] = None,
+            pagesize: Optional[int] = None,
+            validate: bool = True,
+            tuples: bool = False,
+    ) -> Generator[DataModel, None, None]:
         ...
     @overload
-    def query(self, table: Type[DataModel], *, query: str, parameters: Optional[Dict[str, Any]] = None) -> Generator[Mapping[str, Any], None, None]:
+    def query(
+            self,
+            table: Type[DataModel],
+            *,
+            query: str,
+            parameters: Optional[Dict[str, Any]] = None,
+            select: Optional[Union[str, List[str]]] = None,
+            pagesize: Optional[int] = None,
+            validate: bool = True,
+            tuples: bool = False,
+    ) -> Generator[DataModel, None, None]:
         ...
-    def query(self, table: Union[str, DataModel], *args, **kwargs) -> Generator[Mapping[str, Any], None, None]:
+    def query(
+            self,
+            table: Union[str, Type[DataModel]],
+            *args,
+            select: Optional[Union[str, List[str]]] = None,
+            pagesize: Optional[int] = None,
+            validate: bool = True,
+            tuples: bool = False,
+            **kwargs
+    ) -> Generator[Any, None, None]:
+        try:
+            table_client = self._get_model_client(table)
+        except AttributeError:
+            table_client = self._get_table_client(table)
+        columns = _build_select(table, select)
+        decode = _row_decoder(table, columns, validate, tuples)
         if args:
             pk, rk = args
             if pk and pk != '*' and rk and rk != '*':
-                try:
-                    table_client = self._get_table_client(table.__table__)
-                    entity = table_client.get_entity(pk, rk)
-                    yield table(**entity)
-                    return
-                except AttributeError:
-                    table_client = self._get_table_client(table)
-                    yield table_client.get_entity(pk, rk)
-                    return
+                yield decode(self._get_entity(table_client, pk, rk, columns))
+                return
             if pk and pk != '*':
                 query = "PartitionKey eq @partition"
                 parameters = {'partition': pk}
@@ -233,15 +1031,358 @@ class CloudMachineTableData(CloudMachineClientlet):
                 raise ValueError("Both partition key and row key must be valid strings or '*'.")
         else:
             query = kwargs.pop('query')
-            parameters = kwargs.pop('parameters', None) 
+            parameters = kwargs.pop('parameters', None)
+            indexed = self._match_index(table_client.table_name, query, parameters)
+            if indexed:
+                yield from self._query_index(table, *indexed, select=select, decode=decode)
+                return
+        for entity in table_client.query_entities(
+                query,
+                parameters=parameters,
+                select=columns,
+                results_per_page=pagesize):
+            yield decode(entity)
+
+
+    def _scan_aggregate(
+            self,
+            table_client: CloudMachineTable,
+            group_column: str,
+            columns: Dict[str, str],
+            query: Optional[str] = None,
+            parameters: Optional[Dict[str, Any]] = None,
+    ) -> Dict[str, Aggregate]:
+        select = [group_column, *columns.values()]
+        if query:
+            entities = table_client.query_entities(query, parameters=parameters, select=select)
+        else:
+            entities = table_client.list_entities(select=select)
+        aggregates: Dict[str, Aggregate] = {}
+        for entity in entities:
+            group = entity.get(group_column)
+            if group is None:
+                continue
+            aggregate = aggregates.setdefault(str(group), Aggregate())
+            aggregate.count += 1
+            for name, column in columns.items():
+                value = entity.get(column)
+                if value is not None:
+                    aggregate.sum[name] = aggregate.sum.get(name, 0) + value
+        return aggregates
+
+    def aggregate(
+            self,
+            table: Union[str, Type[DataModel]],
+            *,
+            group_by: str,
+            fields: Optional[List[str]] = None,
+            query: Optional[str] = None,
+            parameters: Optional[Dict[str, Any]] = None,
+    ) -> Dict[str, Aggregate]:
+        """Count entities and sum `fields` for each value of `group_by`.
+
+        If a matching rollup has been registered with `add_rollup`, the materialized rows are
+        read instead, otherwise the result is computed from a single projected table scan.
+        """
+        tablename = getattr(table, '__table__', table)
+        group_column = _column(table, group_by)
+        columns = {name: _column(table, name) for name in fields or []}
+        if not query:
+            for rollup in self._rollups.get(tablename, []):
+                if rollup.group_by == group_column and set(columns.values()).issubset(rollup.fields):
+                    rollup_client = self._get_table_client(_ROLLUP_TABLE)
+                    return {
+                        row['RowKey']: Aggregate(
+                            count=row['count'],
+                            sum={name: row.get(f"sum_{column}", 0) for name, column in columns.items()}
+                        ) for row in rollup_client.query_entities(
+                            "PartitionKey eq @rollup",
+                            parameters={'rollup': rollup.partition}
+                        )
+                    }
+        return self._scan_aggregate(
+            self._get_table_client(tablename),
+            group_column,
+            columns,
+            query=query,
+            parameters=parameters
+        )
+
+    @overload
+    def query_many(
+            self,
+            table: str,
+            *keys: Tuple[str, str],
+            select: Optional[Union[str, List[str]]] = None,
+            validate: bool = True,
+    ) -> Dict[Tuple[str, str], List[Mapping[str, Any]]]:
+        ...
+    @overload
+    def query_many(
+            self,
+            table: Type[DataModel],
+            *keys: Tuple[str, str],
+            select: Optional[Union[str, List[str]]] = None,
+            validate: bool = True,
+    ) -> Dict[Tuple[str, str], List[DataModel]]:
+        ...
+    def query_many(
+            self,
+            table: Union[str, Type[DataModel]],
+            *keys: Tuple[str, str],
+            select: Optional[Union[str, List[str]]] = None,
+            validate: bool = True,
+    ) -> Dict[Tuple[str, str], List[Any]]:
+        """Look up several (partition, row) keys at once, where either key may be '*'.
+
+        Lookups are combined into as few filters as possible, one per partition and
+        one for all row-only keys, and the resulting queries are run concurrently.
+        Set `validate=False` to construct models without validation, as with `query`.
+        """
         try:
-            table_client = self._get_table_client(table.__table__)
-            for entity in table_client.query_entities(query, parameters=parameters):
-                yield table(**entity)
+            table_client = self._get_model_client(table)
+            model = table
         except AttributeError:
             table_client = self._get_table_client(table)
-            yield from table_client.query_entities(query, parameters=parameters)
+            model = None
+        partitions: Dict[str, Optional[List[str]]] = {}
+        rows: List[str] = []
+        for pk, rk in keys:
+            if pk and pk != '*':
+                if not rk or rk == '*':
+                    partitions[pk] = None
+                elif partitions.setdefault(pk, []) is not None:
+                    partitions[pk].append(rk)
+            elif rk and rk != '*':
+                rows.append(rk)
+            else:
+                raise ValueError("Both partition key and row key must be valid strings or '*'.")
+
+        filters: List[Tuple[str, Dict[str, str]]] = []
+        for pk, rks in partitions.items():
+            if rks is None:
+                filters.append(("PartitionKey eq @partition", {'partition': pk}))
+                continue
+            for i in range(0, len(rks), _MAX_FILTER_COMPARISONS - 1):
+                chunk = rks[i: i + _MAX_FILTER_COMPARISONS - 1]
+                row_filter = " or ".join(f"RowKey eq @row{n}" for n in range(len(chunk)))
+                parameters = {f"row{n}": rk for n, rk in enumerate(chunk)}
+                parameters['partition'] = pk
+                filters.append((f"PartitionKey eq @partition and ({row_filter})", parameters))
+        for i in range(0, len(rows), _MAX_FILTER_COMPARISONS):
+            chunk = rows[i: i + _MAX_FILTER_COMPARISONS]
+            row_filter = " or ".join(f"RowKey eq @row{n}" for n in range(len(chunk)))
+            filters.append((row_filter, {f"row{n}": rk for n, rk in enumerate(chunk)}))
+
+        def _run_filter(query: str, parameters: Dict[str, str]) -> List[Mapping[str, Any]]:
+            return list(table_client.query_entities(
+                query,
+                parameters=parameters,
+                select=_build_select(model, select)
+            ))
+
+        executor = fan_out_executor(self._executor)
+        if executor and len(filters) > 1:
+            futures = [executor.submit(run_as_worker, _run_filter, q, p) for q, p in filters]
+            pages = [f.result() for f in futures]
+        else:
+            pages = [_run_filter(q, p) for q, p in filters]
+
+        results: Dict[Tuple[str, str], List[Any]] = {k: [] for k in keys}
+        # An entity can be matched by both a partition filter and a row filter.
+        entities = {(e['PartitionKey'], e['RowKey']): e for page in pages for e in page}
+        decode = _row_decoder(table, None, validate, False)
+        for (pk, rk), entity in entities.items():
+            value = decode(entity)
+            for key in ((pk, rk), (pk, '*'), ('*', rk)):
+                if key in results:
+                    results[key].append(value)
+        return results
+
+    def _scan_range(
+            self,
+            table_client: CloudMachineTable,
+            key_range: Tuple[Optional[str], Optional[str]],
+            select: Optional[List[str]],
+    ) -> Generator[List[Mapping[str, Any]], None, None]:
+        filters, parameters = [], {}
+        if key_range[0]:
+            filters.append("PartitionKey ge @start")
+            parameters['start'] = key_range[0]
+        if key_range[1]:
+            filters.append("PartitionKey lt @end")
+            parameters['end'] = key_range[1]
+        chunk = []
+        for entity in table_client.query_entities(
+                " and ".join(filters) or None,
+                parameters=parameters,
+                select=select,
+                results_per_page=_EXPORT_CHUNK_SIZE):
+            chunk.append(entity)
+            if len(chunk) == _EXPORT_CHUNK_SIZE:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    def _scan_ranges(
+            self,
+            table_client: CloudMachineTable,
+            key_ranges: List[Tuple[Optional[str], Optional[str]]],
+            select: Optional[List[str]],
+    ) -> Generator[List[Mapping[str, Any]], None, None]:
+        executor = fan_out_executor(self._executor)
+        if not executor:
+            for key_range in key_ranges:
+                yield from self._scan_range(table_client, key_range, select)
+            return
+        # The ranges are scanned concurrently, and handed to the writer through a bounded
+        # queue so that a slow sink holds back the scans rather than buffering the table.
+        chunks: Queue = Queue(maxsize=_EXPORT_QUEUE_SIZE)
+        cancelled = Event()
+        finished = object()
+
+        def _put(item: Any) -> None:
+            while not cancelled.is_set():
+                try:
+                    chunks.put(item, timeout=1)
+                    return
+                except Full:
+                    continue
+
+        def _scan(key_range: Tuple[Optional[str], Optional[str]]) -> None:
+            try:
+                for chunk in self._scan_range(table_client, key_range, select):
+                    if cancelled.is_set():
+                        return
+                    _put(chunk)
+            finally:
+                _put(finished)
+
+        futures = [executor.submit(run_as_worker, _scan, r) for r in key_ranges]
+        remaining = len(futures)
+        try:
+            while remaining:
+                chunk = chunks.get()
+                if chunk is finished:
+                    remaining -= 1
+                else:
+                    yield chunk
+        finally:
+            cancelled.set()
+        for future in futures:
+            future.result()
+
+    def export(
+            self,
+            table: Union[str, Type[DataModel]],
+            sink: Union[str, os.PathLike, IO],
+            *,
+            format: Optional[ExportFormat] = None,
+            select: Optional[Union[str, List[str]]] = None,
+            boundaries: Optional[List[str]] = None,
+    ) -> int:
+        """Write every entity in the table to `sink`, returning the number of entities written.
+
+        The sink is a path or an open file (binary for Parquet), and the format is taken from
+        the file extension if not specified. The table is scanned concurrently over the
+        PartitionKey ranges between `boundaries`. JSONL keeps the property types, while CSV
+        writes every value as a string. Parquet requires pyarrow.
+        """
+        format = _infer_format(sink, format)
+        try:
+            table_client = self._get_model_client(table)
+            columns = _build_select(table, select)
+        except AttributeError:
+            table_client = self._get_table_client(table)
+            columns = _build_select(None, select)
+        chunks = self._scan_ranges(
+            table_client,
+            _key_ranges(_EXPORT_BOUNDARIES if boundaries is None else boundaries),
+            columns
+        )
+        try:
+            with _open_target(sink, 'wb' if format == 'parquet' else 'w') as target:
+                if format == 'jsonl':
+                    return _write_jsonl(target, chunks)
+                if format == 'csv':
+                    return _write_csv(target, chunks, columns)
+                return _write_parquet(target, chunks)
+        finally:
+            chunks.close()
+
+    def import_(
+            self,
+            table: Union[str, Type[DataModel]],
+            source: Union[str, os.PathLike, IO],
+            *,
+            format: Optional[ExportFormat] = None,
+    ) -> int:
+        """Upsert every entity read from `source`, as written by `export`, returning the number of entities.
+
+        For a model, each row is validated by the model before it's written, so that CSV
+        values are converted to the right types. Rows are written in bulk transactions.
+        """
+        format = _infer_format(source, format)
+        try:
+            table_client = self._get_model_client(table)
+            model = table
+        except AttributeError:
+            table_client = self._get_table_client(table)
+            model = None
+        count = 0
+        with _open_target(source, 'rb' if format == 'parquet' else 'r') as target:
+            batch: List[TableOperation] = []
+            for row in _read_rows(target, format):
+                if model:
+                    row = _model_codec(model).dump(model(**row))
+                batch.append(("upsert", row, {'mode': 'replace'}))
+                if len(batch) == _IMPORT_CHUNK_SIZE:
+                    self._submit_batch(table_client, batch)
+                    count += len(batch)
+                    batch = []
+            if batch:
+                self._submit_batch(table_client, batch)
+                count += len(batch)
+        return count
+
+
+class LocalTableData(CloudMachineTableData):
+    """CloudMachineTableData backed by a local SQLite database, for running offline.
+
+    The database is held in memory unless a file path is given, in which case the tables
+    persist between runs.
+    """
+    _id: Literal['storage:table'] = 'storage:table'
+
+    def __init__(
+            self,
+            path: str = ':memory:',
+            *,
+            executor: Optional[Executor] = None,
+            entity_cache_size: Optional[int] = None,
+            entity_cache_ttl: Optional[float] = None,
+    ):
+        from ._local._tables import LocalTableStore
+        self.endpoint = path
+        self._executor = executor
+        self._store = LocalTableStore(path)
+        self._init_tables(entity_cache_size, entity_cache_ttl)
 
+    def _get_table_client(self, tablename: str) -> 'LocalTable':
+        try:
+            return self._tables[tablename]
+        except KeyError:
+            from ._local._tables import LocalTable
+            table_client = LocalTable(self._store, tablename)
+            self._tables[tablename] = table_client
+            return table_client
+
+    def warmup(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self._store.close()
 
 
 class CloudMachineClient:
@@ -250,11 +1391,11 @@ class CloudMachineClient:
     def __init__(
             self,
             *,
-            deployment: Optional[CloudMachineDeployment] = None,
+            deployment: Optional['CloudMachineDeployment'] = None,
             openai: Optional[Union[ClientSettings, Literal['openai']]] = 'openai',
-            data: Optional[Union[ClientSettings, Literal['storage:table']]] = 'storage:table',
-            messaging: Optional[Union[ClientSettings, Literal['servicebus']]] = 'servicebus',
-            storage: Optional[Union[ClientSettings, Literal['storage:blob']]] = 'storage:blob',
+            data: Optional[Union[ClientSettings, Literal['storage:table', 'local']]] = 'storage:table',
+            messaging: Optional[Union[ClientSettings, Literal['servicebus', 'local']]] = 'servicebus',
+            storage: Optional[Union[ClientSettings, Literal['storage:blob', 'local']]] = 'storage:blob',
             search: Optional[Union[ClientSettings, Literal['search']]] = 'search',
             documentai: Optional[Union[ClientSettings, Literal['documentai']]] = 'documentai',
             http_transport: Optional[HttpTransport] = None,
@@ -262,7 +1403,7 @@ class CloudMachineClient:
             client_options: Optional[Dict[str, Any]] = None,
             **kwargs
     ):
-        self.http_transport = http_transport or self._build_transport()
+        self.http_transport = http_transport or self._build_transport(max_workers=kwargs.get('max_workers', 10))
         self._resources = global_resources
         self._client_options = client_options or {}
         self._settings: Dict[str, Optional[ClientSettings]] = {
@@ -286,28 +1427,43 @@ class CloudMachineClient:
             self._listener = None
             self._listener_thread = None
 
-        self._executor: Executor = ThreadPoolExecutor(max_workers=kwargs.get('max_workers', 10))
+        self._executor: Executor = ThreadPoolExecutor(
+            max_workers=kwargs.get('max_workers', 10),
+            initializer=mark_worker_thread
+        )
         self._clients: Dict[str, Tuple[SyncClientWithSettings, ClientSettings]] = {}
+        # Clients are built at most once per key, without blocking the construction of other clients.
+        self._client_locks: Dict[str, Lock] = {}
+        self._client_locks_lock = Lock()
+        self._local_services: List[Union['LocalServiceBus', 'LocalBlobStorage']] = []
 
     def _build_transport(self, **kwargs):
-        # Check transport setting
-        import requests
-        from azure.core.pipeline.transport import RequestsTransport
-        session = requests.Session()
-        session.mount(
-            'https://',
-            requests.adapters.HTTPAdapter(
-                kwargs.pop('pool_connections', 25),
-                kwargs.pop('pool_maxsize', 25)
-            )
-        )
-        return TransportWrapper(
-            RequestsTransport(
-                session=session,
-                session_owner=False,
-                **kwargs
-            )
-        )
+        options = global_resources.transport_options()
+        options.update(kwargs)
+        return TransportWrapper(build_transport(global_resources.transport(), **options))
+
+    def _client_lock(self, client_key: str) -> Lock:
+        with self._client_locks_lock:
+            try:
+                return self._client_locks[client_key]
+            except KeyError:
+                lock = self._client_locks[client_key] = Lock()
+                return lock
+
+    def _cached_client(self, client_key: str, build: Callable[[], Tuple[Any, Any]]) -> Any:
+        try:
+            return self._clients[client_key][0]
+        except KeyError:
+            pass
+        with self._client_lock(client_key):
+            # Another thread may have built the client while this one waited.
+            try:
+                return self._clients[client_key][0]
+            except KeyError:
+                client, settings = build()
+                self._clients[client_key] = (client, settings)
+                return client
+
 
     @overload
     def get_client(
@@ -467,17 +1623,42 @@ class CloudMachineClient:
                 pass
         if name and name is not CloudmachineDefault:
             client_key = f"{name}:{client_key}"
-        try:
-            existing, settings = self._clients[client_key]
-            if ((not cls or (settings.cls() == cls)) and
-                (not api_version or (settings.api_version() == api_version)) and
-                (not client_options or (settings.client_options() == client_options))):
-                return existing
-            self._clients[client_key].pop(name)
-            existing.close()
-        except KeyError:
-            pass
+        with self._client_lock(client_key):
+            try:
+                existing, settings = self._clients[client_key]
+                if ((not cls or (settings.cls() == cls)) and
+                    (not api_version or (settings.api_version() == api_version)) and
+                    (not client_options or (settings.client_options() == client_options))):
+                    return existing
+                del self._clients[client_key]
+                existing.close()
+            except KeyError:
+                pass
+            return self._build_client(
+                client_key,
+                service,
+                sub_resource,
+                name=name,
+                cls=cls,
+                api_version=api_version,
+                client_options=client_options,
+                transport=transport,
+                credential=credential
+            )
 
+    def _build_client(
+            self,
+            client_key: str,
+            service: str,
+            sub_resource: Optional[str],
+            *,
+            name: str,
+            cls: Optional[Callable[..., ClientType]],
+            api_version: Optional[str],
+            client_options: Dict[str, Any],
+            transport: Optional[TransportInputTypes],
+            credential: Optional[CredentialInputTypes],
+    ) -> SyncClientWithSettings:
         if name is not CloudmachineDefault or service not in self._settings:
             new_settings = global_resources.get(
                 service,
@@ -522,74 +1703,180 @@ class CloudMachineClient:
                 self._listener_thread.start()
             except RuntimeError:
                 pass
-        try:
-            return self._clients["cm:storage:blob"][0]
-        except KeyError:
-            settings = self._settings['storage:blob']
-            if settings is None:
-                raise RuntimeError("CloudMachine storage resource has not been configured.")
-            client = settings.client(
-                cls=CloudMachineStorage,
-                transport=self.http_transport,
-                client_options={
-                    'account_name': settings.name()
-                }
-            )
-            self._clients["cm:storage:blob"] = (client, settings)
-            return client
+        return self._cached_client("cm:storage:blob", self._build_storage)
+
+    def _build_storage(self) -> Tuple[CloudMachineStorage, Any]:
+        settings = self._settings['storage:blob']
+        if settings is None:
+            raise RuntimeError("CloudMachine storage resource has not been configured.")
+        if settings == 'local':
+            return self._local_storage(), settings
+        client = settings.client(
+            cls=CloudMachineStorage,
+            transport=self.http_transport,
+            client_options={
+                'account_name': settings.name()
+            }
+        )
+        return client, settings
 
     @property
     def messaging(self) -> CloudMachineServiceBus:
-        try:
-            return self._clients["cm:servicebus"][0]
-        except KeyError:
-            settings = self._settings['servicebus']
-            if settings is None:
-                raise RuntimeError("CloudMachine messaging resource has not been configured.")
-            client = settings.client(
-                cls=CloudMachineServiceBus,
-                transport=self.http_transport,
-            )
-            self._clients["cm:servicebus"] = (client, settings)
-            return client
+        return self._cached_client("cm:servicebus", self._build_messaging)
+
+    def _build_messaging(self) -> Tuple[CloudMachineServiceBus, Any]:
+        settings = self._settings['servicebus']
+        if settings is None:
+            raise RuntimeError("CloudMachine messaging resource has not been configured.")
+        if settings == 'local':
+            return self._local_messaging(), settings
+        client = settings.client(
+            cls=CloudMachineServiceBus,
+            transport=self.http_transport,
+        )
+        return client, settings
+
+    def _local_config(self, service: str, **kwargs) -> CloudMachinePipelineConfig:
+        # The local stand-ins are plain HTTP and unauthenticated, so the bearer token policy is replaced.
+        return CloudMachinePipelineConfig(
+            authentication_policy=SansIOHTTPPolicy(),
+            transport=self.http_transport,
+            api_version=DEFAULT_API_VERSIONS[service],
+            metrics_service=service,
+            **kwargs
+        )
+
+    def _local_storage(self) -> CloudMachineStorage:
+        endpoint = self._client_options.get('local_storage_endpoint')
+        if not endpoint:
+            from ._local._storage import LocalBlobStorage
+            server = LocalBlobStorage(
+                self._client_options.get('local_storage_path'),
+                containers=['default']
+            ).start()
+            self._local_services.append(server)
+            endpoint = server.endpoint
+        return CloudMachineStorage(
+            endpoint=endpoint,
+            account_name='local',
+            credential=None,
+            container_name='default',
+            scope='',
+            executor=self._executor,
+            config=self._local_config('storage:blob', headers_policy=StorageHeadersPolicy()),
+        )
+
+    def _local_messaging(self) -> CloudMachineServiceBus:
+        endpoint = self._client_options.get('local_servicebus_endpoint')
+        if not endpoint:
+            from ._local._servicebus import LocalServiceBus
+            server = LocalServiceBus().start()
+            self._local_services.append(server)
+            endpoint = server.endpoint
+        return CloudMachineServiceBus(
+            endpoint=endpoint,
+            credential=None,
+            scope='',
+            executor=self._executor,
+            config=self._local_config('servicebus'),
+        )
 
     @property
     def data(self) -> CloudMachineTableData:
-        try:
-            return self._clients["cm:storage:table"][0]
-        except KeyError:
-            settings = self._settings['storage:table']
-            if settings is None:
-                raise RuntimeError("CloudMachine data resource has not been configured.")
-            client = settings.client(
-                cls=CloudMachineTableData,
-                transport=self.http_transport,
+        return self._cached_client("cm:storage:table", self._build_data)
+
+    def _build_data(self) -> Tuple[CloudMachineTableData, Any]:
+        settings = self._settings['storage:table']
+        if settings == 'local':
+            client = LocalTableData(
+                self._client_options.get('local_data_path', ':memory:'),
+                executor=self._executor
             )
-            self._clients["cm:storage:table"] = (client, settings)
-            return client
+            return client, settings
+        if settings is None:
+            raise RuntimeError("CloudMachine data resource has not been configured.")
+        client = settings.client(
+            cls=CloudMachineTableData,
+            transport=self.http_transport,
+            client_options={
+                'executor': self._executor
+            }
+        )
+        return client, settings
 
     @property
     def document_index(self) -> CloudMachineDocumentIndex:
-        try:
-            return self._clients["cm:documentindex"][0]
-        except KeyError:
-            search=self._settings['search']
-            if search is None:
-                raise RuntimeError("CloudMachine search resource has not been configured.")
-            openai=self._settings['openai']
-            # documentai=self._settings['documentai'],
-            new_client = CloudMachineDocumentIndex(
-                search=search,
-                openai=openai,
-            )
-            self._clients["cm:documentindex"] = (new_client, self._settings['search'])
-            return new_client
+        return self._cached_client("cm:documentindex", self._build_document_index)
+
+    def _build_document_index(self) -> Tuple[CloudMachineDocumentIndex, Any]:
+        search=self._settings['search']
+        if search is None:
+            raise RuntimeError("CloudMachine search resource has not been configured.")
+        openai=self._settings['openai']
+        embedding_cache = None
+        if isinstance(openai, ClientSettings) and openai.get('embeddings_cache', None) == 'table':
+            embedding_cache = TableEmbeddingCache(self.data)
+        # documentai=self._settings['documentai'],
+        new_client = CloudMachineDocumentIndex(
+            search=search,
+            openai=openai,
+            executor=self._executor,
+            embedding_cache=embedding_cache,
+        )
+        return new_client, search
+
+    def _warmup_service(self, service: str) -> None:
+        # Built through the cache rather than the properties, so that warming up
+        # storage doesn't start the event listener.
+        client_key, build = {
+            'storage': ("cm:storage:blob", self._build_storage),
+            'messaging': ("cm:servicebus", self._build_messaging),
+            'data': ("cm:storage:table", self._build_data),
+            'document_index': ("cm:documentindex", self._build_document_index),
+        }[service]
+        client = self._cached_client(client_key, build)
+        warmup = getattr(client, 'warmup', None)
+        if warmup:
+            warmup()
+
+    def warmup(
+            self,
+            services: Iterable[str] = ('storage', 'messaging', 'data'),
+            *,
+            timeout: Optional[float] = None
+    ) -> Dict[str, Exception]:
+        """Build clients, acquire tokens and open pooled connections concurrently, before taking traffic.
+
+        Warming up storage doesn't start the event listener; that still waits for the first
+        access to the ``storage`` property.
+
+        :param services: The clients to warm up, any of 'storage', 'messaging', 'data' and
+         'document_index'. Defaults to storage, messaging and data.
+        :keyword float timeout: The seconds to wait for all services to be warmed up.
+        :returns: The error raised for each service that could not be warmed up.
+        :rtype: dict[str, Exception]
+        """
+        futures: Dict[str, Future] = {}
+        for service in services:
+            if service not in ('storage', 'messaging', 'data', 'document_index'):
+                raise ValueError(f"Unexpected service: '{service}'.")
+            futures[service] = self._executor.submit(self._warmup_service, service)
+        done, _ = wait(futures.values(), timeout=timeout)
+        errors: Dict[str, Exception] = {}
+        for service, future in futures.items():
+            if future not in done:
+                errors[service] = TimeoutError(f"Warming up '{service}' did not complete in {timeout}s.")
+            elif future.exception() is not None:
+                errors[service] = future.exception()
+        return errors
 
     def close(self):
-        self._listener.close()
-        if self._listener_thread.is_alive():
+        if self._listener:
+            self._listener.close()
+        if self._listener_thread and self._listener_thread.is_alive():
             self._listener_thread.join()
-        for service in self._clients:
-            for client in self._clients[service]:
-                self._clients[service][client].close()
+        for server in self._local_services:
+            server.stop()
+        for client, _ in self._clients.values():
+            client.close()
         self.http_transport.close()
@@ -9,6 +9,8 @@ from azure.core.credentials import TokenCredential
 from azure.core.pipeline import PipelineResponse, PipelineRequest
 from azure.core.pipeline.policies import BearerTokenCredentialPolicy
 
+from ._profiling import profile_phase
+
 
 class _HttpChallenge:  # pylint:disable=too-few-public-methods
     """Represents a parsed HTTP WWW-Authentication Bearer challenge from a server.
@@ -82,6 +84,10 @@ class BearerTokenChallengePolicy(BearerTokenCredentialPolicy):
         self._discover_scopes = discover_scopes
         super().__init__(credential, *scopes, **kwargs)
 
+    def on_request(self, request: PipelineRequest) -> None:
+        with profile_phase('auth'):
+            super().on_request(request)
+
     def on_challenge(self, request: PipelineRequest, response: PipelineResponse) -> bool:
         """Authorize request according to an authentication challenge
 
@@ -106,8 +112,9 @@ class BearerTokenChallengePolicy(BearerTokenCredentialPolicy):
         except ValueError:
             return False
 
-        if self._discover_tenant:
-            self.authorize_request(request, scope, tenant_id=challenge.tenant_id)
-        else:
-            self.authorize_request(request, scope)
+        with profile_phase('auth'):
+            if self._discover_tenant:
+                self.authorize_request(request, scope, tenant_id=challenge.tenant_id)
+            else:
+                self.authorize_request(request, scope)
         return True
@@ -5,7 +5,8 @@
 # --------------------------------------------------------------------------
 
 import os
-from typing import Any, Dict, Optional, Union, Self, Type
+import threading
+from typing import Any, Callable, Dict, Optional, TypeVar, Union, Self, Type
 from typing_extensions import Self
 from concurrent.futures import Executor
 
@@ -16,16 +17,52 @@ from azure.core.credentials import (
     AzureSasCredential,
     SupportsTokenInfo
 )
-from azure.core.pipeline.policies import AzureKeyCredentialPolicy
+from azure.core.pipeline.policies import AzureKeyCredentialPolicy, AzureSasCredentialPolicy, HTTPPolicy, SansIOHTTPPolicy
 from azure.core.pipeline.transport import HttpTransport
-from azure.identity import DefaultAzureCredential
 from azure.core.rest import HttpRequest, HttpResponse
 
 from .._resources._client_settings import ClientSettings
+from .._resources._credential_cache import shared_token_credential
 from .._resources._resource_map import RESOURCE_SDK_MAP, DEFAULT_API_VERSIONS
-from ..provisioning._resource import generate_envvar
 from ._config import CloudMachinePipelineConfig
 from ._auth_policy import BearerTokenChallengePolicy
+from ._profiling import profile_operation, profile_phase
+
+T = TypeVar('T')
+
+
+_worker = threading.local()
+
+
+def mark_worker_thread() -> None:
+    """Mark the current thread as an executor worker, so that work it fans out runs inline.
+
+    Pass as the ``initializer`` of executors whose tasks call into the clients.
+    """
+    _worker.active = True
+
+
+def run_as_worker(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Call a function submitted to an executor, with its thread marked as a worker."""
+    previous = getattr(_worker, 'active', False)
+    _worker.active = True
+    try:
+        return func(*args, **kwargs)
+    finally:
+        _worker.active = previous
+
+
+def fan_out_executor(executor: Optional[Executor]) -> Optional[Executor]:
+    """The executor to fan work out to and wait on, or None to run it inline.
+
+    A task that waits on tasks it submitted to its own executor deadlocks once every worker
+    is waiting, so work that is already running on a worker thread runs inline. Workers are
+    threads started with ``mark_worker_thread`` as their initializer, and threads running a
+    task submitted through ``run_as_worker``.
+    """
+    if executor is None or getattr(_worker, 'active', False):
+        return None
+    return executor
 
 
 class CloudMachineClientlet:
@@ -46,18 +83,17 @@ class CloudMachineClientlet:
             scope: str,
             **kwargs
     ):
-        self._credential = credential
+        self._credential = shared_token_credential(credential)
         self._endpoint = endpoint.rstrip('/')
+        self._scope = scope
 
-        auth_policy = BearerTokenChallengePolicy(
-            self._credential,
-            scope
-        )
+        auth_policy = self._build_auth_policy(self._credential, scope)
         # TODO: Need to be able to swap out auth policy of existing config
         self._config = config or CloudMachinePipelineConfig(
             authentication_policy=auth_policy,
             transport=transport,
             api_version=api_version or DEFAULT_API_VERSIONS[self._id],
+            metrics_service=self._id,
             **kwargs
         )
         self._client = PipelineClient(
@@ -66,9 +102,24 @@ class CloudMachineClientlet:
         )
         self._executor = executor
 
+    def _build_auth_policy(self, credential: Any, scope: str) -> Union[HTTPPolicy, SansIOHTTPPolicy]:
+        if isinstance(credential, AzureSasCredential):
+            return AzureSasCredentialPolicy(credential)
+        if isinstance(credential, (AzureNamedKeyCredential, AzureKeyCredential)):
+            raise TypeError(f"{type(self).__name__} does not support authenticating with an account key.")
+        return BearerTokenChallengePolicy(credential, scope)
+
     def close(self) -> None:
         self._client.close()
 
+    def warmup(self) -> None:
+        """Acquire a token and open a pooled connection to the endpoint ahead of the first operation."""
+        if self._scope and hasattr(self._credential, 'get_token'):
+            self._credential.get_token(self._scope)
+        # The status is irrelevant, the connection is returned to the pool either way.
+        response = self._client.send_request(HttpRequest('HEAD', self._endpoint), metrics_operation='warmup')
+        response.close()
+
     # def resource_id(self) -> str:
     #     # TODO Fix this so that it works for any resource ID.
     #     for envvar in RESOURCE_SDK_MAP[self._id][0]:
@@ -79,10 +130,12 @@ class CloudMachineClientlet:
     #     raise ValueError(f"No resource ID found for {self._id}")
 
     def _send_request(self, request: HttpRequest, **kwargs) -> HttpResponse:
-        path_format_arguments = {
-            "endpoint": self._endpoint
-        }
-        request.url = self._client.format_url(request.url, **path_format_arguments)
-        response = self._client.send_request(request, **kwargs)
-        response.raise_for_status()
+        with profile_operation(f"{self._id}.{request.method.lower()}"):
+            with profile_phase('serialize'):
+                path_format_arguments = {
+                    "endpoint": self._endpoint
+                }
+                request.url = self._client.format_url(request.url, **path_format_arguments)
+            response = self._client.send_request(request, **kwargs)
+            response.raise_for_status()
         return response
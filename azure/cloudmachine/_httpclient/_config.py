@@ -9,6 +9,11 @@ from typing import Any, Iterable, Optional, TypeVar
 from azure.core.pipeline import policies as core_policies, Pipeline
 from azure.core.pipeline.transport import HttpTransport
 
+from .._resources._resources import resources
+from ._metrics import MetricsPolicy
+from ._profiling import NetworkTimingPolicy
+from ._retry import AdaptiveRetryPolicy
+
 
 HTTPResponseType = TypeVar("HTTPResponseType")
 HTTPRequestType = TypeVar("HTTPRequestType")
@@ -43,6 +48,11 @@ class CloudMachinePipelineConfig:
                 kwargs.get("proxy_policy") or core_policies.ProxyPolicy(**kwargs),
                 #core_policies.ContentDecodePolicy(**kwargs),
             ]
+            metrics_policy = kwargs.get("metrics_policy")
+            if metrics_policy is None and resources.metrics():
+                metrics_policy = MetricsPolicy(**kwargs)
+            if metrics_policy:
+                policies.append(metrics_policy)
             if isinstance(per_call_policies, Iterable):
                 policies.extend(per_call_policies)
             else:
@@ -50,7 +60,7 @@ class CloudMachinePipelineConfig:
 
             policies.extend(
                 [
-                    kwargs.get("retry_policy") or core_policies.RetryPolicy(**kwargs),
+                    kwargs.get("retry_policy") or AdaptiveRetryPolicy(**kwargs),
                     self.authentication_policy,
                     kwargs.get("custom_hook_policy") or core_policies.CustomHookPolicy(**kwargs),
                 ]
@@ -65,6 +75,7 @@ class CloudMachinePipelineConfig:
                     kwargs.get("logging_policy") or core_policies.NetworkTraceLoggingPolicy(**kwargs),
                     core_policies.DistributedTracingPolicy(**kwargs),
                     kwargs.get("http_logging_policy") or core_policies.HttpLoggingPolicy(**kwargs),
+                    NetworkTimingPolicy(),
                 ]
             )
         else:
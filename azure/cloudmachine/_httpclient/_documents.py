@@ -5,12 +5,12 @@
 # --------------------------------------------------------------------------
 
 import base64
+from collections import deque
+from concurrent.futures import Executor, Future
 from io import BytesIO
-from itertools import chain
 import json
 from dataclasses import dataclass, field
 import os
-from random import randint
 import re
 import time
 from typing import (
@@ -33,36 +33,17 @@ from typing import (
 
 from azure.core.exceptions import ResourceNotFoundError
 from azure.core.pipeline.transport import HttpTransport
-#TODO: Optional import, "search" is not a requried dependency.
-from azure.search.documents.models import (
-    QueryCaptionResult,
-    QueryType,
-    VectorizedQuery,
-    VectorQuery,
-)
-from azure.search.documents.indexes.models import (
-    HnswAlgorithmConfiguration,
-    HnswParameters,
-    SearchableField,
-    SearchField,
-    SearchFieldDataType,
-    SearchIndex,
-    SemanticConfiguration,
-    SemanticField,
-    SemanticPrioritizedFields,
-    SemanticSearch,
-    SimpleField,
-    VectorSearch,
-    VectorSearchProfile,
-    VectorSearchVectorizer,
-)
-
 from .._resources._resource_map import *
 from .._resources._client_settings import ClientSettings
+from ._base import fan_out_executor, run_as_worker
 from ._storage import StorageFile
+from ._retry import retry_call
+from ._ratelimit import RateLimiter, rate_limiter
+from ._embedding_cache import EmbeddingCache, SqliteEmbeddingCache, embedding_key
 
 if TYPE_CHECKING:
     from .._resources._client_types import *
+    from azure.search.documents.models import VectorQuery
 
 
 
@@ -137,24 +118,44 @@ class CloudMachineDocumentIndex:
             documentai: Optional[ClientSettings['DocumentIntelligenceClient']] = None,
             openai: Optional[ClientSettings['AzureOpenAI']] = None,
             transport: Optional[HttpTransport] = None,
+            executor: Optional[Executor] = None,
+            embedding_cache: Optional[EmbeddingCache] = None,
     ):
-        from openai import RateLimitError, AzureOpenAI, DEFAULT_MAX_RETRIES
+        from openai import AzureOpenAI
         from openai.types.chat import ChatCompletion, ChatCompletionMessageParam
 
         self._documentai = documentai
         self._search = search
         self._openai = openai
+        self._executor = executor
+        self._embedding_cache = embedding_cache
         self._fields: List[Union[str, dict]] = search.get('document_index_fields', [])
         self._index_client: 'SearchIndexClient' = self._search.client(transport=transport)
         self._search_client: 'SearchClient' = self._index_client.get_search_client(self.index_name)
         self._supports_vectorization = False
         try:
             self._embeddings = self._openai.client(
-                client_options={'azure_deployment': self.embeddings_deployment, 'max_retries': DEFAULT_MAX_RETRIES}
+                # Retries are made by retry_call, which shares its budget and backoff with the clientlets.
+                client_options={'azure_deployment': self.embeddings_deployment, 'max_retries': 0}
             )
             self.embeddings_model
         except RuntimeError as e:
             self._embeddings = None
+        self._rate_limiter: Optional[RateLimiter] = None
+        if self._embeddings:
+            tokens_per_minute = self._openai.get('embeddings_tokens_per_minute', None)
+            requests_per_minute = self._openai.get('embeddings_requests_per_minute', None)
+            self._rate_limiter = rate_limiter(
+                str(self._embeddings.base_url),
+                tokens_per_minute=int(tokens_per_minute) if tokens_per_minute else None,
+                requests_per_minute=int(requests_per_minute) if requests_per_minute else None,
+                path=self._openai.get('embeddings_rate_limit_file', None)
+            )
+            if self._embedding_cache is None:
+                cache_path = self._openai.get('embeddings_cache', None)
+                # A 'table' cache needs the data client, so it is passed in by CloudMachineClient.
+                if cache_path and cache_path != 'table':
+                    self._embedding_cache = SqliteEmbeddingCache(cache_path)
         from ._textsplitter import SentenceTextSplitter, SimpleTextSplitter
         from ._parser import DocumentAnalysisParser, JsonParser, TextParser, LocalPdfParser
         sentence_text_splitter = SentenceTextSplitter()
@@ -296,6 +297,22 @@ class CloudMachineDocumentIndex:
         return parts
 
     def _create_index(self):
+        # "search" is an optional dependency, so it is only loaded once an index is needed.
+        from azure.search.documents.indexes.models import (
+            HnswAlgorithmConfiguration,
+            HnswParameters,
+            SearchableField,
+            SearchField,
+            SearchFieldDataType,
+            SearchIndex,
+            SemanticConfiguration,
+            SemanticField,
+            SemanticPrioritizedFields,
+            SemanticSearch,
+            SimpleField,
+            VectorSearch,
+            VectorSearchProfile,
+        )
         vectorizers = []
         # if self.vectorized_search:
         #     from azure.search.documents.indexes.models import AzureOpenAIVectorizer, AzureOpenAIVectorizerParameters
@@ -424,6 +441,13 @@ class CloudMachineDocumentIndex:
             batching: Union[str, Tuple[Union[Tokenizer, str, Literal['gpt2', 'r50k_base', 'p50k_base', 'p50k_edit', 'cl100k_base', 'o200k_base']], int, int]],
             parts: List[Tuple[int, str]]
     ) -> List[List[Tuple[int, str]]]:
+        return self._batch_parts(batching, parts)[0]
+
+    def _batch_parts(
+            self,
+            batching: Union[str, Tuple[Union[Tokenizer, str], int, int]],
+            parts: List[Tuple[int, str]]
+    ) -> Tuple[List[List[Tuple[int, str]]], List[int]]:
         if isinstance(batching, str):
             batch_info = self.SUPPORTED_BATCH_MODEL.get(batching)
             if not batch_info:
@@ -441,12 +465,14 @@ class CloudMachineDocumentIndex:
             batch_max_size = batching[2]
 
         batches: List[List[Tuple[int, str]]] = []
+        batch_tokens: List[int] = []
         batch: List[Tuple[int, str]] = []
         batch_token_length = 0
         for part in parts:
             text_token_length = len(tokenizer(part[1]))
             if batch_token_length + text_token_length >= batch_token_limit and len(batch) > 0:
                 batches.append(batch)
+                batch_tokens.append(batch_token_length)
                 batch = []
                 batch_token_length = 0
 
@@ -454,53 +480,98 @@ class CloudMachineDocumentIndex:
             batch_token_length = batch_token_length + text_token_length
             if len(batch) == batch_max_size:
                 batches.append(batch)
+                batch_tokens.append(batch_token_length)
                 batch = []
                 batch_token_length = 0
 
         if len(batch) > 0:
             batches.append(batch)
-        return batches
+            batch_tokens.append(batch_token_length)
+        return batches, batch_tokens
 
-    def _create_embedding_batch(self, batches: List[List[Tuple[int, str]]]) -> List[List[float]]:
-        embeddings = []
+    def _create_embeddings(self, inputs: Union[str, List[str]], tokens: Optional[int] = None) -> List[List[float]]:
+        from openai import APIConnectionError, InternalServerError, RateLimitError
         kwargs = {}
         if self.embeddings_dimensions:
             kwargs = {'dimensions': self.embeddings_dimensions}
-        for batch in batches:
-            for attempt in range(15):
-                try:
-                    inputs = [part[1] for part in batch]
-                    emb_response = self._embeddings.embeddings.create(
-                        model=self.embeddings_model, input=inputs, **kwargs
-                    )
-                    embeddings.extend([data.embedding for data in emb_response.data])
-                    break
-                except RateLimitError:
-                    if attempt == 14:
-                        raise
-                    sleep_time = randint(15, 60)
-                    time.sleep(sleep_time)
+        if tokens is None:
+            # Without a tokenizer, assume the usual four characters per token.
+            texts = [inputs] if isinstance(inputs, str) else inputs
+            tokens = sum(len(text) for text in texts) // 4 + 1
+
+        def _create():
+            if self._rate_limiter:
+                self._rate_limiter.acquire(tokens)
+            return self._embeddings.embeddings.create(model=self.embeddings_model, input=inputs, **kwargs)
+
+        emb_response = retry_call(
+            _create,
+            endpoint=str(self._embeddings.base_url),
+            retry_on=(RateLimitError, APIConnectionError, InternalServerError),
+            get_headers=lambda e: getattr(getattr(e, 'response', None), 'headers', None),
+        )
+        return [data.embedding for data in emb_response.data]
+
+    def _create_embedding_batch(
+            self,
+            batches: List[List[Tuple[int, str]]],
+            batch_tokens: Optional[List[int]] = None
+    ) -> List[List[float]]:
+        embeddings = []
+        window = int(self._openai.get('embeddings_concurrency', 4))
+        executor = fan_out_executor(self._executor)
+        if not executor or window <= 1 or len(batches) <= 1:
+            for index, batch in enumerate(batches):
+                tokens = batch_tokens[index] if batch_tokens else None
+                embeddings.extend(self._create_embeddings([part[1] for part in batch], tokens))
+            return embeddings
+
+        # Up to `window` batches are in flight, and results are collected in submission
+        # order so that the embeddings stay aligned with the parts.
+        pending: 'deque[Future[List[List[float]]]]' = deque()
+        try:
+            for index, batch in enumerate(batches):
+                if len(pending) >= window:
+                    embeddings.extend(pending.popleft().result())
+                tokens = batch_tokens[index] if batch_tokens else None
+                pending.append(
+                    executor.submit(run_as_worker, self._create_embeddings, [part[1] for part in batch], tokens)
+                )
+            while pending:
+                embeddings.extend(pending.popleft().result())
+        except BaseException:
+            for future in pending:
+                future.cancel()
+            raise
         return embeddings
 
     def _create_embedding_single(self, parts: List[Tuple[int, str]]) -> List[List[float]]:
         embeddings = []
-        kwargs = {}
-        if self.embeddings_dimensions:
-            kwargs = {'dimensions': self.embeddings_dimensions}
         for part in parts:
-            for attempt in range(15):
-                try:
-                    emb_response = self._embeddings.embeddings.create(
-                        model=self.embeddings_model, input=part[1], **kwargs
-                    )
-                    embeddings.append(emb_response.data[0].embedding)
-                except RateLimitError:
-                    if attempt == 14:
-                        raise
-                    sleep_time = randint(15, 60)
-                    time.sleep(sleep_time)
+            embeddings.extend(self._create_embeddings(part[1]))
         return embeddings
 
+    def _embed_parts(self, parts: List[Tuple[int, str]]) -> List[List[float]]:
+        keys = [embedding_key(self.embeddings_model, self.embeddings_dimensions, part[1]) for part in parts]
+        cached = self._embedding_cache.get_many(set(keys)) if self._embedding_cache else {}
+        # Each distinct text that is not cached is embedded once.
+        missing: Dict[Tuple[str, str], Tuple[int, str]] = {}
+        for key, part in zip(keys, parts):
+            if key not in cached:
+                missing.setdefault(key, part)
+        if missing:
+            missing_parts = list(missing.values())
+            if self.embeddings_model in self.SUPPORTED_BATCH_MODEL and not self._openai.get('disable_batch', False):
+                batches, batch_tokens = self._batch_parts(self.embeddings_model, missing_parts)
+                created = self._create_embedding_batch(batches, batch_tokens)
+            else:
+                created = self._create_embedding_single(missing_parts)
+            new_embeddings = dict(zip(missing, created))
+            if self._embedding_cache:
+                self._embedding_cache.set_many(new_embeddings)
+            cached.update(new_embeddings)
+        return [cached[key] for key in keys]
+
     def get_sources(
         self,
         results: List[Document],
@@ -568,13 +639,8 @@ class CloudMachineDocumentIndex:
                 else:
                     raise ValueError("Unable to determine filename.")
             if self._embeddings:
-                if self.embeddings_model in self.SUPPORTED_BATCH_MODEL and not self._openai.get('disable_batch', False):
-                    parts = self.prepare_file(file, filename=filename, embedding_batching=self.embeddings_model)
-                    embeddings = self._create_embedding_batch(parts)
-                    parts = chain(*parts)
-                else:
-                    parts = self.prepare_file(file, filename=filename)
-                    embeddings = self._create_embedding_single(parts)
+                parts = self.prepare_file(file, filename=filename)
+                embeddings = self._embed_parts(parts)
             else:
                 parts = self.prepare_file(file, filename=filename)
         parts = list(parts)
@@ -696,15 +762,8 @@ class CloudMachineDocumentIndex:
         search_text = query or ""
         search_vectors = vectors or []
         if self._embeddings and query and not embedding:
-            dimensions_args = {}
-            if self.embeddings_dimensions:
-                dimensions_args = {'dimensions': self.embeddings_dimensions}
-            embedding_result = self._embeddings.embeddings.create(
-                model=self.embeddings_model,
-                input=query,
-                **dimensions_args,
-            )
-            embedding = embedding_result.data[0].embedding
+            # Retried and rate limited like indexing, since the client itself doesn't retry.
+            embedding = self._create_embeddings(query)[0]
 
         if embedding:
             from azure.search.documents.models import VectorizedQuery, QueryType
@@ -761,3 +820,5 @@ class CloudMachineDocumentIndex:
             self._index_client.close()
         if self._embeddings:
             self._embeddings.close()
+        if self._embedding_cache:
+            self._embedding_cache.close()
@@ -0,0 +1,136 @@
+# -------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for
+# license information.
+# --------------------------------------------------------------------------
+
+import base64
+import hashlib
+import sqlite3
+from array import array
+from threading import RLock
+from typing import TYPE_CHECKING, Dict, Iterable, List, Mapping, Optional, Protocol, Tuple
+
+from azure.core.exceptions import ResourceNotFoundError
+
+if TYPE_CHECKING:
+    from .._client import CloudMachineTableData
+
+# The model and dimensions, and the SHA-256 of the text.
+EmbeddingKey = Tuple[str, str]
+
+# SQLite limits the number of parameters in a statement.
+_MAX_SQL_PARAMETERS = 500
+
+
+def embedding_key(model: Optional[str], dimensions: Optional[int], text: str) -> EmbeddingKey:
+    return f"{model}:{dimensions or 0}", hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def _pack(embedding: List[float]) -> bytes:
+    # Embeddings are float32 on the service, so nothing is lost by storing them as such.
+    return array('f', embedding).tobytes()
+
+
+def _unpack(data: bytes) -> List[float]:
+    values = array('f')
+    values.frombytes(data)
+    return values.tolist()
+
+
+class EmbeddingCache(Protocol):
+    def get_many(self, keys: Iterable[EmbeddingKey]) -> Dict[EmbeddingKey, List[float]]:
+        ...
+
+    def set_many(self, embeddings: Mapping[EmbeddingKey, List[float]]) -> None:
+        ...
+
+    def close(self) -> None:
+        ...
+
+
+class SqliteEmbeddingCache:
+    """Caches embeddings in a local SQLite database, that processes on the machine can share."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._lock = RLock()
+        with self._lock:
+            if path != ':memory:':
+                self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                "scope TEXT NOT NULL, hash TEXT NOT NULL, embedding BLOB NOT NULL, PRIMARY KEY (scope, hash)"
+                ") WITHOUT ROWID"
+            )
+
+    def get_many(self, keys: Iterable[EmbeddingKey]) -> Dict[EmbeddingKey, List[float]]:
+        by_scope: Dict[str, List[str]] = {}
+        for scope, digest in keys:
+            by_scope.setdefault(scope, []).append(digest)
+        found: Dict[EmbeddingKey, List[float]] = {}
+        with self._lock:
+            for scope, digests in by_scope.items():
+                for i in range(0, len(digests), _MAX_SQL_PARAMETERS):
+                    chunk = digests[i: i + _MAX_SQL_PARAMETERS]
+                    rows = self._connection.execute(
+                        f"SELECT hash, embedding FROM embeddings WHERE scope = ? AND hash IN ({','.join('?' * len(chunk))})",
+                        [scope, *chunk]
+                    )
+                    for digest, data in rows:
+                        found[(scope, digest)] = _unpack(data)
+        return found
+
+    def set_many(self, embeddings: Mapping[EmbeddingKey, List[float]]) -> None:
+        with self._lock:
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO embeddings (scope, hash, embedding) VALUES (?, ?, ?)",
+                [(scope, digest, _pack(e)) for (scope, digest), e in embeddings.items()]
+            )
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
+
+
+class TableEmbeddingCache:
+    """Caches embeddings in a table, so that they are shared by every worker that indexes documents.
+
+    Entities are partitioned by model and dimensions, and keyed by the hash of the text.
+    """
+
+    def __init__(self, data: 'CloudMachineTableData', table: str = 'embeddingcache'):
+        self._data = data
+        self._table = table
+
+    def get_many(self, keys: Iterable[EmbeddingKey]) -> Dict[EmbeddingKey, List[float]]:
+        keys = list(keys)
+        if not keys:
+            return {}
+        try:
+            results = self._data.query_many(self._table, *keys, select=['PartitionKey', 'RowKey', 'embedding'])
+        except ResourceNotFoundError:
+            # The table is created on first write.
+            return {}
+        return {
+            key: _unpack(base64.b64decode(entities[0]['embedding']))
+            for key, entities in results.items() if entities
+        }
+
+    def set_many(self, embeddings: Mapping[EmbeddingKey, List[float]]) -> None:
+        self._data.upsert(
+            self._table,
+            *(
+                {
+                    'PartitionKey': scope,
+                    'RowKey': digest,
+                    # Stored as a string, which holds up to 32K characters, the size of 6144 dimensions.
+                    'embedding': base64.b64encode(_pack(e)).decode('ascii'),
+                }
+                for (scope, digest), e in embeddings.items()
+            )
+        )
+
+    def close(self) -> None:
+        pass
@@ -0,0 +1,295 @@
+# -------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for
+# license information.
+# --------------------------------------------------------------------------
+
+import bisect
+import time
+from threading import Lock
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+from urllib.parse import parse_qsl, unquote, urlparse
+
+from azure.core.pipeline import PipelineRequest, PipelineResponse
+from azure.core.pipeline.policies import HTTPPolicy
+
+Labels = Tuple[Tuple[str, str], ...]
+Listener = Callable[[str, str, float, Dict[str, str]], None]
+
+# Exponential latency buckets from 1ms to ~65s.
+LATENCY_BUCKETS: Tuple[float, ...] = tuple(0.001 * 2 ** i for i in range(17))
+
+REQUESTS = "cloudmachine_requests_total"
+RETRIES = "cloudmachine_request_retries_total"
+REQUEST_BYTES = "cloudmachine_request_bytes_total"
+RESPONSE_BYTES = "cloudmachine_response_bytes_total"
+DURATION = "cloudmachine_request_duration_seconds"
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class Histogram:
+    """A fixed-bucket histogram, with quantiles estimated by interpolating within a bucket."""
+
+    def __init__(self, buckets: Sequence[float] = LATENCY_BUCKETS) -> None:
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float) -> Optional[float]:
+        if not self.count:
+            return None
+        rank = q * self.count
+        cumulative = 0
+        for index, count in enumerate(self.counts):
+            if cumulative + count >= rank and count:
+                lower = self.buckets[index - 1] if index else 0.0
+                upper = self.buckets[index] if index < len(self.buckets) else self.buckets[-1]
+                return lower + (upper - lower) * (rank - cumulative) / count
+            cumulative += count
+        return self.buckets[-1]
+
+
+class MetricsRegistry:
+    """A thread-safe, in-process store of counters and histograms keyed by name and labels.
+
+    Listeners added with ``add_listener`` are called with every recorded value, which is
+    how the values are forwarded to OpenTelemetry; ``to_prometheus`` renders the current
+    values in the Prometheus text format.
+    """
+
+    def __init__(self) -> None:
+        self._lock = Lock()
+        self._counters: Dict[Tuple[str, Labels], float] = {}
+        self._histograms: Dict[Tuple[str, Labels], Histogram] = {}
+        self._listeners: List[Listener] = []
+
+    def add_listener(self, listener: Listener) -> None:
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener: Listener) -> None:
+        self._listeners.remove(listener)
+
+    def increment(self, name: str, value: float = 1, **labels: str) -> None:
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+        for listener in self._listeners:
+            listener('counter', name, value, labels)
+
+    def observe(self, name: str, value: float, **labels: str) -> None:
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            try:
+                histogram = self._histograms[key]
+            except KeyError:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(value)
+        for listener in self._listeners:
+            listener('histogram', name, value, labels)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    def snapshot(self) -> Dict[str, List[Dict[str, Any]]]:
+        with self._lock:
+            counters = [
+                {'name': name, 'labels': dict(labels), 'value': value}
+                for (name, labels), value in self._counters.items()
+            ]
+            histograms = [
+                {
+                    'name': name,
+                    'labels': dict(labels),
+                    'count': h.count,
+                    'sum': h.sum,
+                    'p50': h.quantile(0.5),
+                    'p95': h.quantile(0.95),
+                    'p99': h.quantile(0.99),
+                }
+                for (name, labels), h in self._histograms.items()
+            ]
+        return {'counters': counters, 'histograms': histograms}
+
+    def to_prometheus(self) -> str:
+        def _format(labels: Labels, extra: Labels = ()) -> str:
+            pairs = [f'{k}="{_escape(v)}"' for k, v in labels + extra]
+            return "{" + ",".join(pairs) + "}" if pairs else ""
+
+        lines = []
+        with self._lock:
+            for name in sorted({n for n, _ in self._counters}):
+                lines.append(f"# TYPE {name} counter")
+                for (counter, labels), value in self._counters.items():
+                    if counter == name:
+                        lines.append(f"{name}{_format(labels)} {value}")
+            for name in sorted({n for n, _ in self._histograms}):
+                lines.append(f"# TYPE {name} histogram")
+                for (histogram, labels), h in self._histograms.items():
+                    if histogram != name:
+                        continue
+                    cumulative = 0
+                    for bound, count in zip(h.buckets + (float('inf'),), h.counts):
+                        cumulative += count
+                        le = "+Inf" if bound == float('inf') else repr(bound)
+                        lines.append(f"{name}_bucket{_format(labels, (('le', le),))} {cumulative}")
+                    lines.append(f"{name}_sum{_format(labels)} {h.sum}")
+                    lines.append(f"{name}_count{_format(labels)} {h.count}")
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+
+
+class OpenTelemetryMetricsExporter:
+    """Forwards every value recorded in a registry to the instruments of an OpenTelemetry meter.
+
+    :param meter: An ``opentelemetry.metrics.Meter``.
+    :param registry: The registry to forward. Defaults to the global registry.
+    """
+
+    def __init__(self, meter: Any, registry: Optional[MetricsRegistry] = None) -> None:
+        self._meter = meter
+        self._registry = registry or metrics
+        self._instruments: Dict[str, Any] = {}
+        self._registry.add_listener(self)
+
+    def __call__(self, kind: str, name: str, value: float, labels: Dict[str, str]) -> None:
+        try:
+            instrument = self._instruments[name]
+        except KeyError:
+            if kind == 'counter':
+                instrument = self._meter.create_counter(name)
+            else:
+                instrument = self._meter.create_histogram(name, unit='s')
+            self._instruments[name] = instrument
+        if kind == 'counter':
+            instrument.add(value, attributes=labels)
+        else:
+            instrument.record(value, attributes=labels)
+
+    def close(self) -> None:
+        self._registry.remove_listener(self)
+
+
+def _parse_url(url: str) -> Tuple[List[str], Dict[str, str]]:
+    parsed = urlparse(url)
+    return [unquote(p) for p in parsed.path.split('/') if p], dict(parse_qsl(parsed.query))
+
+
+def _classify_storage(method: str, path: List[str], params: Dict[str, str], headers: Any) -> Tuple[str, str]:
+    container = path[0] if path else ''
+    comp = params.get('comp')
+    if comp == 'batch':
+        return 'batch', container
+    if comp == 'list':
+        return 'list', container
+    if params.get('restype') == 'container':
+        return f"{method.lower()}_container", container
+    if comp:
+        return f"{method.lower()}_{comp}", container
+    return {'PUT': 'upload', 'GET': 'download', 'HEAD': 'get_properties', 'DELETE': 'delete'}.get(
+        method, method.lower()), container
+
+
+def _classify_servicebus(method: str, path: List[str], params: Dict[str, str], headers: Any) -> Tuple[str, str]:
+    if 'messages' not in path:
+        return 'get_runtime_info', "/".join(path)
+    index = path.index('messages')
+    entity = "/".join(path[:index])
+    operation = path[index + 1:]
+    if operation == ['head']:
+        return ('receive' if method == 'POST' else 'receive_and_delete'), entity
+    if not operation:
+        return 'send', entity
+    return {'DELETE': 'complete', 'PUT': 'abandon', 'POST': 'renew_lock'}.get(method, method.lower()), entity
+
+
+def _classify_tables(method: str, path: List[str], params: Dict[str, str], headers: Any) -> Tuple[str, str]:
+    if not path:
+        return method.lower(), ''
+    resource = path[-1]
+    if resource == '$batch':
+        return 'batch', ''
+    if resource == 'Tables':
+        return 'create_table' if method == 'POST' else 'list_tables', ''
+    table, _, keys = resource.partition('(')
+    if method == 'GET':
+        return ('get_entity' if keys.strip(')') else 'query'), table
+    if method == 'POST':
+        return 'insert', table
+    if method in ('PUT', 'MERGE'):
+        return ('update' if headers.get('If-Match') not in (None, '*') else 'upsert'), table
+    return method.lower(), table
+
+
+_CLASSIFIERS = {
+    'storage:blob': _classify_storage,
+    'servicebus': _classify_servicebus,
+    'storage:table': _classify_tables,
+}
+
+
+def _content_length(headers: Any) -> int:
+    try:
+        return int(headers.get('Content-Length') or 0)
+    except (TypeError, ValueError):
+        return 0
+
+
+class MetricsPolicy(HTTPPolicy):
+    """Records request counts, bytes sent and received, retries, status codes and latency.
+
+    Values are tagged with the clientlet service, the operation and the container, queue or
+    table. The operation is inferred from the request, or can be set per call with the
+    ``metrics_operation`` keyword argument. Place it before the retry policy, so that the
+    latency includes retries and the retry count is available from the response context.
+
+    :keyword str metrics_service: The ``_id`` of the clientlet that owns the pipeline.
+    :keyword metrics_registry: The registry to record into. Defaults to the global registry.
+    :paramtype metrics_registry: ~azure.cloudmachine._httpclient._metrics.MetricsRegistry
+    """
+
+    def __init__(self, *, metrics_service: Optional[str] = None, metrics_registry: Optional[MetricsRegistry] = None, **kwargs: Any) -> None:
+        super().__init__()
+        self.service = metrics_service or 'unknown'
+        self.registry = metrics_registry or metrics
+        self._classify = _CLASSIFIERS.get(self.service)
+
+    def _labels(self, request: PipelineRequest) -> Dict[str, str]:
+        http_request = request.http_request
+        operation = request.context.options.pop('metrics_operation', None)
+        resource = ''
+        if self._classify:
+            path, params = _parse_url(http_request.url)
+            inferred, resource = self._classify(http_request.method, path, params, http_request.headers)
+            operation = operation or inferred
+        return {'service': self.service, 'operation': operation or http_request.method.lower(), 'resource': resource}
+
+    def send(self, request: PipelineRequest) -> PipelineResponse:
+        labels = self._labels(request)
+        self.registry.increment(REQUEST_BYTES, _content_length(request.http_request.headers), **labels)
+        start = time.perf_counter()
+        try:
+            response = self.next.send(request)
+        except Exception:
+            self.registry.observe(DURATION, time.perf_counter() - start, **labels)
+            self.registry.increment(REQUESTS, status='error', **labels)
+            raise
+        self.registry.observe(DURATION, time.perf_counter() - start, **labels)
+        self.registry.increment(REQUESTS, status=str(response.http_response.status_code), **labels)
+        self.registry.increment(RESPONSE_BYTES, _content_length(response.http_response.headers), **labels)
+        retries = len(response.context.get('history') or [])
+        if retries:
+            self.registry.increment(RETRIES, retries, **labels)
+        return response
@@ -8,8 +8,6 @@ if TYPE_CHECKING:
     from azure.ai.documentintelligence import DocumentIntelligenceClient
     from azure.ai.documentintelligence.models import DocumentTable
 
-from pypdf import PdfReader
-
 
 logger = logging.getLogger("ingester")
 
@@ -72,6 +70,7 @@ class LocalPdfParser:
 
     def __call__(self, content: IO[bytes]) -> Generator[Tuple[int, int, str], None, None]:
         # logger.info("Extracting text from '%s' using local PDF parser (pypdf)", content.name)
+        from pypdf import PdfReader
         reader = PdfReader(content)
         pages = reader.pages
         offset = 0
@@ -0,0 +1,141 @@
+# -------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for
+# license information.
+# --------------------------------------------------------------------------
+
+import functools
+import logging
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, List, Optional, TypeVar
+from urllib.parse import urlparse
+
+from azure.core.pipeline import PipelineRequest, PipelineResponse
+from azure.core.pipeline.policies import HTTPPolicy
+
+from .._resources._resources import resources
+from ._metrics import metrics
+
+_LOGGER = logging.getLogger("azure.cloudmachine.profiling")
+
+OPERATION_DURATION = "cloudmachine_operation_duration_seconds"
+PHASE_DURATION = "cloudmachine_operation_phase_seconds"
+PHASES = ('serialize', 'auth', 'network', 'deserialize')
+
+_current: ContextVar[Optional['OperationProfile']] = ContextVar('cloudmachine_profile', default=None)
+F = TypeVar('F', bound=Callable[..., Any])
+
+
+class OperationProfile:
+    """The wall time of one clientlet operation, split into phases.
+
+    Time that is not attributed to serialization, token acquisition, network wait or
+    deserialization is reported as ``other``. Network wait covers the time until the
+    response headers arrive; streamed bodies are read as part of deserialization.
+    """
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.phases: Dict[str, float] = dict.fromkeys(PHASES, 0.0)
+        self.requests: List[Dict[str, Any]] = []
+        self._start = time.perf_counter()
+        self.duration: Optional[float] = None
+
+    def add(self, phase: str, seconds: float) -> None:
+        self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+    def add_request(self, request: Any, response: Any, seconds: float) -> None:
+        url = urlparse(request.url)
+        self.requests.append({
+            'method': request.method,
+            # The query is left out, as it may hold a SAS token.
+            'url': f"{url.scheme}://{url.netloc}{url.path}",
+            'status': response.status_code,
+            'request_id': response.headers.get('x-ms-request-id') or request.headers.get('x-ms-client-request-id'),
+            'request_bytes': request.headers.get('Content-Length'),
+            'response_bytes': response.headers.get('Content-Length'),
+            'seconds': round(seconds, 6),
+        })
+
+    def finish(self, *, record: bool, threshold: Optional[float]) -> None:
+        self.duration = time.perf_counter() - self._start
+        self.phases['other'] = max(self.duration - sum(self.phases[p] for p in PHASES), 0.0)
+        if record:
+            metrics.observe(OPERATION_DURATION, self.duration, operation=self.name)
+            for phase, seconds in self.phases.items():
+                metrics.observe(PHASE_DURATION, seconds, operation=self.name, phase=phase)
+        if threshold is not None and self.duration >= threshold:
+            _LOGGER.warning(
+                "Slow operation %s took %.3fs (%s). Requests: %s",
+                self.name,
+                self.duration,
+                ", ".join(f"{p}={s:.3f}s" for p, s in self.phases.items()),
+                self.requests
+            )
+
+
+@contextmanager
+def profile_operation(name: str) -> Iterator[Optional[OperationProfile]]:
+    """Profile an operation, unless profiling and the slow-operation log are both off.
+
+    Operations nested in an operation that is already being profiled are attributed to it.
+    """
+    current = _current.get()
+    if current is not None:
+        yield current
+        return
+    record = resources.profiling()
+    threshold = resources.slow_operation_threshold()
+    if not record and threshold is None:
+        yield None
+        return
+    profile = OperationProfile(name)
+    token = _current.set(profile)
+    try:
+        yield profile
+    finally:
+        _current.reset(token)
+        profile.finish(record=record, threshold=threshold)
+
+
+@contextmanager
+def profile_phase(phase: str) -> Iterator[None]:
+    profile = _current.get()
+    if profile is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.add(phase, time.perf_counter() - start)
+
+
+def profiled(name: str) -> Callable[[F], F]:
+    def decorator(func: F) -> F:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with profile_operation(name):
+                return func(*args, **kwargs)
+        return wrapper  # type: ignore
+    return decorator
+
+
+class NetworkTimingPolicy(HTTPPolicy):
+    """Attributes the time spent in the transport to the operation being profiled.
+
+    This must be the last policy in the pipeline, so that only the transport is measured.
+    """
+
+    def send(self, request: PipelineRequest) -> PipelineResponse:
+        profile = _current.get()
+        if profile is None:
+            return self.next.send(request)
+        start = time.perf_counter()
+        response = self.next.send(request)
+        elapsed = time.perf_counter() - start
+        profile.add('network', elapsed)
+        profile.add_request(request.http_request, response.http_response, elapsed)
+        return response
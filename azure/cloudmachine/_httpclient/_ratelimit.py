@@ -0,0 +1,163 @@
+# -------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for
+# license information.
+# --------------------------------------------------------------------------
+
+import hashlib
+import json
+import os
+import tempfile
+import time
+from contextlib import contextmanager
+from threading import Lock
+from typing import IO, Dict, Iterator, Optional, Tuple
+
+try:
+    import fcntl
+
+    def _lock_file(f: IO) -> None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+
+    def _unlock_file(f: IO) -> None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+except ImportError:  # Windows
+    import msvcrt
+
+    def _lock_file(f: IO) -> None:
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+
+    def _unlock_file(f: IO) -> None:
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+# Azure OpenAI evaluates its per-minute quotas over windows of a few seconds, so a burst
+# of a whole minute's quota is throttled. Buckets hold ten seconds' worth.
+_BURST_FRACTION = 1 / 6
+
+
+class RateLimiter:
+    """A tokens-per-minute and requests-per-minute token bucket, shared by threads and processes.
+
+    The bucket levels are kept in a file that is locked while it is updated, so that every
+    process on the machine that uses the same file draws from the same quota.
+
+    :keyword int tokens_per_minute: The tokens that may be sent per minute, or None for no limit.
+    :keyword int requests_per_minute: The requests that may be sent per minute, or None for no limit.
+    :keyword str path: The file that coordinates the processes sharing the quota.
+    """
+
+    def __init__(
+            self,
+            *,
+            tokens_per_minute: Optional[int] = None,
+            requests_per_minute: Optional[int] = None,
+            path: str
+    ) -> None:
+        self._rates = (
+            tokens_per_minute / 60 if tokens_per_minute else None,
+            requests_per_minute / 60 if requests_per_minute else None,
+        )
+        self._capacities = (
+            max(tokens_per_minute * _BURST_FRACTION, 1) if tokens_per_minute else None,
+            max(requests_per_minute * _BURST_FRACTION, 1) if requests_per_minute else None,
+        )
+        self.path = path
+        self._lock = Lock()
+
+    @contextmanager
+    def _state(self) -> Iterator[Dict[str, float]]:
+        with self._lock:
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+            with os.fdopen(fd, 'r+') as f:
+                _lock_file(f)
+                try:
+                    f.seek(0)
+                    try:
+                        state = json.loads(f.read())
+                    except ValueError:
+                        state = {}
+                    yield state
+                    f.seek(0)
+                    f.truncate()
+                    f.write(json.dumps(state))
+                    f.flush()
+                finally:
+                    _unlock_file(f)
+
+    def _try_acquire(self, tokens: int) -> float:
+        # Returns 0 once the tokens and a request have been taken, otherwise the seconds to wait.
+        wait = 0.0
+        now = time.time()
+        with self._state() as state:
+            levels = []
+            for key, rate, capacity, cost in zip(('tokens', 'requests'), self._rates, self._capacities, (tokens, 1)):
+                if rate is None:
+                    levels.append(None)
+                    continue
+                elapsed = max(now - state.get('updated', now), 0.0)
+                level = min(state.get(key, capacity) + elapsed * rate, capacity)
+                # A request larger than the bucket is let through once the bucket is full.
+                cost = min(cost, capacity)
+                if level < cost:
+                    wait = max(wait, (cost - level) / rate)
+                levels.append((key, level, cost))
+            for entry in levels:
+                if entry is not None:
+                    key, level, cost = entry
+                    state[key] = level if wait else level - cost
+            state['updated'] = now
+        return wait
+
+    def acquire(self, tokens: int = 0) -> float:
+        """Wait until a request of the given number of tokens may be sent.
+
+        :param int tokens: The tokens the request will consume.
+        :returns: The seconds spent waiting.
+        :rtype: float
+        """
+        waited = 0.0
+        while True:
+            wait = self._try_acquire(tokens)
+            if not wait:
+                return waited
+            time.sleep(wait)
+            waited += wait
+
+
+_limiters: Dict[Tuple[str, Optional[int], Optional[int]], RateLimiter] = {}
+_limiters_lock = Lock()
+
+
+def rate_limiter(
+        name: str,
+        *,
+        tokens_per_minute: Optional[int] = None,
+        requests_per_minute: Optional[int] = None,
+        path: Optional[str] = None
+) -> Optional[RateLimiter]:
+    """Return the rate limiter of a quota, or None if no limit is set.
+
+    :param str name: Identifies the quota, such as the endpoint and deployment it applies to.
+     Processes that limit the same name share the quota through a file in the temp directory,
+     unless a path is given.
+    """
+    if not tokens_per_minute and not requests_per_minute:
+        return None
+    if not path:
+        digest = hashlib.sha256(name.encode('utf-8')).hexdigest()[:16]
+        path = os.path.join(tempfile.gettempdir(), f"cloudmachine-ratelimit-{digest}.json")
+    key = (path, tokens_per_minute, requests_per_minute)
+    with _limiters_lock:
+        try:
+            return _limiters[key]
+        except KeyError:
+            limiter = _limiters[key] = RateLimiter(
+                tokens_per_minute=tokens_per_minute,
+                requests_per_minute=requests_per_minute,
+                path=path
+            )
+            return limiter
@@ -0,0 +1,204 @@
+# -------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for
+# license information.
+# --------------------------------------------------------------------------
+
+import email.utils
+import logging
+import random
+import re
+import time
+from threading import Lock
+from typing import Any, Callable, Dict, Mapping, Optional, Tuple, Type, TypeVar
+from urllib.parse import urlparse
+
+from azure.core.pipeline import PipelineRequest, PipelineResponse
+from azure.core.pipeline.policies import RetryPolicy
+
+from ._metrics import metrics
+
+_LOGGER = logging.getLogger(__name__)
+
+RETRY_BUDGET_EXHAUSTED = "cloudmachine_retry_budget_exhausted_total"
+
+T = TypeVar('T')
+
+_DURATION = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+_DURATION_UNITS = {'ms': 0.001, 's': 1, 'm': 60, 'h': 3600}
+
+
+def _parse_duration(value: str) -> Optional[float]:
+    # OpenAI reports reset times as Go durations, e.g. '20ms', '1s' or '6m0s'.
+    parts = _DURATION.findall(value)
+    if not parts:
+        return None
+    return sum(float(amount) * _DURATION_UNITS[unit] for amount, unit in parts)
+
+
+def parse_retry_after(headers: Mapping[str, str]) -> Optional[float]:
+    """The seconds a service asked to wait before retrying, if it said so.
+
+    Supports 'retry-after-ms', 'x-ms-retry-after-ms', 'Retry-After' in seconds or as an HTTP date,
+    and the 'x-ratelimit-reset-requests' and 'x-ratelimit-reset-tokens' headers of OpenAI for
+    the limit that has been exhausted. The headers must be case-insensitive.
+    """
+    for header in ('retry-after-ms', 'x-ms-retry-after-ms'):
+        value = headers.get(header)
+        if value:
+            try:
+                return max(float(value) / 1000, 0.0)
+            except ValueError:
+                pass
+    value = headers.get('retry-after')
+    if value:
+        try:
+            return max(float(value), 0.0)
+        except ValueError:
+            try:
+                retry_date = email.utils.parsedate_to_datetime(value)
+            except (TypeError, ValueError):
+                retry_date = None
+            if retry_date:
+                return max(retry_date.timestamp() - time.time(), 0.0)
+    reset = None
+    for limit in ('requests', 'tokens'):
+        if headers.get(f'x-ratelimit-remaining-{limit}') == '0':
+            value = headers.get(f'x-ratelimit-reset-{limit}')
+            seconds = _parse_duration(value) if value else None
+            if seconds is not None:
+                reset = max(reset or 0.0, seconds)
+    return reset
+
+
+def decorrelated_jitter(previous: float, base: float, cap: float) -> float:
+    """The next backoff, drawn between the base and three times the previous backoff.
+
+    Spreads the retries of clients that failed together, while still growing the delay.
+    """
+    return min(cap, random.uniform(base, max(previous, base) * 3))
+
+
+class RetryBudget:
+    """Limits the retries sent to an endpoint to a fraction of its requests.
+
+    Every request adds ``ratio`` to the budget and every retry takes one from it, so
+    that a failing endpoint is not sent more than ``1 + ratio`` times its load.
+
+    :keyword float ratio: The retries allowed per request. Defaults to 0.2.
+    :keyword float reserve: The retries allowed before any request is made, which is also
+     the most that can be saved up. Defaults to 10.
+    """
+
+    def __init__(self, *, ratio: float = 0.2, reserve: float = 10) -> None:
+        self._ratio = ratio
+        self._reserve = reserve
+        self._tokens = reserve
+        self._lock = Lock()
+
+    def deposit(self) -> None:
+        with self._lock:
+            self._tokens = min(self._tokens + self._ratio, self._reserve)
+
+    def withdraw(self) -> bool:
+        with self._lock:
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+
+_budgets: Dict[str, RetryBudget] = {}
+_budgets_lock = Lock()
+
+
+def retry_budget(url: str) -> RetryBudget:
+    """The retry budget shared by every client that sends requests to the host of the URL."""
+    key = urlparse(url).netloc.lower()
+    with _budgets_lock:
+        try:
+            return _budgets[key]
+        except KeyError:
+            budget = _budgets[key] = RetryBudget()
+            return budget
+
+
+class AdaptiveRetryPolicy(RetryPolicy):
+    """A retry policy that waits as long as the service asks, and otherwise backs off with jitter.
+
+    Retries draw from a budget per host, so that an outage does not multiply the load on
+    the service. Accepts the same keyword arguments as ``RetryPolicy``.
+    """
+
+    def send(self, request: PipelineRequest) -> PipelineResponse:
+        retry_budget(request.http_request.url).deposit()
+        return super().send(request)
+
+    def increment(self, settings: Dict[str, Any], response: Any = None, error: Optional[Exception] = None) -> bool:
+        if not super().increment(settings, response=response, error=error):
+            return False
+        url = response.http_request.url
+        if not retry_budget(url).withdraw():
+            host = urlparse(url).netloc
+            _LOGGER.warning("Retry budget for %s is exhausted, not retrying.", host)
+            metrics.increment(RETRY_BUDGET_EXHAUSTED, host=host)
+            return False
+        return True
+
+    def get_retry_after(self, response: PipelineResponse) -> Optional[float]:
+        return parse_retry_after(response.http_response.headers)
+
+    def get_backoff_time(self, settings: Dict[str, Any]) -> float:
+        backoff = decorrelated_jitter(
+            settings.get('previous_backoff', 0.0),
+            settings['backoff'],
+            settings['max_backoff']
+        )
+        settings['previous_backoff'] = backoff
+        return backoff
+
+
+def retry_call(
+        func: Callable[[], T],
+        *,
+        endpoint: str,
+        retry_on: Tuple[Type[Exception], ...],
+        retries: int = 10,
+        backoff_factor: float = 0.8,
+        backoff_max: float = 60,
+        get_headers: Callable[[Exception], Optional[Mapping[str, str]]] = lambda e: None
+) -> T:
+    """Call a function with the same retry behaviour as ``AdaptiveRetryPolicy``.
+
+    For clients that do not go through the pipeline, such as the OpenAI SDK.
+
+    :param func: The call to make.
+    :keyword str endpoint: The endpoint that is called, whose retry budget is used.
+    :keyword retry_on: The errors to retry.
+    :keyword int retries: The most retries to make. Defaults to 10.
+    :keyword float backoff_factor: The shortest backoff in seconds. Defaults to 0.8.
+    :keyword float backoff_max: The longest backoff in seconds. Defaults to 60.
+    :keyword get_headers: Returns the response headers of an error, to read the wait the
+     service asked for.
+    """
+    budget = retry_budget(endpoint)
+    budget.deposit()
+    backoff = 0.0
+    attempt = 0
+    while True:
+        try:
+            return func()
+        except retry_on as e:
+            attempt += 1
+            if attempt > retries:
+                raise
+            if not budget.withdraw():
+                host = urlparse(endpoint).netloc
+                _LOGGER.warning("Retry budget for %s is exhausted, not retrying.", host)
+                metrics.increment(RETRY_BUDGET_EXHAUSTED, host=host)
+                raise
+            headers = get_headers(e)
+            delay = parse_retry_after(headers) if headers else None
+            if delay is None:
+                delay = backoff = decorrelated_jitter(backoff, backoff_factor, backoff_max)
+            time.sleep(delay)
@@ -24,6 +24,7 @@ from azure.core.exceptions import HttpResponseError
 
 from ._base import CloudMachineClientlet
 from ._utils import deserialize_rfc
+from ._profiling import profiled, profile_phase
 
 
 @dataclass
@@ -115,6 +116,7 @@ class CloudMachineServiceBus(CloudMachineClientlet):
     ) -> Future[int]:
         ...
     @distributed_trace
+    @profiled('servicebus.qsize')
     def qsize(
             self,
             *,
@@ -130,12 +132,14 @@ class CloudMachineServiceBus(CloudMachineClientlet):
             subscription or self.default_subscription_name
         )
         response = self._send_request(request, **kwargs)
-        details = self._load_response(response)
-        if queue:
-            # TODO: This is probably wrong for a queue
+        with profile_phase('deserialize'):
+            details = self._load_response(response)
+            if queue:
+                # TODO: This is probably wrong for a queue
+                return int(details[5][0][12][0].text)
             return int(details[5][0][12][0].text)
-        return int(details[5][0][12][0].text)
 
+    @profiled('servicebus.get')
     def _get(
             self,
             block: bool = True,
@@ -149,19 +153,21 @@ class CloudMachineServiceBus(CloudMachineClientlet):
             **kwargs
     ) -> Message:
         timeout = timeout if block else None
-        request = build_receive_request(
-            "POST" if lock else "DELETE",
-            queue,
-            topic or self.default_topic_name,
-            subscription or self.default_subscription_name,
-            timeout=timeout
-        )
+        with profile_phase('serialize'):
+            request = build_receive_request(
+                "POST" if lock else "DELETE",
+                queue,
+                topic or self.default_topic_name,
+                subscription or self.default_subscription_name,
+                timeout=timeout
+            )
         response = self._send_request(request, **kwargs)
         if response.status_code == 204:
             raise Empty()
 
-        content = response.read()
-        properties = json.loads(response.headers['BrokerProperties'])
+        with profile_phase('deserialize'):
+            content = response.read()
+            properties = json.loads(response.headers['BrokerProperties'])
         if lock:
             message = LockedMessage(
                 id=properties['MessageId'],
@@ -342,6 +348,7 @@ class CloudMachineServiceBus(CloudMachineClientlet):
             **kwargs
         )
 
+    @profiled('servicebus.task_done')
     def _task_done(
             self,
             message: LockedMessage,
@@ -352,14 +359,15 @@ class CloudMachineServiceBus(CloudMachineClientlet):
             delete: bool = True,
             **kwargs
     ) -> None:
-        request = build_message_process_request(
-            "DELETE" if delete else "PUT",
-            queue,
-            topic or self.default_topic_name,
-            subscription or self.default_subscription_name,
-            message.id,
-            message.lock_token
-        )
+        with profile_phase('serialize'):
+            request = build_message_process_request(
+                "DELETE" if delete else "PUT",
+                queue,
+                topic or self.default_topic_name,
+                subscription or self.default_subscription_name,
+                message.id,
+                message.lock_token
+            )
         self._send_request(request, **kwargs)
         message._stop_renew.set()
     @overload
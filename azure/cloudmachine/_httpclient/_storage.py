@@ -29,6 +29,7 @@ from azure.core.pipeline.policies import HeadersPolicy
 from ._config import CloudMachinePipelineConfig
 from ..events import cloudmachine_events
 from ._base import CloudMachineClientlet
+from ._profiling import profiled, profile_phase
 from ._utils import (
     Pages,
     Stream,
@@ -51,7 +52,7 @@ SasPermissions = Literal['read', 'write', 'delete', 'tag', 'create', 'execute']
 
 def _format_url(endpoint: str, container: str) -> str:
     parsed_url = urlparse(endpoint)
-    return f"{parsed_url.scheme}://{parsed_url.hostname}/{quote(container)}{parsed_url.query}"
+    return f"{parsed_url.scheme}://{parsed_url.netloc}/{quote(container)}{parsed_url.query}"
 
 
 def _build_dict(element: ET) -> Union[str, Dict[str, Any]]:
@@ -327,57 +328,66 @@ class CloudMachineStorage(CloudMachineClientlet):
         kwargs['version'] = self._config.api_version
 
         def _request_one_page(marker: Optional[str]) -> Generator[StorageFile[None], None, Optional[str]]:
+            files, next_marker = _list_one_page(marker)
+            yield from files
+            return next_marker
+
+        @profiled('storage.list')
+        def _list_one_page(marker: Optional[str]) -> Tuple[List[StorageFile[None]], Optional[str]]:
             request_params = dict(kwargs)
-            request = build_list_blob_page_request(
-                url=client.endpoint,
-                marker=marker,
-                kwargs=request_params,
-            )
+            with profile_phase('serialize'):
+                request = build_list_blob_page_request(
+                    url=client.endpoint,
+                    marker=marker,
+                    kwargs=request_params,
+                )
             response = client.send_request(request, **request_params)
             if response.status_code == 404 and response.headers.get(_ERROR_CODE) == 'ContainerNotFound':
-                return None
+                return [], None
             if response.status_code != 200:
                 raise HttpResponseError(response=response)
-            page = ET.fromstring(response.read().decode('utf-8'))
-            for xmlblob in page.find('Blobs'):
-                if xmlblob.tag == 'Blob':
-                    if minimal:
-                        properties = xmlblob.find('Properties')
-                        filename = xmlblob[0].text
-                        yield StorageFile(
-                            filename=filename,
-                            container=container or self.default_container_name,
-                            content=None,
-                            content_length=properties.find('Content-Length').text,
-                            etag=properties.find('Etag').text,
-                            endpoint=urljoin(client.endpoint, quote(filename))
-                        )
-                    else:
-                        blob = _build_dict(xmlblob)
-                        properties = blob['Properties']
-                        filename = blob['Name']
-                        tags = None
-                        if include_tags:
-                            tags = {t['Key']: t['Value'] for t in blob.get('Tags', {}).get('TagSet', [])}
-                        yield StorageFile(
-                            filename=filename,
-                            content=None,
-                            container=container or self.default_container_name,
-                            content_length=properties['Content-Length'],
-                            etag=properties['Etag'],
-                            metadata=blob.get('Metadata', {}),
-                            tags=tags,
-                            endpoint=urljoin(client.endpoint, quote(filename)),
-                            content_type = properties['Content-Type'],
-                            content_encoding = properties['Content-Encoding'],
-                            content_language = properties['Content-Language'],
-                            content_disposition = properties['Content-Disposition'],
-                            cache_control = properties['Cache-Control'],
-                            responsedata=blob,
-                        )
-            next_page = page.find('NextMarker')
-            return next_page.text if next_page is not None else None
-            
+            with profile_phase('deserialize'):
+                page = ET.fromstring(response.read().decode('utf-8'))
+                files = []
+                for xmlblob in page.find('Blobs'):
+                    if xmlblob.tag == 'Blob':
+                        if minimal:
+                            properties = xmlblob.find('Properties')
+                            filename = xmlblob[0].text
+                            files.append(StorageFile(
+                                filename=filename,
+                                container=container or self.default_container_name,
+                                content=None,
+                                content_length=properties.find('Content-Length').text,
+                                etag=properties.find('Etag').text,
+                                endpoint=urljoin(client.endpoint, quote(filename))
+                            ))
+                        else:
+                            blob = _build_dict(xmlblob)
+                            properties = blob['Properties']
+                            filename = blob['Name']
+                            tags = None
+                            if include_tags:
+                                tags = {t['Key']: t['Value'] for t in blob.get('Tags', {}).get('TagSet', [])}
+                            files.append(StorageFile(
+                                filename=filename,
+                                content=None,
+                                container=container or self.default_container_name,
+                                content_length=properties['Content-Length'],
+                                etag=properties['Etag'],
+                                metadata=blob.get('Metadata', {}),
+                                tags=tags,
+                                endpoint=urljoin(client.endpoint, quote(filename)),
+                                content_type = properties['Content-Type'],
+                                content_encoding = properties['Content-Encoding'],
+                                content_language = properties['Content-Language'],
+                                content_disposition = properties['Content-Disposition'],
+                                cache_control = properties['Cache-Control'],
+                                responsedata=blob,
+                            ))
+                next_page = page.find('NextMarker')
+            return files, next_page.text if next_page is not None else None
+
         return Pages(
             _request_one_page,
             n_pages=pages,
@@ -385,6 +395,7 @@ class CloudMachineStorage(CloudMachineClientlet):
         )
             
     # TODO: Scope batch delete to specific container to prevent accidental delete outside of scope.
+    @profiled('storage.delete')
     def _delete(self, *files: Union[str, StorageFile], container: Optional[str] = None, **kwargs) -> None:
         if not files:
             return
@@ -402,17 +413,20 @@ class CloudMachineStorage(CloudMachineClientlet):
 
             kwargs['if_match'] = prep_if_match(etag, condition)
             kwargs['if_none_match'] = prep_if_none_match(etag, condition)
-            requests.append(
-                build_delete_blob_request(
-                    f"/{quote(file_container)}",
-                    filename,
-                    kwargs
+            with profile_phase('serialize'):
+                requests.append(
+                    build_delete_blob_request(
+                        f"/{quote(file_container)}",
+                        filename,
+                        kwargs
+                    )
                 )
-            )
         response = self._batch_send(*requests)
         succeeded = []
         failed = []
-        for file, part_response in zip(files, response.parts()):
+        with profile_phase('deserialize'):
+            parts = response.parts()
+        for file, part_response in zip(files, parts):
             if ((part_response.status_code == 202) or
                 (part_response.status_code == 404 and part_response.headers.get(_ERROR_CODE) == 'BlobNotFound') or
                 (part_response.status_code == 404 and part_response.headers.get(_ERROR_CODE) == 'ContainerNotFound') or
@@ -470,6 +484,7 @@ class CloudMachineStorage(CloudMachineClientlet):
                 **kwargs
             )
 
+    @profiled('storage.upload')
     def _upload(
             self,
             data: IO[bytes],
@@ -491,7 +506,7 @@ class CloudMachineStorage(CloudMachineClientlet):
         # TODO: support upload by block list + commit
         # TODO: support content validation
         client = self._get_container_client(container)
-        filename = filename or data.filename if hasattr(data, 'filename') else str(uuid.uuid4())
+        filename = filename or (data.filename if hasattr(data, 'filename') else str(uuid.uuid4()))
         content_length=content_length or get_length(data)
         kwargs['version'] = self._config.api_version
         kwargs['if_match'] = prep_if_match(etag, condition)
@@ -509,12 +524,13 @@ class CloudMachineStorage(CloudMachineClientlet):
             kwargs['expiry_absolute'] = expiry
         content = data if hasattr(data, 'read') else BytesIO(data)
         initial_index = content.tell()
-        request = build_upload_blob_request(
-            client.endpoint + f"/{quote(filename)}",
-            content_length=content_length,
-            content=content,
-            kwargs=kwargs
-        )
+        with profile_phase('serialize'):
+            request = build_upload_blob_request(
+                client.endpoint + f"/{quote(filename)}",
+                content_length=content_length,
+                content=content,
+                kwargs=kwargs
+            )
         response = client.send_request(request, **kwargs)
         if response.status_code == 404 and response.headers.get(_ERROR_CODE) == 'ContainerNotFound':
             # TODO: if this is an authenticated session - set acl
@@ -626,6 +642,7 @@ class CloudMachineStorage(CloudMachineClientlet):
             **kwargs
         )
         
+    @profiled('storage.download')
     def _download(
             self,
             filename: str,
@@ -648,9 +665,10 @@ class CloudMachineStorage(CloudMachineClientlet):
             response = client.send_request(request, stream=True, **kwargs)
             if response.status_code not in [200, 206]:
                 raise HttpResponseError(response=response)
-            response_start, response_end, filelength = parse_content_range(
-                response.headers['Content-Range']
-            )
+            with profile_phase('deserialize'):
+                response_start, response_end, filelength = parse_content_range(
+                    response.headers['Content-Range']
+                )
             return response, response_start, response_end, filelength
 
         kwargs['version'] = self._config.api_version
@@ -659,44 +677,46 @@ class CloudMachineStorage(CloudMachineClientlet):
         if validate:
             kwargs['range_get_content_crc64'] = True
 
+        # The builder pops the options it uses, leaving the pipeline options in kwargs,
+        # so the requests for the later chunks are built from copies of the options.
+        options = dict(kwargs)
         request_builder = functools.partial(
             build_download_blob_request,
             client.endpoint,
-            filename,
-            kwargs
+            filename
         )
+        # Ranges are inclusive of their end, as in the Range header. The end defaults to the last byte.
         request_start = 0 if content_range is None else content_range[0]
-        request_end = chunk_size if content_range is None or content_range[1] is None or content_range[1] > chunk_size else content_range[1]
+        range_end = None if content_range is None else content_range[1]
+        request_end = request_start + chunk_size - 1
+        if range_end is not None:
+            request_end = min(request_end, range_end)
         range_header = f'bytes={request_start}-{request_end}'
-        request = request_builder(range_header)
+        with profile_phase('serialize'):
+            request = request_builder(kwargs, range_header)
         response, response_start, response_end, filelength = _download(request, **kwargs)
         first_chunk = PartialStream(
             start=response_start,
             end=response_end,
             response=response
         )
-        downloaded = response_end - response_start
-        if content_range:
-            if content_range[1]:
-                expected_length = content_range[1] - content_range[0]
-            else:
-                expected_length = filelength - content_range[0]
-        else:
-            expected_length = filelength
-        if downloaded < expected_length:
-            download_end = filelength if content_range is None or content_range[1] is None else content_range[1]
-            chunk_iter = range(response_end + 1, download_end, chunk_size)
-            request_gen = (request_builder(f'bytes={r}-{r + chunk_size}') for r in chunk_iter)
+        download_end = filelength - 1 if range_end is None else min(range_end, filelength - 1)
+        if response_end < download_end:
+            chunk_iter = range(response_end + 1, download_end + 1, chunk_size)
+            request_gen = (
+                request_builder(dict(options), f'bytes={r}-{min(r + chunk_size - 1, download_end)}')
+                for r in chunk_iter
+            )
             response_gen = (_download(r, **kwargs) for r in request_gen)
             stream = Stream(
-                content_length=expected_length,
+                content_length=download_end - request_start + 1,
                 content_range=f'bytes {request_start}-{download_end}/{filelength}',
                 first_chunk=first_chunk,
                 next_chunks=response_gen
             )
         else:
             stream = Stream(
-                content_length=downloaded,
+                content_length=response_end - response_start + 1,
                 content_range=f'bytes {response_start}-{response_end}/{filelength}',
                 first_chunk=first_chunk
             )
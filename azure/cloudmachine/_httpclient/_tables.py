@@ -1,310 +1,617 @@
-# # -------------------------------------------------------------------------
-# # Copyright (c) Microsoft Corporation. All rights reserved.
-# # Licensed under the MIT License. See License.txt in the project root for
-# # license information.
-# # --------------------------------------------------------------------------
-
-# import os
-# from urllib.parse import quote
-# from typing import IO, Any, Dict, Generator, Literal, Mapping, Optional, Protocol, Type, Union, overload
-
-# from azure.core import PipelineClient
-# from azure.core.pipeline.transport import HttpTransport
-# from azure.identity import DefaultAzureCredential
-# from azure.core.rest import HttpRequest, HttpResponse
-# from azure.core.tracing.decorator import distributed_trace
-# from azure.core.utils import case_insensitive_dict
-
-# from ._config import CloudMachinePipelineConfig
-# from ._auth_policy import BearerTokenChallengePolicy, TOKEN_AUTH_SCOPES
-# from ._api_versions import DEFAULT_API_VERSIONS
-
-
-# class DataModel(Protocol):
-#     def __init__(self, **kwargs) -> None:
-#         ...
-
-#     @property
-#     def __table__(self) -> str:
-#         ...
-    
-#     def model_dump(self, *, by_alias: bool = False, **kwargs) -> Dict[str, Any]:
-#         ...
-
-
-# class CloudMachineStorageTables:
-#     _id: Literal["StorageTables"] = "StorageTables"
-
-#     def __init__(
-#             self,
-#             *,
-#             transport: Optional[HttpTransport] = None,
-#             name: Optional[str] = None,
-#             **kwargs
-#     ):
-#         if name:
-#             name = name.upper()
-#             endpoint = os.environ[f'AZURE_STORAGE_{name}_TABLE_ENDPOINT']
-#         else:
-#             endpoint = os.environ['AZURE_STORAGE_TABLE_ENDPOINT']
-
-#         self._endpoint = endpoint.strip('/')
-#         auth_policy = BearerTokenChallengePolicy(
-#             DefaultAzureCredential(),
-#             TOKEN_AUTH_SCOPES[self._id]
-#         )
-#         self._config = CloudMachinePipelineConfig(
-#             api_version=kwargs.pop('api_version', DEFAULT_API_VERSIONS[self._id]),
-#             authentication_policy=auth_policy,
-#             transport=transport,
-#             **kwargs
-#         )
-#         self._client = PipelineClient(
-#             base_url=endpoint,
-#             pipeline=self._config.pipeline,
-#         )
-#         self._tables: Dict[str, PipelineClient] = {}
-
-#     def _get_table_client(self, tablename: str) -> PipelineClient:
-#         try:
-#             return self._tables[tablename]
-#         except KeyError:
-#             self._create_table(tablename)
-#             table_url = self._endpoint + f"/{quote(tablename)}" 
-#             self._tables[tablename] = PipelineClient(
-#                 base_url=table_url,
-#                 pipeline=self._config.pipeline,
-#             )
-#             return self._tables[tablename]
-
-#     def get_client(self, **kwargs) -> 'azure.data.tables.TableServiceClient':
-#         try:
-#             from azure.data.tables import TableServiceClient
-#         except ImportError as e:
-#             raise ImportError("Please install azure-data-tables SDK to use SDK client.") from e
-#         return TableServiceClient(
-#             endpoint=self._endpoint,
-#             api_version=self._config.api_version,
-#             pipeline=self._config.pipeline,
-#             **kwargs
-#         )
-
-#     @distributed_trace
-#     def _create_table(self, tablename: str) -> None:
-#         body = {'TableName': tablename}
-#         request = build_table_create_request(
-#             json=body
-#         )
-#         response = self._client.send_request(request)
-#         print("RESPONSE", response.status_code)
-#         response.raise_for_status()
-
-#     @overload
-#     def insert(self, table: str, *entities: Mapping[str, Any]) -> None:
-#         ...
-#     @overload
-#     def insert(self, *entities: DataModel) -> None:
-#         ...
-#     @distributed_trace
-#     def insert(self, *args) -> None:
-#         if not args:
-#             return
-#         try:
-#             table_client = self._get_table_client(args[0].__table__)
-#             batch = [("create", e.model_dump(by_alias=True)) for e in args]
-#         except AttributeError:
-#             table_client = self._get_table_client(args[0])
-#             batch = [("create", e) for e in args[1:]]
-#         table_client.submit_transaction(batch)
-
-#     @overload
-#     def upsert(self, table: str, *entities: Mapping[str, Any], overwrite: bool = True) -> None:
-#         ...
-#     @overload
-#     def upsert(self, *entities: DataModel, overwrite: bool = True) -> None:
-#         ...
-#     @distributed_trace
-#     def upsert(self, *args, overwrite: bool = True) -> None:
-#         if not args:
-#             return
-#         mode = 'replace' if overwrite else 'merge'
-#         try:
-#             table_client = self._get_table_client(args[0].__table__)
-#             batch = [("upsert", e.model_dump(by_alias=True), {'mode': mode}) for e in args]
-#             print(batch)
-#         except AttributeError:
-#             table_client = self._get_table_client(args[0])
-#             batch = [("upsert", e, {'mode': mode}) for e in args[1:]]
-#         table_client.submit_transaction(batch)
-
-#     @overload
-#     def update(self, table: str, *entities: Mapping[str, Any], overwrite: bool = True) -> None:
-#         ...
-#     @overload
-#     def update(self, *entities: DataModel, overwrite: bool = True) -> None:
-#         ...
-#     @distributed_trace
-#     def update(self, *args, overwrite: bool = True) -> None:
-#         if not args:
-#             return
-#         mode = 'replace' if overwrite else 'merge'
-#         try:
-#             table_client = self._get_table_client(args[0].__table__)
-#             batch = [("update", e.model_dump(by_alias=True), {'mode': mode}) for e in args]
-#         except AttributeError:
-#             table_client = self._get_table_client(args[0])
-#             batch = [("update", e, {'mode': mode}) for e in args[1:]]
-#         table_client.submit_transaction(batch)
-
-#     @overload
-#     def delete(self, table: str, *entities: Mapping[str, Any]) -> None:
-#         ...
-#     @overload
-#     def delete(self, *entities: DataModel) -> None:
-#         ...
-#     @distributed_trace
-#     def delete(self, *args) -> None:
-#         if not args:
-#             return
-#         try:
-#             table_client = self._get_table_client(args[0].__table__)
-#             batch = [("delete", e.model_dump(by_alias=True)) for e in args]
-#         except AttributeError:
-#             table_client = self._get_table_client(args[0])
-#             batch = [("delete", e) for e in args[1:]]
-#         table_client.submit_transaction(batch)
-
-#     @distributed_trace
-#     def list(self, table: Union[str, DataModel]) -> Generator[Mapping[str, Any], None, None]:
-#         try:
-#             table_client = self._get_table_client(table.__table__)
-#             for entity in table_client.list_entities():
-#                 yield table(**entity)
-#         except AttributeError:
-#             table_client = self._get_table_client(table)
-#             for entity in table_client.list_entities():
-#                 yield entity
-
-#     @overload
-#     def query(self, table: str, partition: str, row: str, /) -> Generator[Mapping[str, Any], None, None]:
-#         ...
-#     @overload
-#     def query(self, table: str, *, query: str, parameters: Optional[Dict[str, Any]] = None) -> Generator[Mapping[str, Any], None, None]:
-#         ...
-#     @overload
-#     def query(self, table: Type[DataModel], partition: str, row: str, /) -> Generator[DataModel, None, None]:
-#         ...
-#     @overload
-#     def query(self, table: Type[DataModel], *, query: str, parameters: Optional[Dict[str, Any]] = None) -> Generator[Mapping[str, Any], None, None]:
-#         ...
-#     @distributed_trace
-#     def query(self, table: Union[str, DataModel], *args, **kwargs) -> Generator[Mapping[str, Any], None, None]:
-#         if args:
-#             pk, rk = args
-#             if pk and pk != '*' and rk and rk != '*':
-#                 try:
-#                     table_client = self._get_table_client(table.__table__)
-#                     entity = table_client.get_entity(pk, rk)
-#                     yield table(**entity)
-#                     return
-#                 except AttributeError:
-#                     table_client = self._get_table_client(table)
-#                     yield table_client.get_entity(pk, rk)
-#                     return
-#             if pk and pk != '*':
-#                 query = "PartitionKey eq @partition"
-#                 parameters = {'partition': pk}
-#             elif rk and rk != '*':
-#                 query = "RowKey eq @row"
-#                 parameters = {'row': rk}
-#             else:
-#                 raise ValueError("Both partition key and row key must be valid strings or '*'.")
-#         else:
-#              query = kwargs.pop('query')
-#              parameters = kwargs.pop('parameters', None) 
-#         try:
-#             table_client = self._get_table_client(table.__table__)
-#             for entity in table_client.query_entities(query, parameters=parameters):
-#                 yield table(**entity)
-#         except AttributeError:
-#             table_client = self._get_table_client(table)
-#             for entity in table_client.query_entities(query, parameters=parameters):
-#                 yield entity
-
-
-
-# ##### Generated request builders #####
-
-# def build_table_create_request(
-#     *,
-#     json: Mapping[str, Any],
-#     format: Optional[str] = None,
-#     response_preference: Optional[str] = None,
-#     **kwargs: Any
-# ) -> HttpRequest:
-#     _headers = case_insensitive_dict(kwargs.pop("headers", {}) or {})
-#     _params = case_insensitive_dict(kwargs.pop("params", {}) or {})
-
-#     data_service_version: Literal["3.0"] = kwargs.pop("data_service_version", _headers.pop("DataServiceVersion", "3.0"))
-#     content_type: Optional[str] = kwargs.pop("content_type", _headers.pop("Content-Type", None))
-#     version: Literal["2019-02-02"] = kwargs.pop("version", _headers.pop("x-ms-version", "2019-02-02"))
-#     accept = _headers.pop("Accept", "application/json;odata=minimalmetadata")
-
-#     # Construct URL
-#     _url = "/Tables"
-#     # Construct parameters
-#     if format is not None:
-#         _params["$format"] = str(format)
-#     # Construct headers
-#     _headers["x-ms-version"] = str(version)
-#     _headers["DataServiceVersion"] = str(data_service_version)
-#     if response_preference is not None:
-#         _headers["Prefer"] = str(response_preference)
-#     if content_type is not None:
-#         _headers["Content-Type"] = str(content_type)
-#     _headers["Accept"] = str(accept)
-#     return HttpRequest(method="POST", url=_url, params=_params, headers=_headers, json=json, **kwargs)
-
-
-# def build_table_insert_entity_request(
-#     table: str,
-#     *,
-#     timeout: Optional[int] = None,
-#     format: Optional[str] = None,
-#     response_preference: Optional[str] = None,
-#     json: Optional[Dict[str, Any]] = None,
-#     **kwargs: Any
-# ) -> HttpRequest:
-#     _headers = case_insensitive_dict(kwargs.pop("headers", {}) or {})
-#     _params = case_insensitive_dict(kwargs.pop("params", {}) or {})
-
-#     data_service_version: Literal["3.0"] = kwargs.pop("data_service_version", _headers.pop("DataServiceVersion", "3.0"))
-#     content_type: Optional[str] = kwargs.pop("content_type", _headers.pop("Content-Type", None))
-#     version: Literal["2019-02-02"] = kwargs.pop("version", _headers.pop("x-ms-version", "2019-02-02"))
-#     accept = _headers.pop("Accept", "application/json;odata=minimalmetadata")
-
-#     # Construct URL
-#     _url = "/{table}"
-#     path_format_arguments = {
-#         "table": _SERIALIZER.url("table", table, "str"),
-#     }
-
-#     _url: str = _url.format(**path_format_arguments)  # type: ignore
-
-#     # Construct parameters
-#     if timeout is not None:
-#         _params["timeout"] = _SERIALIZER.query("timeout", timeout, "int", minimum=0)
-#     if format is not None:
-#         _params["$format"] = _SERIALIZER.query("format", format, "str")
-
-#     # Construct headers
-#     _headers["x-ms-version"] = _SERIALIZER.header("version", version, "str")
-#     _headers["DataServiceVersion"] = _SERIALIZER.header("data_service_version", data_service_version, "str")
-#     if response_preference is not None:
-#         _headers["Prefer"] = _SERIALIZER.header("response_preference", response_preference, "str")
-#     if content_type is not None:
-#         _headers["Content-Type"] = _SERIALIZER.header("content_type", content_type, "str")
-#     _headers["Accept"] = _SERIALIZER.header("accept", accept, "str")
-
-#     return HttpRequest(method="POST", url=_url, params=_params, headers=_headers, json=json, **kwargs)
-
+# -------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for
+# license information.
+# --------------------------------------------------------------------------
+
+import hashlib
+import hmac
+import json
+import math
+import re
+import uuid
+from base64 import b64decode, b64encode
+from datetime import datetime, timezone
+from email.utils import formatdate
+from urllib.parse import quote, urlparse, parse_qs
+from typing import Any, Callable, Dict, Generator, List, Literal, Mapping, Optional, Tuple
+
+from azure.core import PipelineClient, MatchConditions
+from azure.core.credentials import AzureNamedKeyCredential
+from azure.core.exceptions import (
+    HttpResponseError,
+    ResourceExistsError,
+    ResourceModifiedError,
+    ResourceNotFoundError,
+    map_error,
+)
+from azure.core.pipeline import PipelineRequest
+from azure.core.pipeline.policies import SansIOHTTPPolicy
+from azure.core.rest import HttpRequest, HttpResponse
+from azure.core.utils import case_insensitive_dict
+
+from ._config import CloudMachinePipelineConfig
+from ._storage import StorageHeadersPolicy
+
+_ERROR_CODE = "x-ms-error-code"
+_ERROR_MAP = {
+    404: ResourceNotFoundError,
+    409: ResourceExistsError,
+    412: ResourceModifiedError,
+}
+_DATA_SERVICE_VERSION = "3.0"
+_ACCEPT = "application/json;odata=minimalmetadata"
+_INT32_MIN = -(2 ** 31)
+_INT32_MAX = 2 ** 31 - 1
+TableOperationMode = Literal['replace', 'merge']
+
+
+class TableEntity(dict):
+    """An entity as returned by the Table service, with its ETag and timestamp in `metadata`."""
+    metadata: Dict[str, Any]
+
+
+def _serialize_datetime(value: datetime) -> str:
+    # Naive datetimes are assumed to be UTC.
+    if value.tzinfo:
+        value = value.astimezone(timezone.utc)
+    return value.replace(tzinfo=None).isoformat() + "Z"
+
+
+def _deserialize_datetime(value: str) -> datetime:
+    # The service returns up to 7 fractional digits, which fromisoformat won't accept.
+    value = value.rstrip('Z')
+    if '.' in value:
+        value, fraction = value.split('.', 1)
+        value = f"{value}.{fraction[:6].ljust(6, '0')}"
+    return datetime.fromisoformat(value).replace(tzinfo=timezone.utc)
+
+
+def serialize_entity(entity: Mapping[str, Any]) -> Dict[str, Any]:
+    # Strings, booleans and 32-bit integers are inferred by the service, so only
+    # the remaining types need an odata.type annotation.
+    body: Dict[str, Any] = {}
+    for name, value in entity.items():
+        if value is None:
+            continue
+        if isinstance(value, (str, bool)):
+            body[name] = value
+        elif isinstance(value, int):
+            if _INT32_MIN <= value <= _INT32_MAX:
+                body[name] = value
+            else:
+                body[name] = str(value)
+                body[f"{name}@odata.type"] = "Edm.Int64"
+        elif isinstance(value, float):
+            if math.isnan(value):
+                body[name] = "NaN"
+            elif math.isinf(value):
+                body[name] = "Infinity" if value > 0 else "-Infinity"
+            else:
+                body[name] = value
+            body[f"{name}@odata.type"] = "Edm.Double"
+        elif isinstance(value, datetime):
+            body[name] = _serialize_datetime(value)
+            body[f"{name}@odata.type"] = "Edm.DateTime"
+        elif isinstance(value, uuid.UUID):
+            body[name] = str(value)
+            body[f"{name}@odata.type"] = "Edm.Guid"
+        elif isinstance(value, (bytes, bytearray)):
+            body[name] = b64encode(value).decode('utf-8')
+            body[f"{name}@odata.type"] = "Edm.Binary"
+        else:
+            body[name] = str(value)
+    return body
+
+
+def deserialize_entity(body: Dict[str, Any], etag: Optional[str] = None) -> TableEntity:
+    entity = TableEntity()
+    types = {}
+    for name, value in body.items():
+        if name.startswith('odata.'):
+            continue
+        if name.endswith('@odata.type'):
+            types[name[:-11]] = value
+            continue
+        entity[name] = value
+    for name, edm_type in types.items():
+        value = entity.get(name)
+        if value is None:
+            continue
+        if edm_type == "Edm.DateTime":
+            entity[name] = _deserialize_datetime(value)
+        elif edm_type == "Edm.Int64":
+            entity[name] = int(value)
+        elif edm_type == "Edm.Double":
+            entity[name] = float(value)
+        elif edm_type == "Edm.Guid":
+            entity[name] = uuid.UUID(value)
+        elif edm_type == "Edm.Binary":
+            entity[name] = b64decode(value)
+    timestamp = entity.pop('Timestamp', None)
+    entity.metadata = {
+        'etag': etag or body.get('odata.etag'),
+        'timestamp': _deserialize_datetime(timestamp) if isinstance(timestamp, str) else timestamp,
+    }
+    return entity
+
+
+def _serialize_filter_value(value: Any) -> str:
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, int):
+        return f"{value}L" if not _INT32_MIN <= value <= _INT32_MAX else str(value)
+    if isinstance(value, float):
+        return repr(value)
+    if isinstance(value, datetime):
+        return f"datetime'{_serialize_datetime(value)}'"
+    if isinstance(value, uuid.UUID):
+        return f"guid'{value}'"
+    if isinstance(value, (bytes, bytearray)):
+        return f"X'{value.hex()}'"
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+# String literals are matched too, so that an '@' within one is left alone.
+_FILTER_PARAMETER = re.compile(r"'(?:[^']|'')*'|@(\w+)")
+
+
+def format_filter(query: str, parameters: Optional[Dict[str, Any]]) -> str:
+    if not parameters:
+        return query
+
+    def _substitute(match: 're.Match[str]') -> str:
+        name = match.group(1)
+        if name is None or name not in parameters:
+            return match.group(0)
+        return _serialize_filter_value(parameters[name])
+
+    # A single pass, so that substituted values are never substituted again.
+    return _FILTER_PARAMETER.sub(_substitute, query)
+
+
+def _entity_path(table: str, partition_key: str, row_key: str) -> str:
+    partition_key = quote(partition_key.replace("'", "''"), safe='')
+    row_key = quote(row_key.replace("'", "''"), safe='')
+    return f"/{quote(table)}(PartitionKey='{partition_key}',RowKey='{row_key}')"
+
+
+def _if_match(etag: Optional[str], match_condition: Optional[MatchConditions]) -> str:
+    if etag and match_condition == MatchConditions.IfNotModified:
+        return etag
+    return "*"
+
+
+def _error_code(response: HttpResponse) -> Optional[str]:
+    # Responses within a transaction only report the error code in the body.
+    code = response.headers.get(_ERROR_CODE)
+    if code or response.status_code < 400:
+        return code
+    try:
+        return response.json()['odata.error']['code']
+    except (ValueError, KeyError, TypeError):
+        return None
+
+
+def _raise_for_status(response: HttpResponse, *expected: int) -> None:
+    if response.status_code not in expected:
+        map_error(status_code=response.status_code, response=response, error_map=_ERROR_MAP)
+        raise HttpResponseError(response=response)
+
+
+class TableSharedKeyPolicy(SansIOHTTPPolicy):
+    """Signs requests with an account key, using the Shared Key Lite scheme of the Table service."""
+
+    def __init__(self, credential: AzureNamedKeyCredential):
+        self._credential = credential
+
+    def on_request(self, request: PipelineRequest) -> None:
+        http_request = request.http_request
+        name, key = self._credential.named_key
+        # Dated per attempt, as this runs after the retry policy.
+        date = formatdate(usegmt=True)
+        http_request.headers['x-ms-date'] = date
+        url = urlparse(http_request.url)
+        resource = f"/{name}{url.path}"
+        comp = parse_qs(url.query).get('comp')
+        if comp:
+            resource += f"?comp={comp[0]}"
+        signature = hmac.new(b64decode(key), f"{date}\n{resource}".encode('utf-8'), hashlib.sha256).digest()
+        http_request.headers['Authorization'] = f"SharedKeyLite {name}:{b64encode(signature).decode('utf-8')}"
+
+
+class CloudMachineTable:
+    """Entity operations for a single table, sent over the pipeline of the owning client."""
+
+    def __init__(
+            self,
+            client: PipelineClient,
+            endpoint: str,
+            table_name: str,
+            config: CloudMachinePipelineConfig,
+            create_table: Callable[[str], None],
+    ):
+        self._client = client
+        self._endpoint = endpoint
+        self._config = config
+        self._create_table = create_table
+        self.table_name = table_name
+
+    def _send(
+            self,
+            build: Callable[[Dict[str, Any]], HttpRequest],
+            kwargs: Dict[str, Any],
+            *,
+            write: bool = False,
+    ) -> HttpResponse:
+        # Tables are assumed to exist, and are only created when a write finds that
+        # they don't, which saves a round-trip per table on the first use in each process.
+        request_params = dict(kwargs)
+        request_params['version'] = self._config.api_version
+        response = self._client.send_request(build(request_params), **request_params)
+        if write and response.status_code == 404 and _error_code(response) == 'TableNotFound':
+            self._create_table(self.table_name)
+            request_params = dict(kwargs)
+            request_params['version'] = self._config.api_version
+            response = self._client.send_request(build(request_params), **request_params)
+        return response
+
+    def get_entity(
+            self,
+            partition_key: str,
+            row_key: str,
+            *,
+            select: Optional[List[str]] = None,
+            **kwargs
+    ) -> TableEntity:
+        url = self._endpoint + _entity_path(self.table_name, partition_key, row_key)
+        response = self._send(lambda p: build_get_entity_request(url, select, p), kwargs)
+        _raise_for_status(response, 200)
+        return deserialize_entity(response.json(), response.headers.get('ETag'))
+
+    def query_entities(
+            self,
+            query: Optional[str],
+            *,
+            parameters: Optional[Dict[str, Any]] = None,
+            select: Optional[List[str]] = None,
+            results_per_page: Optional[int] = None,
+            **kwargs
+    ) -> Generator[TableEntity, None, None]:
+        query = format_filter(query, parameters) if query else None
+        continuation: Optional[Tuple[str, Optional[str]]] = None
+        url = f"{self._endpoint}/{quote(self.table_name)}()"
+        while True:
+            response = self._send(
+                lambda p: build_query_entities_request(url, query, select, results_per_page, continuation, p),
+                kwargs
+            )
+            if response.status_code == 404 and _error_code(response) == 'TableNotFound':
+                return
+            _raise_for_status(response, 200)
+            for body in response.json().get('value', []):
+                yield deserialize_entity(body)
+            next_partition = response.headers.get('x-ms-continuation-NextPartitionKey')
+            if not next_partition:
+                return
+            continuation = (next_partition, response.headers.get('x-ms-continuation-NextRowKey'))
+
+    def list_entities(
+            self,
+            *,
+            select: Optional[List[str]] = None,
+            results_per_page: Optional[int] = None,
+            **kwargs
+    ) -> Generator[TableEntity, None, None]:
+        return self.query_entities(None, select=select, results_per_page=results_per_page, **kwargs)
+
+    def create_entity(self, entity: Mapping[str, Any], **kwargs) -> None:
+        url = f"{self._endpoint}/{quote(self.table_name)}"
+        body = serialize_entity(entity)
+        response = self._send(lambda p: build_insert_entity_request(url, body, p), kwargs, write=True)
+        _raise_for_status(response, 204)
+
+    def upsert_entity(self, entity: Mapping[str, Any], *, mode: TableOperationMode = 'merge', **kwargs) -> None:
+        url = self._endpoint + _entity_path(self.table_name, entity['PartitionKey'], entity['RowKey'])
+        body = serialize_entity(entity)
+        response = self._send(lambda p: build_update_entity_request(url, body, mode, None, p), kwargs, write=True)
+        _raise_for_status(response, 204)
+
+    def update_entity(
+            self,
+            entity: Mapping[str, Any],
+            *,
+            mode: TableOperationMode = 'merge',
+            etag: Optional[str] = None,
+            match_condition: Optional[MatchConditions] = None,
+            **kwargs
+    ) -> None:
+        url = self._endpoint + _entity_path(self.table_name, entity['PartitionKey'], entity['RowKey'])
+        body = serialize_entity(entity)
+        if_match = _if_match(etag, match_condition)
+        response = self._send(lambda p: build_update_entity_request(url, body, mode, if_match, p), kwargs)
+        _raise_for_status(response, 204)
+
+    def delete_entity(
+            self,
+            partition_key: str,
+            row_key: str,
+            *,
+            etag: Optional[str] = None,
+            match_condition: Optional[MatchConditions] = None,
+            **kwargs
+    ) -> None:
+        url = self._endpoint + _entity_path(self.table_name, partition_key, row_key)
+        if_match = _if_match(etag, match_condition)
+        response = self._send(lambda p: build_delete_entity_request(url, if_match, p), kwargs)
+        if response.status_code == 404 and _error_code(response) in ('ResourceNotFound', 'TableNotFound'):
+            return
+        _raise_for_status(response, 204)
+
+    def _build_operation(self, operation: Tuple[Any, ...]) -> HttpRequest:
+        action, entity = operation[0], operation[1]
+        options: Dict[str, Any] = dict(operation[2]) if len(operation) > 2 else {}
+        kwargs = {'version': self._config.api_version}
+        if action == 'create':
+            return build_insert_entity_request(
+                f"{self._endpoint}/{quote(self.table_name)}",
+                serialize_entity(entity),
+                kwargs
+            )
+        url = self._endpoint + _entity_path(self.table_name, entity['PartitionKey'], entity['RowKey'])
+        if action == 'delete':
+            return build_delete_entity_request(
+                url,
+                _if_match(options.get('etag'), options.get('match_condition')),
+                kwargs
+            )
+        if action in ('upsert', 'update'):
+            if_match = None
+            if action == 'update':
+                if_match = _if_match(options.get('etag'), options.get('match_condition'))
+            return build_update_entity_request(
+                url,
+                serialize_entity(entity),
+                str(options.get('mode', 'merge')).lower(),
+                if_match,
+                kwargs
+            )
+        raise ValueError(f"Unsupported transaction operation '{action}'.")
+
+    def submit_transaction(self, operations: List[Tuple[Any, ...]], **kwargs) -> None:
+        if not operations:
+            return
+        policies = [StorageHeadersPolicy()]
+
+        def _build(request_params: Dict[str, Any]) -> HttpRequest:
+            changeset = HttpRequest("POST", None)
+            changeset.set_multipart_mixed(
+                *[self._build_operation(o) for o in operations],
+                policies=policies,
+                boundary=f"changeset_{uuid.uuid4()}",
+            )
+            request = build_batch_request(f"{self._endpoint}/$batch", request_params)
+            request.set_multipart_mixed(
+                changeset,
+                policies=policies,
+                enforce_https=False,
+                boundary=f"batch_{uuid.uuid4()}",
+            )
+            return request
+
+        for attempt in range(2):
+            response = self._send(_build, kwargs)
+            if response.status_code != 202:
+                raise HttpResponseError(response=response)
+            # A transaction is atomic, and the service only returns the part that failed.
+            failed = [p for p in response.parts() if not 200 <= p.status_code < 300]
+            if not failed:
+                return
+            if not attempt and failed[0].status_code == 404 and _error_code(failed[0]) == 'TableNotFound':
+                self._create_table(self.table_name)
+                continue
+            raise HttpResponseError(response=failed[0])
+
+
+########## Request Builders ##########
+
+def build_create_table_request(
+    url: str,
+    table: str,
+    kwargs: Dict[str, Any]
+) -> HttpRequest:
+    _headers = case_insensitive_dict(kwargs.pop("headers", {}) or {})
+    _params = case_insensitive_dict(kwargs.pop("params", {}) or {})
+
+    version: str = kwargs.pop("version")
+    accept = _headers.pop("Accept", _ACCEPT)
+
+    # Construct URL
+    _url = kwargs.pop("template_url", "{url}/Tables")
+    _url: str = _url.format(url=url)  # type: ignore
+
+    # Construct headers
+    _headers["x-ms-version"] = str(version)
+    _headers["DataServiceVersion"] = _DATA_SERVICE_VERSION
+    _headers["Prefer"] = "return-no-content"
+    _headers["Content-Type"] = "application/json"
+    _headers["Accept"] = str(accept)
+
+    return HttpRequest(method="POST", url=_url, params=_params, headers=_headers, json={'TableName': table}, **kwargs)
+
+
+def build_get_entity_request(
+    url: str,
+    select: Optional[List[str]],
+    kwargs: Dict[str, Any]
+) -> HttpRequest:
+    _headers = case_insensitive_dict(kwargs.pop("headers", {}) or {})
+    _params = case_insensitive_dict(kwargs.pop("params", {}) or {})
+
+    timeout: Optional[int] = kwargs.pop('servicetimeout', None)
+    version: str = kwargs.pop("version")
+    accept = _headers.pop("Accept", _ACCEPT)
+
+    # Construct parameters
+    if select:
+        _params["$select"] = ",".join(select)
+    if timeout is not None:
+        _params["timeout"] = quote(str(timeout))
+
+    # Construct headers
+    _headers["x-ms-version"] = str(version)
+    _headers["DataServiceVersion"] = _DATA_SERVICE_VERSION
+    _headers["Accept"] = str(accept)
+
+    return HttpRequest(method="GET", url=url, params=_params, headers=_headers, **kwargs)
+
+
+def build_query_entities_request(
+    url: str,
+    query: Optional[str],
+    select: Optional[List[str]],
+    top: Optional[int],
+    continuation: Optional[Tuple[str, Optional[str]]],
+    kwargs: Dict[str, Any]
+) -> HttpRequest:
+    _headers = case_insensitive_dict(kwargs.pop("headers", {}) or {})
+    _params = case_insensitive_dict(kwargs.pop("params", {}) or {})
+
+    timeout: Optional[int] = kwargs.pop('servicetimeout', None)
+    version: str = kwargs.pop("version")
+    accept = _headers.pop("Accept", _ACCEPT)
+
+    # Construct parameters
+    if query:
+        _params["$filter"] = query
+    if select:
+        _params["$select"] = ",".join(select)
+    if top is not None:
+        _params["$top"] = str(top)
+    if continuation:
+        _params["NextPartitionKey"] = continuation[0]
+        if continuation[1]:
+            _params["NextRowKey"] = continuation[1]
+    if timeout is not None:
+        _params["timeout"] = quote(str(timeout))
+
+    # Construct headers
+    _headers["x-ms-version"] = str(version)
+    _headers["DataServiceVersion"] = _DATA_SERVICE_VERSION
+    _headers["Accept"] = str(accept)
+
+    return HttpRequest(method="GET", url=url, params=_params, headers=_headers, **kwargs)
+
+
+def build_insert_entity_request(
+    url: str,
+    entity: Dict[str, Any],
+    kwargs: Dict[str, Any]
+) -> HttpRequest:
+    _headers = case_insensitive_dict(kwargs.pop("headers", {}) or {})
+    _params = case_insensitive_dict(kwargs.pop("params", {}) or {})
+
+    timeout: Optional[int] = kwargs.pop('servicetimeout', None)
+    version: str = kwargs.pop("version")
+    accept = _headers.pop("Accept", _ACCEPT)
+
+    # Construct parameters
+    if timeout is not None:
+        _params["timeout"] = quote(str(timeout))
+
+    # Construct headers
+    _headers["x-ms-version"] = str(version)
+    _headers["DataServiceVersion"] = _DATA_SERVICE_VERSION
+    _headers["Prefer"] = "return-no-content"
+    _headers["Content-Type"] = "application/json"
+    _headers["Accept"] = str(accept)
+
+    return HttpRequest(
+        method="POST",
+        url=url,
+        params=_params,
+        headers=_headers,
+        content=json.dumps(entity),
+        **kwargs
+    )
+
+
+def build_update_entity_request(
+    url: str,
+    entity: Dict[str, Any],
+    mode: TableOperationMode,
+    if_match: Optional[str],
+    kwargs: Dict[str, Any]
+) -> HttpRequest:
+    _headers = case_insensitive_dict(kwargs.pop("headers", {}) or {})
+    _params = case_insensitive_dict(kwargs.pop("params", {}) or {})
+
+    timeout: Optional[int] = kwargs.pop('servicetimeout', None)
+    version: str = kwargs.pop("version")
+    accept = _headers.pop("Accept", _ACCEPT)
+
+    # Construct parameters
+    if timeout is not None:
+        _params["timeout"] = quote(str(timeout))
+
+    # Construct headers
+    # Without an If-Match header the service inserts the entity if it doesn't exist.
+    if if_match is not None:
+        _headers["If-Match"] = if_match
+    _headers["x-ms-version"] = str(version)
+    _headers["DataServiceVersion"] = _DATA_SERVICE_VERSION
+    _headers["Content-Type"] = "application/json"
+    _headers["Accept"] = str(accept)
+
+    return HttpRequest(
+        method="PUT" if mode == 'replace' else "MERGE",
+        url=url,
+        params=_params,
+        headers=_headers,
+        content=json.dumps(entity),
+        **kwargs
+    )
+
+
+def build_delete_entity_request(
+    url: str,
+    if_match: str,
+    kwargs: Dict[str, Any]
+) -> HttpRequest:
+    _headers = case_insensitive_dict(kwargs.pop("headers", {}) or {})
+    _params = case_insensitive_dict(kwargs.pop("params", {}) or {})
+
+    timeout: Optional[int] = kwargs.pop('servicetimeout', None)
+    version: str = kwargs.pop("version")
+    accept = _headers.pop("Accept", _ACCEPT)
+
+    # Construct parameters
+    if timeout is not None:
+        _params["timeout"] = quote(str(timeout))
+
+    # Construct headers
+    _headers["If-Match"] = if_match
+    _headers["x-ms-version"] = str(version)
+    _headers["DataServiceVersion"] = _DATA_SERVICE_VERSION
+    _headers["Accept"] = str(accept)
+
+    return HttpRequest(method="DELETE", url=url, params=_params, headers=_headers, **kwargs)
+
+
+def build_batch_request(
+    url: str,
+    kwargs: Dict[str, Any]
+) -> HttpRequest:
+    _headers = case_insensitive_dict(kwargs.pop("headers", {}) or {})
+    _params = case_insensitive_dict(kwargs.pop("params", {}) or {})
+
+    version: str = kwargs.pop("version")
+    accept = _headers.pop("Accept", _ACCEPT)
+
+    # Construct headers
+    _headers["x-ms-version"] = str(version)
+    _headers["DataServiceVersion"] = _DATA_SERVICE_VERSION
+    _headers["MaxDataServiceVersion"] = "3.0;NetFx"
+    _headers["Accept"] = str(accept)
+
+    return HttpRequest(method="POST", url=url, params=_params, headers=_headers, **kwargs)
@@ -1,9 +1,11 @@
 import logging
 from abc import ABC
-from typing import Generator, List, Tuple, NamedTuple
+from functools import lru_cache
+from typing import Generator, List, Tuple, NamedTuple, TYPE_CHECKING
 from dataclasses import dataclass
 
-import tiktoken
+if TYPE_CHECKING:
+    import tiktoken
 
 
 logger = logging.getLogger("ingester")
@@ -80,8 +82,12 @@ STANDARD_SENTENCE_ENDINGS = [".", "!", "?"]
 # https://www.w3.org/TR/jlreq/#cl-04
 CJK_SENTENCE_ENDINGS = ["。", "！", "？", "‼", "⁇", "⁈", "⁉"]
 
-# NB: text-embedding-3-XX is the same BPE as text-embedding-ada-002
-bpe = tiktoken.encoding_for_model(ENCODING_MODEL)
+@lru_cache(maxsize=None)
+def _bpe() -> 'tiktoken.Encoding':
+    # NB: text-embedding-3-XX is the same BPE as text-embedding-ada-002
+    # Loading the BPE takes a while, so it is deferred until text is first split.
+    import tiktoken
+    return tiktoken.encoding_for_model(ENCODING_MODEL)
 
 DEFAULT_OVERLAP_PERCENT = 10  # See semantic search article for 10% overlap performance
 DEFAULT_SECTION_LENGTH = 1000  # Roughly 400-500 tokens for English
@@ -104,7 +110,7 @@ class SentenceTextSplitter(TextSplitter):
         """
         Recursively splits page by maximum number of tokens to better handle languages with higher token/word ratios.
         """
-        tokens = bpe.encode(text)
+        tokens = _bpe().encode(text)
         if len(tokens) <= self.max_tokens_per_section:
             # Section is already within max tokens, return
             yield SplitPage(page_num=page_num, text=text)
@@ -0,0 +1,144 @@
+# -------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for
+# license information.
+# --------------------------------------------------------------------------
+
+from typing import Any, Literal, Optional
+
+from azure.core.pipeline.transport import AsyncHttpTransport, HttpTransport
+
+TransportName = Literal['requests', 'httpx', 'aiohttp']
+
+# The number of hosts for which a connection pool is kept.
+_DEFAULT_POOL_CONNECTIONS = 25
+_DEFAULT_MAX_WORKERS = 10
+
+
+def _per_host_connections(max_workers: Optional[int], per_host_concurrency: Optional[int]) -> int:
+    # Every executor thread may hold a connection to the same host, as may the calling thread.
+    return per_host_concurrency or (max_workers or _DEFAULT_MAX_WORKERS) + 1
+
+
+def build_transport(
+        name: TransportName = 'requests',
+        *,
+        max_workers: Optional[int] = None,
+        per_host_concurrency: Optional[int] = None,
+        pool_connections: int = _DEFAULT_POOL_CONNECTIONS,
+        keep_alive: bool = True,
+        keep_alive_timeout: Optional[float] = None,
+        http2: bool = False,
+        **kwargs: Any
+) -> HttpTransport:
+    """Build a sync transport with a connection pool sized for the executor.
+
+    :param str name: 'requests', or 'httpx' for HTTP/2 support via azure-core-experimental.
+    :keyword int max_workers: The size of the executor that sends requests concurrently.
+    :keyword int per_host_concurrency: The maximum number of pooled connections per host. Defaults to
+     one more than ``max_workers``.
+    :keyword int pool_connections: The number of hosts to keep a connection pool for. Defaults to 25.
+    :keyword bool keep_alive: Whether connections are reused. Defaults to True.
+    :keyword float keep_alive_timeout: Seconds an idle connection is kept open. Only supported by 'httpx'.
+    :keyword bool http2: Whether to negotiate HTTP/2. Only supported by 'httpx'.
+    :rtype: ~azure.core.pipeline.transport.HttpTransport
+    """
+    per_host = _per_host_connections(max_workers, per_host_concurrency)
+    name = name.lower()
+    if name == 'requests':
+        import requests
+        from azure.core.pipeline.transport import RequestsTransport
+        session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections, per_host)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        if not keep_alive:
+            session.headers['Connection'] = 'close'
+        return RequestsTransport(session=session, session_owner=True, **kwargs)
+    if name == 'httpx':
+        import httpx
+        from azure.core.experimental.transport import HttpXTransport
+        client = httpx.Client(
+            http2=http2,
+            limits=httpx.Limits(
+                max_connections=pool_connections * per_host,
+                max_keepalive_connections=per_host if keep_alive else 0,
+                keepalive_expiry=keep_alive_timeout if keep_alive_timeout is not None else 5.0,
+            ),
+        )
+        return HttpXTransport(client=client, client_owner=True, **kwargs)
+    if name == 'aiohttp':
+        raise ValueError("'aiohttp' is an async transport, use 'build_async_transport' to build it.")
+    raise ValueError(f"Unexpected transport type: '{name}'.")
+
+
+def build_async_transport(
+        name: TransportName = 'aiohttp',
+        *,
+        max_workers: Optional[int] = None,
+        per_host_concurrency: Optional[int] = None,
+        pool_connections: int = _DEFAULT_POOL_CONNECTIONS,
+        keep_alive: bool = True,
+        keep_alive_timeout: Optional[float] = None,
+        dns_cache_ttl: Optional[int] = 10,
+        http2: bool = False,
+        **kwargs: Any
+) -> AsyncHttpTransport:
+    """Build an async transport for the async SDK clients returned by ``get_client``.
+
+    :param str name: 'aiohttp', or 'httpx' for HTTP/2 support via azure-core-experimental.
+    :keyword int max_workers: The number of requests expected to be sent concurrently.
+    :keyword int per_host_concurrency: The maximum number of connections per host. Defaults to
+     one more than ``max_workers``.
+    :keyword int pool_connections: The number of hosts to keep a connection pool for. Defaults to 25.
+    :keyword bool keep_alive: Whether connections are reused. Defaults to True.
+    :keyword float keep_alive_timeout: Seconds an idle connection is kept open.
+    :keyword int dns_cache_ttl: Seconds resolved addresses are cached for, or None to cache them
+     forever and 0 to disable the cache. Defaults to 10. Only supported by 'aiohttp'.
+    :keyword bool http2: Whether to negotiate HTTP/2. Only supported by 'httpx'.
+    :rtype: ~azure.core.pipeline.transport.AsyncHttpTransport
+    """
+    per_host = _per_host_connections(max_workers, per_host_concurrency)
+    name = name.lower()
+    if name == 'aiohttp':
+        import aiohttp
+        from azure.core.pipeline.transport import AioHttpTransport
+
+        connector_options = {
+            'limit': pool_connections * per_host,
+            'limit_per_host': per_host,
+            'force_close': not keep_alive,
+            'use_dns_cache': dns_cache_ttl != 0,
+            'ttl_dns_cache': dns_cache_ttl or None,
+        }
+        if keep_alive and keep_alive_timeout is not None:
+            connector_options['keepalive_timeout'] = keep_alive_timeout
+
+        class PooledAioHttpTransport(AioHttpTransport):
+            async def open(self):
+                # The connector has to be created in the event loop that uses it.
+                if not self.session and self._session_owner:
+                    self.session = aiohttp.ClientSession(
+                        connector=aiohttp.TCPConnector(**connector_options),
+                        trust_env=self._use_env_settings,
+                        cookie_jar=aiohttp.DummyCookieJar(),
+                        auto_decompress=False,
+                    )
+                await super().open()
+
+        return PooledAioHttpTransport(**kwargs)
+    if name == 'httpx':
+        import httpx
+        from azure.core.experimental.transport import AsyncHttpXTransport
+        client = httpx.AsyncClient(
+            http2=http2,
+            limits=httpx.Limits(
+                max_connections=pool_connections * per_host,
+                max_keepalive_connections=per_host if keep_alive else 0,
+                keepalive_expiry=keep_alive_timeout if keep_alive_timeout is not None else 5.0,
+            ),
+        )
+        return AsyncHttpXTransport(client=client, client_owner=True, **kwargs)
+    if name == 'requests':
+        raise ValueError("'requests' is a sync transport, use 'build_transport' to build it.")
+    raise ValueError(f"Unexpected transport type: '{name}'.")
@@ -4,14 +4,17 @@
 # license information.
 # --------------------------------------------------------------------------
 
+from collections import OrderedDict
 from collections.abc import Iterator
 from io import SEEK_END, SEEK_SET, RawIOBase, UnsupportedOperation
 from types import TracebackType
 import logging
 import email
+import time
+from threading import Lock
 from itertools import islice
 from datetime import datetime, timezone, timedelta
-from typing import IO, Literal, Any, Callable, Dict, Generator, Generic, Optional, Tuple, TypeVar, Union, NoReturn
+from typing import IO, Literal, Any, Callable, Dict, Generator, Generic, Hashable, Optional, Tuple, TypeVar, Union, NoReturn
 from typing_extensions import Self
 from urllib.parse import quote
 
@@ -52,6 +55,56 @@ class Pages(Generic[PageType]):
         return continuation
 
 
+
+class LRUCache:
+    """A thread-safe least-recently-used cache with an optional time-to-live per entry.
+
+    Expired entries are kept until evicted, so that callers can choose to revalidate
+    them rather than fetch them again.
+    """
+
+    def __init__(self, *, maxsize: int = 1024, ttl: Optional[float] = None) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: OrderedDict[Hashable, Tuple[Any, float]] = OrderedDict()
+        self._lock = Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable, *, stale: bool = False) -> Any:
+        """Return the cached value, raising KeyError if it is missing, or expired and `stale` is False."""
+        with self._lock:
+            value, stored = self._entries[key]
+            if not stale and self.ttl is not None and time.monotonic() - stored > self.ttl:
+                raise KeyError(key)
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._entries[key] = (value, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def touch(self, key: Hashable) -> None:
+        with self._lock:
+            try:
+                value, _ = self._entries[key]
+            except KeyError:
+                return
+            self._entries[key] = (value, time.monotonic())
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._entries.pop(key, None)
+        return default if entry is None else entry[0]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
 _LOGGER = logging.getLogger(__name__)
 _DAYS = {0: "Mon", 1: "Tue", 2: "Wed", 3: "Thu", 4: "Fri", 5: "Sat", 6: "Sun"}
 _MONTHS = {
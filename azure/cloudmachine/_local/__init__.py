@@ -0,0 +1,19 @@
+# -------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for
+# license information.
+# --------------------------------------------------------------------------
+
+from ._servicebus import LocalServiceBus
+from ._storage import LocalBlobStorage
+from ._tables import LocalTable, LocalTableStore
+from ._transport import LocalTransportAdapter, build_local_transport
+
+__all__ = [
+    'LocalBlobStorage',
+    'LocalServiceBus',
+    'LocalTable',
+    'LocalTableStore',
+    'LocalTransportAdapter',
+    'build_local_transport',
+]
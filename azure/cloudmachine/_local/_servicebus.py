@@ -0,0 +1,320 @@
+# -------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for
+# license information.
+# --------------------------------------------------------------------------
+
+import json
+import time
+import uuid
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Condition, Thread
+from typing import Deque, Dict, List, Mapping, Optional, Tuple
+from urllib.parse import parse_qs, unquote, urlparse
+import xml.etree.ElementTree as ET
+
+from typing_extensions import Self
+
+_ATOM = "http://www.w3.org/2005/Atom"
+_CONNECT = "http://schemas.microsoft.com/netservices/2010/10/servicebus/connect"
+_COUNTS = "http://schemas.microsoft.com/netservices/2011/06/servicebus"
+_DEFAULT_TIME_TO_LIVE = 14 * 24 * 60 * 60
+DEFAULT_TOPICS: Mapping[str, List[str]] = {
+    'cm_default_topic': ['cm_default_subscription'],
+    'cm_internal_topic': ['cm_internal_subscription'],
+}
+
+
+@dataclass
+class _LocalMessage:
+    id: str
+    body: bytes
+    sequence_number: int
+    enqueued_time: datetime
+    time_to_live: int
+    delivery_count: int = 0
+    lock_token: Optional[str] = None
+    locked_until: Optional[datetime] = None
+
+
+@dataclass
+class _LocalEntity:
+    created_at: datetime = field(default_factory=lambda: datetime.now(timezone.utc))
+    available: Deque[_LocalMessage] = field(default_factory=deque)
+    locked: Dict[str, _LocalMessage] = field(default_factory=dict)
+    dead_letter: List[_LocalMessage] = field(default_factory=list)
+
+
+class LocalServiceBus:
+    """An in-process HTTP stand-in for the Service Bus REST operations used by CloudMachineServiceBus.
+
+    Supports sending, peek-lock and receive-and-delete, complete, abandon and lock renewal,
+    and the entity runtime information used for the message count. Topics fan out to their
+    subscriptions, and queues are created on first use.
+    """
+
+    def __init__(
+            self,
+            *,
+            host: str = '127.0.0.1',
+            port: int = 0,
+            lock_duration: float = 60,
+            max_delivery_count: int = 10,
+            default_timeout: float = 60,
+            topics: Optional[Mapping[str, List[str]]] = None,
+    ):
+        self.lock_duration = lock_duration
+        self.max_delivery_count = max_delivery_count
+        self.default_timeout = default_timeout
+        self._condition = Condition()
+        self._sequence = 0
+        self._queues: Dict[str, _LocalEntity] = {}
+        self._topics: Dict[str, Dict[str, _LocalEntity]] = {
+            t: {s: _LocalEntity() for s in subscriptions}
+            for t, subscriptions in (DEFAULT_TOPICS if topics is None else topics).items()
+        }
+        self.handler = _build_handler(self)
+        self._server = ThreadingHTTPServer((host, port), self.handler)
+        self._server.daemon_threads = True
+        self._thread: Optional[Thread] = None
+        self._closed = False
+
+    @property
+    def endpoint(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/"
+
+    def start(self) -> Self:
+        if not self._thread:
+            self._thread = Thread(target=self._server.serve_forever, daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        if self._thread:
+            self._server.shutdown()
+            self._thread.join()
+            self._thread = None
+        self._server.server_close()
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+
+    def __enter__(self) -> Self:
+        return self.start()
+
+    def __exit__(self, *args) -> None:
+        self.stop()
+
+    def _entity(self, path: List[str]) -> Optional[_LocalEntity]:
+        if len(path) == 3 and path[1] == 'subscriptions':
+            return self._topics.setdefault(path[0], {}).setdefault(path[2], _LocalEntity())
+        if len(path) == 1:
+            return self._queues.setdefault(path[0], _LocalEntity())
+        return None
+
+    def _expire_locks(self, entity: _LocalEntity, now: datetime) -> None:
+        for token, message in list(entity.locked.items()):
+            if message.locked_until <= now:
+                del entity.locked[token]
+                message.lock_token = None
+                entity.available.appendleft(message)
+
+    def send(
+            self,
+            body: bytes,
+            *,
+            queue: Optional[str] = None,
+            topic: Optional[str] = None,
+            message_id: Optional[str] = None,
+            time_to_live: Optional[int] = None,
+    ) -> None:
+        name = queue or topic
+        if not name:
+            raise ValueError("Either a queue or topic must be specified.")
+        with self._condition:
+            if topic and topic in self._topics:
+                entities = list(self._topics[topic].values())
+            else:
+                entities = [self._queues.setdefault(name, _LocalEntity())]
+            now = datetime.now(timezone.utc)
+            for entity in entities:
+                self._sequence += 1
+                entity.available.append(_LocalMessage(
+                    id=message_id or uuid.uuid4().hex,
+                    body=body,
+                    sequence_number=self._sequence,
+                    enqueued_time=now,
+                    time_to_live=time_to_live or _DEFAULT_TIME_TO_LIVE,
+                ))
+            self._condition.notify_all()
+
+    def _receive(self, entity: _LocalEntity, timeout: float, lock: bool) -> Optional[_LocalMessage]:
+        deadline = time.monotonic() + timeout
+        with self._condition:
+            while True:
+                now = datetime.now(timezone.utc)
+                self._expire_locks(entity, now)
+                while entity.available:
+                    message = entity.available.popleft()
+                    if message.enqueued_time + timedelta(seconds=message.time_to_live) <= now:
+                        continue
+                    if message.delivery_count >= self.max_delivery_count:
+                        entity.dead_letter.append(message)
+                        continue
+                    message.delivery_count += 1
+                    if lock:
+                        message.lock_token = str(uuid.uuid4())
+                        message.locked_until = now + timedelta(seconds=self.lock_duration)
+                        entity.locked[message.lock_token] = message
+                    return message
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or self._closed:
+                    return None
+                # Wake up for new messages, or when the earliest lock expires.
+                if entity.locked:
+                    earliest = min(m.locked_until for m in entity.locked.values())
+                    remaining = min(remaining, max((earliest - now).total_seconds(), 0.01))
+                self._condition.wait(remaining)
+
+    def _settle(self, entity: _LocalEntity, message_id: str, lock_token: str, method: str) -> bool:
+        with self._condition:
+            now = datetime.now(timezone.utc)
+            self._expire_locks(entity, now)
+            message = entity.locked.get(lock_token)
+            if not message or message.id != message_id:
+                return False
+            if method == 'POST':
+                message.locked_until = now + timedelta(seconds=self.lock_duration)
+                return True
+            del entity.locked[lock_token]
+            message.lock_token = None
+            if method == 'PUT':
+                entity.available.appendleft(message)
+                self._condition.notify_all()
+            return True
+
+    def _describe(self, path: List[str], entity: _LocalEntity) -> bytes:
+        # The element order matches the service, as the client reads the counts by position.
+        with self._condition:
+            self._expire_locks(entity, datetime.now(timezone.utc))
+            active = len(entity.available) + len(entity.locked)
+            dead_letter = len(entity.dead_letter)
+        timestamp = entity.created_at.isoformat()
+        kind = 'SubscriptionDescription' if len(path) == 3 else 'QueueDescription'
+        root = ET.Element(f"{{{_ATOM}}}entry")
+        ET.SubElement(root, f"{{{_ATOM}}}id").text = self.endpoint + "/".join(path)
+        ET.SubElement(root, f"{{{_ATOM}}}title").text = path[-1]
+        ET.SubElement(root, f"{{{_ATOM}}}published").text = timestamp
+        ET.SubElement(root, f"{{{_ATOM}}}updated").text = timestamp
+        ET.SubElement(root, f"{{{_ATOM}}}link", rel="self", href=self.endpoint + "/".join(path))
+        content = ET.SubElement(root, f"{{{_ATOM}}}content", type="application/xml")
+        description = ET.SubElement(content, f"{{{_CONNECT}}}{kind}")
+        for name, value in [
+                ('LockDuration', f"PT{int(self.lock_duration)}S"),
+                ('RequiresSession', 'false'),
+                ('DefaultMessageTimeToLive', f"PT{_DEFAULT_TIME_TO_LIVE}S"),
+                ('DeadLetteringOnMessageExpiration', 'false'),
+                ('DeadLetteringOnFilterEvaluationExceptions', 'false'),
+                ('MessageCount', str(active + dead_letter)),
+                ('MaxDeliveryCount', str(self.max_delivery_count)),
+                ('EnableBatchedOperations', 'true'),
+                ('Status', 'Active'),
+                ('CreatedAt', timestamp),
+                ('UpdatedAt', timestamp),
+                ('AccessedAt', datetime.now(timezone.utc).isoformat())]:
+            ET.SubElement(description, f"{{{_CONNECT}}}{name}").text = value
+        counts = ET.SubElement(description, f"{{{_CONNECT}}}CountDetails")
+        for name, value in [
+                ('ActiveMessageCount', active),
+                ('DeadLetterMessageCount', dead_letter),
+                ('ScheduledMessageCount', 0),
+                ('TransferDeadLetterMessageCount', 0),
+                ('TransferMessageCount', 0)]:
+            ET.SubElement(counts, f"{{{_COUNTS}}}{name}").text = str(value)
+        return ET.tostring(root, encoding='utf-8', xml_declaration=True)
+
+
+def _broker_properties(message: _LocalMessage) -> str:
+    properties = {
+        'DeliveryCount': message.delivery_count,
+        'EnqueuedSequenceNumber': message.sequence_number,
+        'EnqueuedTimeUtc': format_datetime(message.enqueued_time, usegmt=True),
+        'MessageId': message.id,
+        'SequenceNumber': message.sequence_number,
+        'State': 'Active',
+        'TimeToLive': message.time_to_live,
+    }
+    if message.lock_token:
+        properties['LockToken'] = message.lock_token
+        properties['LockedUntilUtc'] = format_datetime(message.locked_until, usegmt=True)
+    return json.dumps(properties)
+
+
+def _build_handler(bus: LocalServiceBus) -> type:
+
+    class _Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format: str, *args) -> None:
+            pass
+
+        def _respond(self, status: int, body: bytes = b"", headers: Optional[Dict[str, str]] = None) -> None:
+            self.send_response(status)
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            if body:
+                self.wfile.write(body)
+
+        def _parse(self) -> Tuple[List[str], Dict[str, List[str]], bytes]:
+            url = urlparse(self.path)
+            length = int(self.headers.get('Content-Length') or 0)
+            body = self.rfile.read(length) if length else b""
+            return [unquote(p) for p in url.path.split('/') if p], parse_qs(url.query), body
+
+        def _handle(self) -> None:
+            path, params, body = self._parse()
+            if 'messages' not in path:
+                entity = bus._entity(path) if self.command == 'GET' else None
+                if entity is None:
+                    return self._respond(404)
+                return self._respond(200, bus._describe(path, entity), {'Content-Type': 'application/atom+xml'})
+            index = path.index('messages')
+            entity_path, operation = path[:index], path[index + 1:]
+            if not operation and self.command == 'POST' and len(entity_path) == 1:
+                properties = json.loads(self.headers.get('BrokerProperties') or "{}")
+                bus.send(
+                    body,
+                    topic=entity_path[0],
+                    message_id=properties.get('MessageId'),
+                    time_to_live=properties.get('TimeToLive'),
+                )
+                return self._respond(201)
+            entity = bus._entity(entity_path)
+            if entity is None:
+                return self._respond(404)
+            if operation == ['head'] and self.command in ('POST', 'DELETE'):
+                timeout = float(params.get('timeout', [bus.default_timeout])[0])
+                message = bus._receive(entity, timeout, lock=self.command == 'POST')
+                if not message:
+                    return self._respond(204)
+                return self._respond(
+                    201 if self.command == 'POST' else 200,
+                    message.body,
+                    {'BrokerProperties': _broker_properties(message), 'Content-Type': 'application/octet-stream'}
+                )
+            if len(operation) == 2 and self.command in ('PUT', 'POST', 'DELETE'):
+                if bus._settle(entity, operation[0], operation[1], self.command):
+                    return self._respond(200)
+                return self._respond(404)
+            return self._respond(405)
+
+        do_GET = do_PUT = do_POST = do_DELETE = _handle
+
+    return _Handler
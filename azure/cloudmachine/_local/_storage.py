@@ -0,0 +1,482 @@
+# -------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for
+# license information.
+# --------------------------------------------------------------------------
+
+import os
+import json
+import shutil
+import tempfile
+import time
+import uuid
+import itertools
+from io import BytesIO
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from http import HTTPStatus
+from http.client import HTTPMessage, parse_headers
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import RLock, Thread
+from typing import IO, Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, parse_qsl, quote, unquote, urlparse
+import xml.etree.ElementTree as ET
+
+from typing_extensions import Self
+
+_COPY_CHUNK_SIZE = 4 * 1024 * 1024
+_DEFAULT_MAX_RESULTS = 5000
+_PROPERTY_HEADERS = {
+    'content_type': 'x-ms-blob-content-type',
+    'content_encoding': 'x-ms-blob-content-encoding',
+    'content_language': 'x-ms-blob-content-language',
+    'content_disposition': 'x-ms-blob-content-disposition',
+    'cache_control': 'x-ms-blob-cache-control',
+}
+_RESPONSE_HEADERS = {
+    'content_type': 'Content-Type',
+    'content_encoding': 'Content-Encoding',
+    'content_language': 'Content-Language',
+    'content_disposition': 'Content-Disposition',
+    'cache_control': 'Cache-Control',
+}
+_LIST_PROPERTIES = {
+    'content_type': 'Content-Type',
+    'content_encoding': 'Content-Encoding',
+    'content_language': 'Content-Language',
+    'cache_control': 'Cache-Control',
+    'content_disposition': 'Content-Disposition',
+}
+
+Result = Tuple[int, Dict[str, str]]
+
+
+def _error(status: int, code: str) -> Result:
+    return status, {'x-ms-error-code': code}
+
+
+def _http_date(timestamp: float) -> str:
+    return format_datetime(datetime.fromtimestamp(int(timestamp), timezone.utc), usegmt=True)
+
+
+def _parse_range(value: Optional[str], length: int) -> Optional[Tuple[int, int]]:
+    if not value or not value.startswith('bytes='):
+        return None
+    start, _, end = value[len('bytes='):].partition('-')
+    start = int(start)
+    end = int(end) if end else length - 1
+    return start, min(end, length - 1)
+
+
+class LocalBlobStorage:
+    """A filesystem-backed HTTP stand-in for the Blob operations used by CloudMachineStorage.
+
+    Supports container create and delete, block blob upload with conditional headers,
+    ranged download, paged listing with markers and delimiters, and batch delete. Blobs are
+    stored under ``root``, or a temporary directory that is removed when the server stops.
+    """
+
+    def __init__(
+            self,
+            root: Optional[str] = None,
+            *,
+            host: str = '127.0.0.1',
+            port: int = 0,
+            containers: Optional[List[str]] = None,
+    ):
+        self._owns_root = root is None
+        self.root = root or tempfile.mkdtemp(prefix='cloudmachine-blobs-')
+        os.makedirs(self.root, exist_ok=True)
+        self._lock = RLock()
+        self._etags = itertools.count(time.time_ns())
+        for container in containers or []:
+            self.create_container(container)
+        self.handler = _build_handler(self)
+        self._server = ThreadingHTTPServer((host, port), self.handler)
+        self._server.daemon_threads = True
+        self._thread: Optional[Thread] = None
+
+    @property
+    def endpoint(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/"
+
+    def start(self) -> Self:
+        if not self._thread:
+            self._thread = Thread(target=self._server.serve_forever, daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        if self._thread:
+            self._server.shutdown()
+            self._thread.join()
+            self._thread = None
+        self._server.server_close()
+        if self._owns_root:
+            shutil.rmtree(self.root, ignore_errors=True)
+
+    def __enter__(self) -> Self:
+        return self.start()
+
+    def __exit__(self, *args) -> None:
+        self.stop()
+
+    def _etag(self) -> str:
+        return f'"0x{next(self._etags):X}"'
+
+    def _container_path(self, container: str) -> str:
+        return os.path.join(self.root, quote(container, safe=''))
+
+    def _blob_paths(self, container: str, blob: str) -> Tuple[str, str]:
+        container_path = self._container_path(container)
+        name = quote(blob, safe='')
+        return os.path.join(container_path, 'blobs', name), os.path.join(container_path, 'properties', name)
+
+    def _load_properties(self, container: str, blob: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self._blob_paths(container, blob)[1], 'r', encoding='utf-8') as props:
+                return json.load(props)
+        except FileNotFoundError:
+            return None
+
+    def _check_conditions(
+            self,
+            properties: Optional[Dict[str, Any]],
+            headers: HTTPMessage,
+            read: bool
+    ) -> Optional[Result]:
+        not_modified = _error(304, 'ConditionNotMet') if read else _error(412, 'ConditionNotMet')
+        if_match = headers.get('If-Match')
+        if if_match:
+            if not properties:
+                return _error(412, 'ConditionNotMet')
+            if if_match != '*' and properties['etag'] not in [e.strip() for e in if_match.split(',')]:
+                return _error(412, 'ConditionNotMet')
+        if_none_match = headers.get('If-None-Match')
+        if if_none_match and properties:
+            if if_none_match == '*':
+                return not_modified if read else _error(409, 'BlobAlreadyExists')
+            if properties['etag'] in [e.strip() for e in if_none_match.split(',')]:
+                return not_modified
+        if properties:
+            modified = int(properties['last_modified'])
+            if_modified_since = headers.get('If-Modified-Since')
+            if if_modified_since and modified <= parsedate_to_datetime(if_modified_since).timestamp():
+                return not_modified
+            if_unmodified_since = headers.get('If-Unmodified-Since')
+            if if_unmodified_since and modified > parsedate_to_datetime(if_unmodified_since).timestamp():
+                return _error(412, 'ConditionNotMet')
+        return None
+
+    def create_container(self, container: str) -> Result:
+        path = self._container_path(container)
+        with self._lock:
+            if os.path.isdir(path):
+                return _error(409, 'ContainerAlreadyExists')
+            os.makedirs(os.path.join(path, 'blobs'))
+            os.makedirs(os.path.join(path, 'properties'))
+        return 201, {'ETag': self._etag(), 'Last-Modified': _http_date(time.time())}
+
+    def delete_container(self, container: str) -> Result:
+        path = self._container_path(container)
+        with self._lock:
+            if not os.path.isdir(path):
+                return _error(404, 'ContainerNotFound')
+            shutil.rmtree(path)
+        return 202, {}
+
+    def upload_blob(self, container: str, blob: str, headers: HTTPMessage, body: IO[bytes], length: int) -> Result:
+        container_path = self._container_path(container)
+        data_path, properties_path = self._blob_paths(container, blob)
+        exists = os.path.isdir(container_path)
+        # The body is always consumed so that the connection can be reused.
+        with tempfile.NamedTemporaryFile(dir=container_path if exists else self.root, delete=False) as staged:
+            remaining = length
+            while remaining > 0:
+                chunk = body.read(min(remaining, _COPY_CHUNK_SIZE))
+                if not chunk:
+                    break
+                staged.write(chunk)
+                remaining -= len(chunk)
+        try:
+            if remaining > 0:
+                return _error(400, 'InvalidInput')
+            with self._lock:
+                if not os.path.isdir(container_path):
+                    return _error(404, 'ContainerNotFound')
+                properties = self._load_properties(container, blob)
+                failed = self._check_conditions(properties, headers, read=False)
+                if failed:
+                    return failed
+                now = time.time()
+                properties = {
+                    'name': blob,
+                    'etag': self._etag(),
+                    'created': properties['created'] if properties else now,
+                    'last_modified': now,
+                    'content_length': length,
+                    'metadata': {k[len('x-ms-meta-'):]: v for k, v in headers.items() if k.lower().startswith('x-ms-meta-')},
+                    'tags': dict(parse_qsl(headers.get('x-ms-tags') or '')),
+                }
+                for key, header in _PROPERTY_HEADERS.items():
+                    properties[key] = headers.get(header)
+                properties['content_type'] = properties['content_type'] or 'application/octet-stream'
+                os.replace(staged.name, data_path)
+                with open(properties_path, 'w', encoding='utf-8') as props:
+                    json.dump(properties, props)
+        finally:
+            if os.path.exists(staged.name):
+                os.remove(staged.name)
+        return 201, {
+            'ETag': properties['etag'],
+            'Last-Modified': _http_date(now),
+            'x-ms-request-server-encrypted': 'false',
+        }
+
+    def download_blob(
+            self,
+            container: str,
+            blob: str,
+            headers: HTTPMessage
+    ) -> Tuple[int, Dict[str, str], Optional[IO[bytes]], int]:
+        data_path, _ = self._blob_paths(container, blob)
+        with self._lock:
+            if not os.path.isdir(self._container_path(container)):
+                return (*_error(404, 'ContainerNotFound'), None, 0)
+            properties = self._load_properties(container, blob)
+            if not properties:
+                return (*_error(404, 'BlobNotFound'), None, 0)
+            failed = self._check_conditions(properties, headers, read=True)
+            if failed:
+                return (*failed, None, 0)
+            # The open handle stays valid if the blob is replaced while it is being streamed.
+            data = open(data_path, 'rb')
+        length = properties['content_length']
+        response_headers = {
+            'ETag': properties['etag'],
+            'Last-Modified': _http_date(properties['last_modified']),
+            'Accept-Ranges': 'bytes',
+            'x-ms-blob-type': 'BlockBlob',
+            'x-ms-creation-time': _http_date(properties['created']),
+        }
+        for key, header in _RESPONSE_HEADERS.items():
+            if properties.get(key):
+                response_headers[header] = properties[key]
+        for key, value in properties['metadata'].items():
+            response_headers[f'x-ms-meta-{key}'] = value
+        if properties['tags']:
+            response_headers['x-ms-tag-count'] = str(len(properties['tags']))
+        byte_range = _parse_range(headers.get('x-ms-range') or headers.get('Range'), length)
+        if not byte_range:
+            return 200, response_headers, data, length
+        start, end = byte_range
+        if start >= length or start > end:
+            data.close()
+            status, error_headers = _error(416, 'InvalidRange')
+            error_headers['Content-Range'] = f'bytes */{length}'
+            return status, error_headers, None, 0
+        data.seek(start)
+        response_headers['Content-Range'] = f'bytes {start}-{end}/{length}'
+        return 206, response_headers, data, end - start + 1
+
+    def delete_blob(self, container: str, blob: str, headers: HTTPMessage) -> Result:
+        data_path, properties_path = self._blob_paths(container, blob)
+        with self._lock:
+            if not os.path.isdir(self._container_path(container)):
+                return _error(404, 'ContainerNotFound')
+            properties = self._load_properties(container, blob)
+            if not properties:
+                return _error(404, 'BlobNotFound')
+            failed = self._check_conditions(properties, headers, read=False)
+            if failed:
+                return failed
+            os.remove(properties_path)
+            os.remove(data_path)
+        return 202, {'x-ms-delete-type-permanent': 'true'}
+
+    def list_blobs(self, container: str, params: Dict[str, str]) -> Tuple[int, Dict[str, str], bytes]:
+        prefix = params.get('prefix') or ''
+        delimiter = params.get('delimiter')
+        marker = params.get('marker') or ''
+        max_results = int(params.get('maxresults') or _DEFAULT_MAX_RESULTS)
+        include = (params.get('include') or '').split(',')
+        properties_dir = os.path.join(self._container_path(container), 'properties')
+        with self._lock:
+            try:
+                names = sorted(unquote(n) for n in os.listdir(properties_dir))
+            except FileNotFoundError:
+                return (*_error(404, 'ContainerNotFound'), b"")
+        root = ET.Element('EnumerationResults', ServiceEndpoint=self.endpoint, ContainerName=container)
+        ET.SubElement(root, 'Prefix').text = prefix or None
+        ET.SubElement(root, 'Marker').text = marker or None
+        ET.SubElement(root, 'MaxResults').text = str(max_results)
+        if delimiter:
+            ET.SubElement(root, 'Delimiter').text = delimiter
+        blobs = ET.SubElement(root, 'Blobs')
+        next_marker = None
+        results = 0
+        last_prefix = None
+        for name in names:
+            if name < marker or not name.startswith(prefix):
+                continue
+            if delimiter and delimiter in name[len(prefix):]:
+                blob_prefix = name[:name.index(delimiter, len(prefix)) + len(delimiter)]
+                if blob_prefix == last_prefix:
+                    continue
+            else:
+                blob_prefix = None
+            if results == max_results:
+                next_marker = name
+                break
+            results += 1
+            if blob_prefix:
+                last_prefix = blob_prefix
+                ET.SubElement(ET.SubElement(blobs, 'BlobPrefix'), 'Name').text = blob_prefix
+                continue
+            properties = self._load_properties(container, name)
+            if not properties:  # Deleted since the listing was taken.
+                continue
+            element = ET.SubElement(blobs, 'Blob')
+            ET.SubElement(element, 'Name').text = name
+            xml_properties = ET.SubElement(element, 'Properties')
+            ET.SubElement(xml_properties, 'Creation-Time').text = _http_date(properties['created'])
+            ET.SubElement(xml_properties, 'Last-Modified').text = _http_date(properties['last_modified'])
+            ET.SubElement(xml_properties, 'Etag').text = properties['etag']
+            ET.SubElement(xml_properties, 'Content-Length').text = str(properties['content_length'])
+            for key, tag in _LIST_PROPERTIES.items():
+                ET.SubElement(xml_properties, tag).text = properties.get(key)
+            ET.SubElement(xml_properties, 'BlobType').text = 'BlockBlob'
+            ET.SubElement(xml_properties, 'LeaseStatus').text = 'unlocked'
+            ET.SubElement(xml_properties, 'LeaseState').text = 'available'
+            ET.SubElement(xml_properties, 'ServerEncrypted').text = 'false'
+            if properties['tags']:
+                ET.SubElement(xml_properties, 'TagCount').text = str(len(properties['tags']))
+            if 'metadata' in include:
+                metadata = ET.SubElement(element, 'Metadata')
+                for key, value in properties['metadata'].items():
+                    ET.SubElement(metadata, key).text = value
+            if 'tags' in include and properties['tags']:
+                tag_set = ET.SubElement(ET.SubElement(element, 'Tags'), 'TagSet')
+                for key, value in properties['tags'].items():
+                    tag = ET.SubElement(tag_set, 'Tag')
+                    ET.SubElement(tag, 'Key').text = key
+                    ET.SubElement(tag, 'Value').text = value
+        ET.SubElement(root, 'NextMarker').text = next_marker
+        return 200, {'Content-Type': 'application/xml'}, ET.tostring(root, encoding='utf-8', xml_declaration=True)
+
+    def batch(self, content_type: str, body: bytes) -> Tuple[int, Dict[str, str], bytes]:
+        _, _, boundary = content_type.partition('boundary=')
+        boundary = boundary.strip('"').encode()
+        response_boundary = f"batchresponse_{uuid.uuid4()}"
+        response = []
+        for index, part in enumerate(body.split(b'--' + boundary)[1:-1]):
+            _, _, request = part.lstrip(b'\r\n').replace(b'\r\n', b'\n').partition(b'\n\n')
+            request_line, *header_lines = request.strip(b'\n').split(b'\n')
+            method, target, _ = request_line.decode().split(' ', 2)
+            headers = parse_headers(BytesIO(b'\r\n'.join(header_lines) + b'\r\n\r\n'))
+            path = [unquote(p) for p in urlparse(target).path.split('/') if p]
+            if method == 'DELETE' and len(path) >= 2:
+                status, part_headers = self.delete_blob(path[0], '/'.join(path[1:]), headers)
+            else:
+                status, part_headers = _error(400, 'UnsupportedHttpVerb')
+            lines = [
+                f"--{response_boundary}",
+                "Content-Type: application/http",
+                f"Content-ID: {index}",
+                "",
+                f"HTTP/1.1 {status} {HTTPStatus(status).phrase}",
+                *[f"{k}: {v}" for k, v in part_headers.items()],
+                "Content-Length: 0",
+                "",
+                "",
+            ]
+            response.append("\r\n".join(lines))
+        response.append(f"--{response_boundary}--\r\n")
+        return 202, {'Content-Type': f"multipart/mixed; boundary={response_boundary}"}, "".join(response).encode()
+
+
+def _build_handler(storage: LocalBlobStorage) -> type:
+
+    class _Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format: str, *args) -> None:
+            pass
+
+        def _respond(
+                self,
+                status: int,
+                headers: HTTPMessage,
+                body: bytes = b"",
+                stream: Optional[IO[bytes]] = None,
+                length: Optional[int] = None,
+        ) -> None:
+            if 'x-ms-error-code' in headers and self.command != 'HEAD' and status != 304:
+                body = (
+                    '<?xml version="1.0" encoding="utf-8"?>'
+                    f"<Error><Code>{headers['x-ms-error-code']}</Code><Message></Message></Error>"
+                ).encode()
+                headers['Content-Type'] = 'application/xml'
+            self.send_response(status)
+            self.send_header('x-ms-request-id', str(uuid.uuid4()))
+            self.send_header('x-ms-version', self.headers.get('x-ms-version', ''))
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.send_header('Content-Length', str(length if stream else len(body)))
+            self.end_headers()
+            if self.command == 'HEAD':
+                body, stream = b"", None
+            if body:
+                self.wfile.write(body)
+            if stream:
+                with stream:
+                    remaining = length
+                    while remaining > 0:
+                        chunk = stream.read(min(remaining, _COPY_CHUNK_SIZE))
+                        if not chunk:
+                            break
+                        self.wfile.write(chunk)
+                        remaining -= len(chunk)
+
+        def _handle(self) -> None:
+            url = urlparse(self.path)
+            path = [unquote(p) for p in url.path.split('/') if p]
+            params = {k: v[0] for k, v in parse_qs(url.query).items()}
+            headers = self.headers
+            length = int(self.headers.get('Content-Length') or 0)
+            if not path:
+                body = self.rfile.read(length) if length else b""
+                if self.command == 'POST' and params.get('comp') == 'batch':
+                    return self._respond(*storage.batch(self.headers.get('Content-Type', ''), body))
+                return self._respond(*_error(400, 'UnsupportedHttpVerb'))
+            if len(path) == 1:
+                if length:
+                    self.rfile.read(length)
+                if params.get('restype') != 'container':
+                    return self._respond(*_error(400, 'InvalidQueryParameterValue'))
+                if self.command == 'PUT':
+                    return self._respond(*storage.create_container(path[0]))
+                if self.command == 'DELETE':
+                    return self._respond(*storage.delete_container(path[0]))
+                if self.command == 'GET' and params.get('comp') == 'list':
+                    return self._respond(*storage.list_blobs(path[0], params))
+                return self._respond(*_error(400, 'UnsupportedHttpVerb'))
+            container, blob = path[0], '/'.join(path[1:])
+            if self.command == 'PUT':
+                if 'Content-Length' not in self.headers:
+                    self.close_connection = True
+                    return self._respond(*_error(411, 'MissingContentLengthHeader'))
+                return self._respond(*storage.upload_blob(container, blob, headers, self.rfile, length))
+            if length:
+                self.rfile.read(length)
+            if self.command in ('GET', 'HEAD'):
+                status, response_headers, stream, content_length = storage.download_blob(container, blob, headers)
+                return self._respond(status, response_headers, stream=stream, length=content_length)
+            if self.command == 'DELETE':
+                return self._respond(*storage.delete_blob(container, blob, headers))
+            return self._respond(*_error(400, 'UnsupportedHttpVerb'))
+
+        do_GET = do_HEAD = do_PUT = do_POST = do_DELETE = _handle
+
+    return _Handler
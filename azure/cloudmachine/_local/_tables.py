@@ -0,0 +1,424 @@
+# -------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for
+# license information.
+# --------------------------------------------------------------------------
+
+import re
+import json
+import sqlite3
+import uuid
+from base64 import b16decode
+from datetime import datetime, timezone
+from threading import RLock
+from typing import Any, Callable, Dict, Generator, List, Mapping, Optional, Tuple
+
+from azure.core import MatchConditions
+from azure.core.exceptions import (
+    HttpResponseError,
+    ResourceExistsError,
+    ResourceModifiedError,
+    ResourceNotFoundError,
+)
+
+from .._httpclient._tables import (
+    TableEntity,
+    TableOperationMode,
+    serialize_entity,
+    deserialize_entity,
+    format_filter,
+    _deserialize_datetime,
+)
+
+_TOKENS = re.compile(r"""
+    \s*(?:
+        (?P<paren>[()])
+        |(?P<typed>(?:datetime|guid|X|binary)'(?:[^']|'')*')
+        |(?P<string>'(?:[^']|'')*')
+        |(?P<number>-?\d+(?:\.\d+)?(?:[eE][-+]?\d+)?[LdDfFmM]?)
+        |(?P<word>[A-Za-z_][A-Za-z0-9_]*)
+    )""", re.VERBOSE)
+_COMPARISONS: Dict[str, Callable[[Any, Any], bool]] = {
+    'eq': lambda a, b: a == b,
+    'ne': lambda a, b: a != b,
+    'gt': lambda a, b: a > b,
+    'ge': lambda a, b: a >= b,
+    'lt': lambda a, b: a < b,
+    'le': lambda a, b: a <= b,
+}
+_KEY_COMPARISONS = {'eq': '=', 'gt': '>', 'ge': '>=', 'lt': '<', 'le': '<='}
+Expression = Tuple[Any, ...]
+
+
+def _tokenize(query: str) -> List[Tuple[str, str]]:
+    tokens = []
+    position = 0
+    query = query.rstrip()
+    while position < len(query):
+        match = _TOKENS.match(query, position)
+        if not match or match.end() == position:
+            raise ValueError(f"Unsupported filter syntax at position {position}: {query!r}")
+        tokens.append((match.lastgroup, match.group(match.lastgroup)))
+        position = match.end()
+    return tokens
+
+
+def _literal(kind: str, value: str) -> Any:
+    if kind == 'string':
+        return value[1:-1].replace("''", "'")
+    if kind == 'number':
+        if value[-1] in 'LdDfFmM':
+            value = value[:-1]
+        return float(value) if any(c in value for c in '.eE') else int(value)
+    prefix, _, quoted = value.partition("'")
+    quoted = quoted[:-1].replace("''", "'")
+    if prefix == 'datetime':
+        return _deserialize_datetime(quoted)
+    if prefix == 'guid':
+        return uuid.UUID(quoted)
+    return b16decode(quoted.upper())
+
+
+class _FilterParser:
+    """Parses the subset of OData filters supported by the Table service into an expression tree."""
+
+    def __init__(self, query: str):
+        self._tokens = _tokenize(query)
+        self._position = 0
+
+    def parse(self) -> Expression:
+        expression = self._or()
+        if self._position != len(self._tokens):
+            raise ValueError(f"Unexpected token in filter: {self._tokens[self._position][1]!r}")
+        return expression
+
+    def _peek(self) -> Optional[str]:
+        if self._position < len(self._tokens):
+            return self._tokens[self._position][1]
+        return None
+
+    def _next(self) -> Tuple[str, str]:
+        try:
+            token = self._tokens[self._position]
+        except IndexError:
+            raise ValueError("Unexpected end of filter.") from None
+        self._position += 1
+        return token
+
+    def _or(self) -> Expression:
+        expression = self._and()
+        while self._peek() == 'or':
+            self._next()
+            expression = ('or', expression, self._and())
+        return expression
+
+    def _and(self) -> Expression:
+        expression = self._not()
+        while self._peek() == 'and':
+            self._next()
+            expression = ('and', expression, self._not())
+        return expression
+
+    def _not(self) -> Expression:
+        if self._peek() == 'not':
+            self._next()
+            return ('not', self._not())
+        return self._comparison()
+
+    def _comparison(self) -> Expression:
+        left = self._operand()
+        if self._peek() in _COMPARISONS:
+            operator = self._next()[1]
+            return ('cmp', operator, left, self._operand())
+        return left
+
+    def _operand(self) -> Expression:
+        kind, value = self._next()
+        if value == '(':
+            expression = self._or()
+            if self._next()[1] != ')':
+                raise ValueError("Unbalanced parentheses in filter.")
+            return expression
+        if kind == 'word':
+            if value in ('true', 'false'):
+                return ('lit', value == 'true')
+            if value == 'null':
+                return ('lit', None)
+            return ('prop', value)
+        if kind in ('string', 'number', 'typed'):
+            return ('lit', _literal(kind, value))
+        raise ValueError(f"Unexpected token in filter: {value!r}")
+
+
+def _evaluate(expression: Expression, entity: Mapping[str, Any]) -> Any:
+    kind = expression[0]
+    if kind == 'lit':
+        return expression[1]
+    if kind == 'prop':
+        return entity.get(expression[1])
+    if kind == 'and':
+        return _evaluate(expression[1], entity) is True and _evaluate(expression[2], entity) is True
+    if kind == 'or':
+        return _evaluate(expression[1], entity) is True or _evaluate(expression[2], entity) is True
+    if kind == 'not':
+        return _evaluate(expression[1], entity) is not True
+    left = _evaluate(expression[2], entity)
+    right = _evaluate(expression[3], entity)
+    # As in the service, a comparison with a missing property, or between different
+    # types, doesn't match.
+    if left is None or right is None:
+        return False
+    try:
+        return _COMPARISONS[expression[1]](left, right)
+    except TypeError:
+        return False
+
+
+def _key_conditions(expression: Expression) -> Generator[Tuple[str, str, str], None, None]:
+    # Comparisons on the keys that must all hold can be answered by the primary key index.
+    if expression[0] == 'and':
+        yield from _key_conditions(expression[1])
+        yield from _key_conditions(expression[2])
+    elif (expression[0] == 'cmp' and expression[1] in _KEY_COMPARISONS and
+            expression[2][0] == 'prop' and expression[2][1] in ('PartitionKey', 'RowKey') and
+            expression[3][0] == 'lit' and isinstance(expression[3][1], str)):
+        yield expression[2][1], _KEY_COMPARISONS[expression[1]], expression[3][1]
+
+
+def _project(entity: TableEntity, select: Optional[List[str]]) -> TableEntity:
+    if not select:
+        return entity
+    projected = TableEntity((c, entity.get(c)) for c in select)
+    projected.metadata = entity.metadata
+    return projected
+
+
+class LocalTableStore:
+    """A SQLite database holding local tables, in memory unless a file path is given."""
+
+    def __init__(self, path: str = ':memory:'):
+        self.path = path
+        self.connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.lock = RLock()
+
+    def close(self) -> None:
+        with self.lock:
+            self.connection.close()
+
+
+class LocalTable:
+    """A stand-in for CloudMachineTable that keeps entities in a local SQLite table.
+
+    Entities are stored in the Table service wire format, keyed by PartitionKey and RowKey
+    with an additional RowKey index. Filters are evaluated locally, using the key indexes
+    for any comparisons on the keys.
+    """
+
+    def __init__(self, store: LocalTableStore, table_name: str):
+        self._store = store
+        self.table_name = table_name
+        self._sql_table = '"' + table_name.replace('"', '""') + '"'
+        sql_index = '"' + f"{table_name}_rowkey".replace('"', '""') + '"'
+        with store.lock:
+            store.connection.execute(
+                f"CREATE TABLE IF NOT EXISTS {self._sql_table} ("
+                "PartitionKey TEXT NOT NULL, RowKey TEXT NOT NULL, etag TEXT NOT NULL, "
+                "timestamp TEXT NOT NULL, entity TEXT NOT NULL, PRIMARY KEY (PartitionKey, RowKey)"
+                ") WITHOUT ROWID"
+            )
+            store.connection.execute(
+                f"CREATE INDEX IF NOT EXISTS {sql_index} ON {self._sql_table} (RowKey)"
+            )
+
+    def _load(self, row: Tuple[str, str, str]) -> TableEntity:
+        entity = deserialize_entity(json.loads(row[2]), row[0])
+        entity.metadata['timestamp'] = _deserialize_datetime(row[1])
+        return entity
+
+    def _read(self, partition_key: str, row_key: str) -> Optional[TableEntity]:
+        row = self._store.connection.execute(
+            f"SELECT etag, timestamp, entity FROM {self._sql_table} WHERE PartitionKey = ? AND RowKey = ?",
+            (partition_key, row_key)
+        ).fetchone()
+        return self._load(row) if row else None
+
+    def _write(self, entity: Mapping[str, Any]) -> None:
+        now = datetime.now(timezone.utc)
+        self._store.connection.execute(
+            f"INSERT OR REPLACE INTO {self._sql_table} VALUES (?, ?, ?, ?, ?)",
+            (
+                entity['PartitionKey'],
+                entity['RowKey'],
+                f'W/"datetime\'{now.isoformat()}\'-{uuid.uuid4().hex[:8]}"',
+                now.isoformat(),
+                json.dumps(serialize_entity(entity)),
+            )
+        )
+
+    def _check_etag(
+            self,
+            existing: TableEntity,
+            etag: Optional[str],
+            match_condition: Optional[MatchConditions]
+    ) -> None:
+        if etag and match_condition == MatchConditions.IfNotModified and existing.metadata['etag'] != etag:
+            raise ResourceModifiedError("The update condition specified in the request was not satisfied.")
+
+    def _create(self, entity: Mapping[str, Any]) -> None:
+        if self._read(entity['PartitionKey'], entity['RowKey']) is not None:
+            raise ResourceExistsError("The specified entity already exists.")
+        self._write(entity)
+
+    def _upsert(self, entity: Mapping[str, Any], mode: TableOperationMode) -> None:
+        if str(mode).lower() == 'merge':
+            existing = self._read(entity['PartitionKey'], entity['RowKey'])
+            if existing is not None:
+                entity = dict(existing, **entity)
+        self._write(entity)
+
+    def _update(
+            self,
+            entity: Mapping[str, Any],
+            mode: TableOperationMode,
+            etag: Optional[str],
+            match_condition: Optional[MatchConditions]
+    ) -> None:
+        existing = self._read(entity['PartitionKey'], entity['RowKey'])
+        if existing is None:
+            raise ResourceNotFoundError("The specified resource does not exist.")
+        self._check_etag(existing, etag, match_condition)
+        if str(mode).lower() == 'merge':
+            entity = dict(existing, **entity)
+        self._write(entity)
+
+    def _delete(
+            self,
+            partition_key: str,
+            row_key: str,
+            etag: Optional[str],
+            match_condition: Optional[MatchConditions]
+    ) -> None:
+        existing = self._read(partition_key, row_key)
+        if existing is None:
+            return
+        self._check_etag(existing, etag, match_condition)
+        self._store.connection.execute(
+            f"DELETE FROM {self._sql_table} WHERE PartitionKey = ? AND RowKey = ?",
+            (partition_key, row_key)
+        )
+
+    def get_entity(
+            self,
+            partition_key: str,
+            row_key: str,
+            *,
+            select: Optional[List[str]] = None,
+            **kwargs
+    ) -> TableEntity:
+        with self._store.lock:
+            entity = self._read(partition_key, row_key)
+        if entity is None:
+            raise ResourceNotFoundError("The specified resource does not exist.")
+        return _project(entity, select)
+
+    def query_entities(
+            self,
+            query: Optional[str],
+            *,
+            parameters: Optional[Dict[str, Any]] = None,
+            select: Optional[List[str]] = None,
+            results_per_page: Optional[int] = None,
+            **kwargs
+    ) -> Generator[TableEntity, None, None]:
+        expression = _FilterParser(format_filter(query, parameters)).parse() if query else None
+        sql = f"SELECT etag, timestamp, entity FROM {self._sql_table}"
+        conditions = list(_key_conditions(expression)) if expression else []
+        if conditions:
+            sql += " WHERE " + " AND ".join(f"{c[0]} {c[1]} ?" for c in conditions)
+        sql += " ORDER BY PartitionKey, RowKey"
+        with self._store.lock:
+            rows = self._store.connection.execute(sql, [c[2] for c in conditions]).fetchall()
+        for row in rows:
+            entity = self._load(row)
+            if expression is None or _evaluate(expression, entity) is True:
+                yield _project(entity, select)
+
+    def list_entities(
+            self,
+            *,
+            select: Optional[List[str]] = None,
+            results_per_page: Optional[int] = None,
+            **kwargs
+    ) -> Generator[TableEntity, None, None]:
+        return self.query_entities(None, select=select, results_per_page=results_per_page)
+
+    def create_entity(self, entity: Mapping[str, Any], **kwargs) -> None:
+        with self._store.lock:
+            self._create(entity)
+
+    def upsert_entity(self, entity: Mapping[str, Any], *, mode: TableOperationMode = 'merge', **kwargs) -> None:
+        with self._store.lock:
+            self._upsert(entity, mode)
+
+    def update_entity(
+            self,
+            entity: Mapping[str, Any],
+            *,
+            mode: TableOperationMode = 'merge',
+            etag: Optional[str] = None,
+            match_condition: Optional[MatchConditions] = None,
+            **kwargs
+    ) -> None:
+        with self._store.lock:
+            self._update(entity, mode, etag, match_condition)
+
+    def delete_entity(
+            self,
+            partition_key: str,
+            row_key: str,
+            *,
+            etag: Optional[str] = None,
+            match_condition: Optional[MatchConditions] = None,
+            **kwargs
+    ) -> None:
+        with self._store.lock:
+            self._delete(partition_key, row_key, etag, match_condition)
+
+    def submit_transaction(self, operations: List[Tuple[Any, ...]], **kwargs) -> None:
+        if not operations:
+            return
+        if len({o[1]['PartitionKey'] for o in operations}) > 1:
+            raise HttpResponseError("All entities in a transaction must have the same PartitionKey.")
+        with self._store.lock:
+            connection = self._store.connection
+            connection.execute("BEGIN")
+            try:
+                for operation in operations:
+                    action, entity = operation[0], operation[1]
+                    options: Dict[str, Any] = operation[2] if len(operation) > 2 else {}
+                    if action == 'create':
+                        self._create(entity)
+                    elif action == 'upsert':
+                        self._upsert(entity, options.get('mode', 'merge'))
+                    elif action == 'update':
+                        self._update(
+                            entity,
+                            options.get('mode', 'merge'),
+                            options.get('etag'),
+                            options.get('match_condition')
+                        )
+                    elif action == 'delete':
+                        if self._read(entity['PartitionKey'], entity['RowKey']) is None:
+                            raise ResourceNotFoundError("The specified resource does not exist.")
+                        self._delete(
+                            entity['PartitionKey'],
+                            entity['RowKey'],
+                            options.get('etag'),
+                            options.get('match_condition')
+                        )
+                    else:
+                        raise ValueError(f"Unsupported transaction operation '{action}'.")
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+            connection.execute("COMMIT")
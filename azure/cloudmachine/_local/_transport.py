@@ -0,0 +1,101 @@
+# -------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for
+# license information.
+# --------------------------------------------------------------------------
+
+from http.client import HTTPResponse
+from http.server import BaseHTTPRequestHandler
+from io import BytesIO
+from typing import Dict, Mapping, Type
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3 import HTTPResponse as Urllib3Response
+
+from .._httpclient import TransportWrapper
+
+
+class _Socket:
+    def __init__(self, data: bytes) -> None:
+        self._file = BytesIO(data)
+
+    def makefile(self, *args, **kwargs) -> BytesIO:
+        return self._file
+
+
+def _serialize_request(request: requests.PreparedRequest) -> bytes:
+    body = request.body or b""
+    if hasattr(body, 'read'):
+        body = body.read()
+    elif not isinstance(body, (bytes, str)):
+        body = b"".join(body)
+    if isinstance(body, str):
+        body = body.encode('utf-8')
+    headers = dict(request.headers)
+    headers['Host'] = urlparse(request.url).netloc
+    headers.pop('Transfer-Encoding', None)
+    headers['Content-Length'] = str(len(body))
+    lines = [f"{request.method} {request.path_url} HTTP/1.1"]
+    lines.extend(f"{k}: {v}" for k, v in headers.items())
+    return ("\r\n".join(lines) + "\r\n\r\n").encode('latin-1') + body
+
+
+class LocalTransportAdapter(HTTPAdapter):
+    """A requests adapter that hands each request to a local stand-in's handler in-process.
+
+    No socket is opened: the request is serialized, run through the handler against
+    in-memory buffers, and the raw response is parsed back.
+
+    :param routes: The handler class to use for each host (including port), for example
+     ``{'storage.local': LocalBlobStorage().handler}``.
+    """
+
+    def __init__(self, routes: Mapping[str, Type[BaseHTTPRequestHandler]]) -> None:
+        super().__init__()
+        self._handlers: Dict[str, Type[BaseHTTPRequestHandler]] = {
+            host: type('InProcessHandler', (handler,), {'__init__': _run_handler})
+            for host, handler in routes.items()
+        }
+
+    def send(self, request: requests.PreparedRequest, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        host = urlparse(request.url).netloc
+        try:
+            handler = self._handlers[host]
+        except KeyError:
+            raise requests.ConnectionError(f"No local handler registered for host '{host}'.", request=request)
+        raw = handler(_serialize_request(request)).wfile.getvalue()
+        response = HTTPResponse(_Socket(raw), method=request.method)
+        response.begin()
+        body = response.read()
+        return self.build_response(request, Urllib3Response(
+            body=BytesIO(body),
+            headers=response.getheaders(),
+            status=response.status,
+            reason=response.reason,
+            preload_content=False,
+            decode_content=False,
+        ))
+
+
+def _run_handler(self: BaseHTTPRequestHandler, raw: bytes) -> None:
+    self.rfile = BytesIO(raw)
+    self.wfile = BytesIO()
+    self.client_address = ('127.0.0.1', 0)
+    self.server = None
+    self.handle()
+
+
+def build_local_transport(routes: Mapping[str, Type[BaseHTTPRequestHandler]]) -> TransportWrapper:
+    """Build an HTTP transport that serves the given hosts from local stand-in handlers in-process.
+
+    :param routes: The handler class to use for each host (including port).
+    :rtype: ~azure.cloudmachine._httpclient.TransportWrapper
+    """
+    from azure.core.pipeline.transport import RequestsTransport
+    session = requests.Session()
+    adapter = LocalTransportAdapter(routes)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return TransportWrapper(RequestsTransport(session=session, session_owner=False))
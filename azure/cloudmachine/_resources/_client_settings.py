@@ -39,6 +39,7 @@ from typing import (
     Dict,
     List,
     Any,
+    Tuple,
     TypeVar,
     Generic,
     Protocol,
@@ -48,6 +49,7 @@ from typing import (
 from typing_extensions import Self
 from importlib import import_module
 from collections import UserString
+import functools
 from inspect import getfullargspec
 
 from azure.core.utils import case_insensitive_dict
@@ -61,7 +63,9 @@ from azure.core.credentials import (
 from azure.core.credentials_async import AsyncSupportsTokenInfo
 from azure.core.settings import _unset, PrioritizedSetting, Settings
 
-from ._setting import StoredPrioritizedSetting
+from ._setting import StoredPrioritizedSetting, settings_generation
+from ._credential_cache import default_credential, shared_token_credential
+from .._httpclient._transport import build_transport
 from ._resource_map import RESOURCE_IDS, AUDIENCES
 from ._client_types import ClientType, SyncClient
 
@@ -86,7 +90,7 @@ CredentialInputTypes = Union[
 TransportInputTypes = Union[
     HttpTransport,
     Callable[[], HttpTransport],
-    Literal['requests']
+    Literal['requests', 'httpx']
 ]
 
 
@@ -133,7 +137,8 @@ def _convert_to_str(value: Any, include_sensitive: bool = False) -> str:
 def _convert_sync_transport(value: TransportInputTypes) -> Optional[HttpTransport]:
     if isinstance(value, HttpTransport):
         return value
-    # TODO: support custom str like 'requests'?
+    if isinstance(value, str):
+        return build_transport(value)
     try:
         return value()
     except TypeError:
@@ -141,6 +146,33 @@ def _convert_sync_transport(value: TransportInputTypes) -> Optional[HttpTranspor
     raise ValueError(f"Unexpected transport type: '{value}'.")
 
 
+_ParameterPlan = Tuple[Tuple[Tuple[str, Any], ...], Tuple[Tuple[str, Any], ...]]
+
+
+def _build_parameter_plan(cls: Callable[..., Any]) -> _ParameterPlan:
+    spec = getfullargspec(cls)
+    args: Tuple[Tuple[str, Any], ...] = ()
+    if len(spec.args) > 1:
+        if spec.defaults:
+            args = tuple(reversed(list(zip(reversed(spec.args), reversed(spec.defaults), fillvalue=_unset))))
+        else:
+            args = tuple(zip(spec.args, [], fillvalue=_unset))
+    kwargs = tuple((a, (spec.kwonlydefaults or {}).get(a, _unset)) for a in spec.kwonlyargs)
+    return args, kwargs
+
+
+_cached_parameter_plan = functools.lru_cache(maxsize=64)(_build_parameter_plan)
+
+
+def _parameter_plan(cls: Callable[..., Any]) -> _ParameterPlan:
+    """The positional and keyword-only parameters of a client constructor, with their defaults."""
+    try:
+        return _cached_parameter_plan(cls)
+    except TypeError:
+        # Unhashable factories are inspected on every call.
+        return _build_parameter_plan(cls)
+
+
 def _build_envs(prefixes: List[str], suffixes: List[str], name: Optional[str] = None) -> List[str]:
     all_vars = product(prefixes, suffixes)
     if name:
@@ -150,6 +182,17 @@ def _build_envs(prefixes: List[str], suffixes: List[str], name: Optional[str] =
     return ["_".join(prefix + list(var)).upper() for var in all_vars]
 
 
+_unresolved = object()
+
+
+class _Unresolved:
+    """A setting that could not be resolved in the snapshotted generation."""
+    __slots__ = ('message',)
+
+    def __init__(self, message: str) -> None:
+        self.message = message
+
+
 class AutoUpdateValue(UserString):
     def __init__(self, value: PrioritizedSetting) -> None:
         self._setting = value
@@ -192,6 +235,7 @@ class _SDKSettings:
     ) -> None:
         self._prefixes = env_prefix
         self._groups: Dict[str, ClientSettings] = {}
+        self._frozen: Optional[Dict[str, Any]] = None
         self._global_settings = settings
         self.resource_name = resource
         self.setting_name = setting_name
@@ -289,12 +333,38 @@ class _SDKSettings:
             return value
         raise ValueError(f'Cannot convert {value} to resource ID.')
 
+    @property
+    def frozen(self) -> bool:
+        return self._frozen is not None
+
+    def freeze(self) -> None:
+        """Resolve every setting once, and serve all later reads by ``get`` from a plain dict.
+
+        Once frozen, settings can no longer be set or unset, and later changes to config
+        stores and environment variables are ignored. Settings grouped by name are frozen too.
+        """
+        frozen: Dict[str, Any] = {}
+        for name, setting in self._settings.items():
+            try:
+                frozen[name] = setting()
+            except RuntimeError:
+                frozen[name] = _unresolved
+        self._frozen = frozen
+        for group in self._groups.values():
+            group.freeze()
+
+    def _check_frozen(self) -> None:
+        if self._frozen is not None:
+            raise RuntimeError(f"Settings for '{self.resource_name}' are frozen.")
+
     def unset(self, name: str) -> None:
+        self._check_frozen()
         if name in self._settings:
             self._settings[name].unset_value()
             return
 
     def set(self, name: str, value: SettingsTypes) -> None:
+        self._check_frozen()
         if name in self._settings:
             self._settings[name].set_value(value)
             return
@@ -318,19 +388,31 @@ class _SDKSettings:
     def get(self, name: str, default: None = None) -> Optional[SettingsTypes]:
         ...
     def get(self, name: str, default: Optional[SettingT] = None) -> Optional[SettingT]:
-        try:
+        frozen = self._frozen
+        if frozen is not None:
             try:
-                return self._settings[name]()
+                value = frozen[name]
             except KeyError:
-                new_setting = StoredPrioritizedSetting(
-                    name,
-                    env_vars=_build_envs(self._prefixes, [name.upper()], self.setting_name),
-                )
-                self._settings[name] = new_setting
-                return new_setting()
+                try:
+                    value = frozen[name] = self._get(name)
+                except RuntimeError:
+                    value = frozen[name] = _unresolved
+            return default if value is _unresolved else value
+        try:
+            return self._get(name)
         except RuntimeError:
             return default
 
+    def _get(self, name: str) -> Any:
+        try:
+            setting = self._settings[name]
+        except KeyError:
+            setting = self._settings[name] = StoredPrioritizedSetting(
+                name,
+                env_vars=_build_envs(self._prefixes, [name.upper()], self.setting_name),
+            )
+        return setting()
+
     def to_config(self) -> Dict[str, Union[str, int, float, bool, None]]:
         output = {}
         for setting in self._settings.values():
@@ -350,11 +432,9 @@ class _SDKSettings:
         return output
 
     def add_config_store(self, config: Mapping[str, Any], position: Literal['first', 'last'] = 'first') -> None:
+        self._check_frozen()
         for setting in self._settings.values():
-            if position == 'first':
-                setting.config_stores.insert(0, config)
-            else:
-                setting.config_stores.append(config)
+            setting.add_config_store(config, position)
 
 
 class ClientSettings(_SDKSettings, Generic[ClientType]):
@@ -406,6 +486,7 @@ class ClientSettings(_SDKSettings, Generic[ClientType]):
         )
         if cls:
             self.cls.set_value(cls)
+        self._resolved: Optional[Tuple[Tuple[int, int], Dict[str, Any]]] = None
         self.credential = StoredPrioritizedSetting(
             name='credential',
             default='default',
@@ -414,6 +495,31 @@ class ClientSettings(_SDKSettings, Generic[ClientType]):
             to_str=_convert_to_str
         )
 
+    def _resolved_settings(self) -> Dict[str, Any]:
+        # Versions only grow, so their sum changes whenever one of these settings is set,
+        # unset or given a config store, without settings elsewhere invalidating the snapshot.
+        version = (
+            settings_generation(),
+            sum(setting.version for setting in self._settings.values())
+            + self.transport.version + self.cls.version + self.credential.version
+        )
+        if self._resolved is None or self._resolved[0] != version:
+            self._resolved = (version, {})
+        return self._resolved[1]
+
+    def _snapshot(self, resolved: Dict[str, Any], key: str, resolve: Callable[[], Any]) -> Any:
+        try:
+            value = resolved[key]
+        except KeyError:
+            try:
+                value = resolve()
+            except RuntimeError as e:
+                value = _Unresolved(str(e))
+            resolved[key] = value
+        if isinstance(value, _Unresolved):
+            raise RuntimeError(value.message)
+        return value
+
     def by_name(self, name: str) -> ClientSettings[ClientType]:
         if not name.isalpha():
             raise ValueError("Grouping name must only contain alphabetic characters.")
@@ -431,6 +537,8 @@ class ClientSettings(_SDKSettings, Generic[ClientType]):
                 client_options=self.client_options(),
                 extra_settings=self._settings
             )
+            if self._frozen is not None:
+                new_resource.freeze()
             self._groups[name] = new_resource
             return new_resource
 
@@ -438,8 +546,7 @@ class ClientSettings(_SDKSettings, Generic[ClientType]):
         try:
             value = value.lower()
             if value == 'default':
-                from azure.identity import DefaultAzureCredential
-                return DefaultAzureCredential()
+                return default_credential()
             if value == 'azurekeycredential':
                 return AzureKeyCredential(self.key())
             if value == 'azuresascredential':
@@ -448,7 +555,7 @@ class ClientSettings(_SDKSettings, Generic[ClientType]):
                 return AzureNamedKeyCredential(self.name(), self.key())
         except AttributeError:
             if isinstance(value, (SupportsTokenInfo, AzureKeyCredential, AzureNamedKeyCredential, AzureSasCredential)):
-                return value
+                return shared_token_credential(value)
             if value is AzureKeyCredential:
                 return AzureKeyCredential(self.key())
             if value is AzureSasCredential:
@@ -456,7 +563,7 @@ class ClientSettings(_SDKSettings, Generic[ClientType]):
             if value is AzureNamedKeyCredential:
                 return AzureNamedKeyCredential(self.name(), self.key())
         try:
-            return value()
+            return shared_token_credential(value())
         except TypeError:
             pass
         raise ValueError(f'Cannot convert {value} to credential type.')
@@ -516,71 +623,72 @@ class ClientSettings(_SDKSettings, Generic[ClientType]):
            settings.config(log_level=logging.DEBUG)
 
         """
+        resolved = self._resolved_settings()
         new_client_options = self.client_options()
         new_client_options.update(client_options or {})
         kwargs = {}
         try:
-            endpoint = self.endpoint()
-            credential = self.credential(credential)
-            cls = self.cls(cls)
+            endpoint = self.endpoint(endpoint) if endpoint else self._snapshot(resolved, 'endpoint', self.endpoint)
+            credential = self.credential(credential) if credential else self._snapshot(resolved, 'credential', self.credential)
+            cls = self.cls(cls) if cls else self._snapshot(resolved, 'cls', self.cls)
         except RuntimeError as e:
             raise RuntimeError(f"Unable to build client for {self.resource_name}: {e}.") from e
         try:
+            # Transports are not snapshotted, as a transport built from a name is owned by its client.
             kwargs['transport'] = self.transport(transport)
         except RuntimeError:
             pass
         try:
-            kwargs['api_version'] = self.api_version(api_version)
+            kwargs['api_version'] = api_version or self._snapshot(resolved, 'api_version', self.api_version)
         except RuntimeError:
             pass
         try:
-            kwargs['audience'] = self.audience(audience)
+            kwargs['audience'] = audience or self._snapshot(resolved, 'audience', self.audience)
         except RuntimeError:
             pass
 
         try:
-            token_scope = AUDIENCES[self.resource_name][self._global_settings.azure_cloud()]
+            token_scope = self._snapshot(
+                resolved,
+                'token_scope',
+                lambda: AUDIENCES[self.resource_name][self._global_settings.azure_cloud()]
+            )
         except (KeyError, RuntimeError):
             raise ValueError(
                 f"Cannot find auth scope for {self.resource_name} with {self._global_settings.azure_cloud().value}."
             )
 
-        spec = getfullargspec(cls)
-        if len(spec.args) > 1:
-            if spec.defaults:
-                cls_args = reversed(list(zip(reversed(spec.args), reversed(spec.defaults), fillvalue=_unset)))
-            else:
-                cls_args = zip(spec.args, [], fillvalue=_unset)
-            for name, default in cls_args:
-                if name == 'endpoint' or name.endswith('_endpoint') or name.endswith('_url'):
-                    kwargs[name] = endpoint
-                elif name == 'credential':
-                    kwargs[name] = credential
-                elif name != 'self':
-                    try:
-                        kwargs[name] = new_client_options.get(name) or self.get(name)
-                    except RuntimeError as e:
-                        if default is _unset:
-                            raise ValueError(f"Missing required positional parameter: '{name}'.") from e
-
-        cls_kwargs = {a: spec.kwonlydefaults.get(a, _unset) for a in spec.kwonlyargs}
-        for name, default in cls_kwargs.items():
+        cls_args, cls_kwargs = _parameter_plan(cls)
+        for name, default in cls_args:
+            if name == 'endpoint' or name.endswith('_endpoint') or name.endswith('_url'):
+                kwargs[name] = endpoint
+            elif name == 'credential':
+                kwargs[name] = credential
+            elif name != 'self' and name not in kwargs:
+                try:
+                    kwargs[name] = new_client_options.get(name) or self._snapshot(resolved, f'param:{name}', functools.partial(self.get, name))
+                except RuntimeError as e:
+                    if default is _unset:
+                        raise ValueError(f"Missing required positional parameter: '{name}'.") from e
+
+        cls_kwarg_names = {name for name, _ in cls_kwargs}
+        for name, default in cls_kwargs:
             if name == 'endpoint' or name.endswith('_endpoint') or name.endswith('_url') and not kwargs:
                 kwargs[name] = endpoint
             elif name == 'credential':
                 kwargs[name] = credential
-            elif name.endswith('api_key') and hasattr(credential, 'key') and 'credential' not in cls_kwargs and 'credential' not in kwargs:
+            elif name.endswith('api_key') and hasattr(credential, 'key') and 'credential' not in cls_kwarg_names and 'credential' not in kwargs:
                 kwargs[name] = credential.key
-            elif name.endswith('token_provider') and hasattr(credential, 'get_token') and 'credential' not in cls_kwargs and 'credential' not in kwargs:
+            elif name.endswith('token_provider') and hasattr(credential, 'get_token') and 'credential' not in cls_kwarg_names and 'credential' not in kwargs:
                 from azure.identity import get_bearer_token_provider    
                 kwargs[name] = get_bearer_token_provider(credential, token_scope)
             #elif name == 'audience':
             #    kwargs[name] = token_scope.rstrip('/.default')
             elif name == 'scope':
                 kwargs[name] = token_scope
-            elif name not in new_client_options:
+            elif name not in new_client_options and name not in kwargs:
                 try:
-                    kwargs[name] = self.get(name)
+                    kwargs[name] = self._snapshot(resolved, f'param:{name}', functools.partial(self.get, name))
                 except RuntimeError:
                     if default is _unset:
                         raise ValueError(f"Missing required keyword parameter: '{name}'.")
@@ -0,0 +1,221 @@
+# -------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for
+# license information.
+# --------------------------------------------------------------------------
+"""A process-wide token cache, shared by every client built from the same credential.
+"""
+import inspect
+import logging
+import time
+from threading import Lock, Timer
+from typing import Any, Dict, Optional, Tuple, TypeVar
+from weakref import WeakValueDictionary
+
+from azure.core.credentials import AccessToken, AccessTokenInfo, TokenRequestOptions
+
+_LOGGER = logging.getLogger(__name__)
+
+# Matches the refresh window of azure-core's BearerTokenCredentialPolicy.
+DEFAULT_REFRESH_MARGIN = 300
+# How long before the refresh window a used token is refreshed in the background.
+DEFAULT_REFRESH_LEAD = 60
+
+CredentialType = TypeVar('CredentialType')
+_TokenKey = Tuple[Tuple[str, ...], Optional[str], bool]
+
+
+class _CachedToken:
+    __slots__ = ('info', 'lock', 'timer', 'used')
+
+    def __init__(self) -> None:
+        self.info: Optional[AccessTokenInfo] = None
+        self.lock = Lock()
+        self.timer: Optional[Timer] = None
+        self.used = False
+
+
+class SharedTokenCredential:
+    """Caches the tokens of a credential by scope, tenant and CAE, for all the clients that share it.
+
+    A token that has been used since it was acquired is refreshed in a background thread shortly
+    before it is due, so that requests rarely wait on the credential. Requests with claims are
+    passed through to the credential.
+
+    :param credential: A credential supporting ``get_token`` or ``get_token_info``.
+    :keyword int refresh_margin: Seconds before expiry a token is considered due for refresh,
+     unless the token sets its own ``refresh_on``. Defaults to 300.
+    :keyword int refresh_lead: Seconds before a token is due that it is refreshed in the
+     background. Defaults to 60.
+    :keyword bool background_refresh: Whether to refresh tokens in the background. Defaults to True.
+    """
+
+    def __init__(
+            self,
+            credential: Any,
+            *,
+            refresh_margin: int = DEFAULT_REFRESH_MARGIN,
+            refresh_lead: int = DEFAULT_REFRESH_LEAD,
+            background_refresh: bool = True
+    ) -> None:
+        self._credential = credential
+        self._refresh_margin = refresh_margin
+        self._refresh_lead = refresh_lead
+        self._background_refresh = background_refresh
+        self._tokens: Dict[_TokenKey, _CachedToken] = {}
+        self._lock = Lock()
+
+    @property
+    def credential(self) -> Any:
+        return self._credential
+
+    def __enter__(self) -> 'SharedTokenCredential':
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Stop refreshing tokens in the background. The cached tokens remain valid."""
+        with self._lock:
+            for entry in self._tokens.values():
+                if entry.timer:
+                    entry.timer.cancel()
+                    entry.timer = None
+
+    def get_token(
+            self,
+            *scopes: str,
+            claims: Optional[str] = None,
+            tenant_id: Optional[str] = None,
+            enable_cae: bool = False,
+            **kwargs: Any
+    ) -> AccessToken:
+        info = self._get(scopes, claims=claims, tenant_id=tenant_id, enable_cae=enable_cae)
+        return AccessToken(info.token, info.expires_on)
+
+    def get_token_info(self, *scopes: str, options: Optional[TokenRequestOptions] = None) -> AccessTokenInfo:
+        options = options or {}
+        return self._get(
+            scopes,
+            claims=options.get('claims'),
+            tenant_id=options.get('tenant_id'),
+            enable_cae=options.get('enable_cae', False)
+        )
+
+    def _acquire(
+            self,
+            scopes: Tuple[str, ...],
+            *,
+            claims: Optional[str],
+            tenant_id: Optional[str],
+            enable_cae: bool
+    ) -> AccessTokenInfo:
+        options: Dict[str, Any] = {}
+        if claims:
+            options['claims'] = claims
+        if tenant_id:
+            options['tenant_id'] = tenant_id
+        if enable_cae:
+            options['enable_cae'] = enable_cae
+        if hasattr(self._credential, 'get_token_info'):
+            return self._credential.get_token_info(*scopes, options=options or None)
+        token = self._credential.get_token(*scopes, **options)
+        return AccessTokenInfo(token.token, token.expires_on)
+
+    def _is_due(self, info: AccessTokenInfo, now: float) -> bool:
+        if info.refresh_on:
+            return now >= info.refresh_on
+        return now >= info.expires_on - self._refresh_margin
+
+    def _get(
+            self,
+            scopes: Tuple[str, ...],
+            *,
+            claims: Optional[str],
+            tenant_id: Optional[str],
+            enable_cae: bool
+    ) -> AccessTokenInfo:
+        if claims:
+            return self._acquire(scopes, claims=claims, tenant_id=tenant_id, enable_cae=enable_cae)
+        key = (tuple(sorted(scopes)), tenant_id, bool(enable_cae))
+        with self._lock:
+            try:
+                entry = self._tokens[key]
+            except KeyError:
+                entry = self._tokens[key] = _CachedToken()
+        entry.used = True
+        info = entry.info
+        if info is not None and not self._is_due(info, time.time()):
+            return info
+        with entry.lock:
+            # Another thread may have refreshed the token while this one waited.
+            info = entry.info
+            if info is None or self._is_due(info, time.time()):
+                info = self._acquire(scopes, claims=None, tenant_id=tenant_id, enable_cae=enable_cae)
+                entry.info = info
+                self._schedule(key, entry)
+        return info
+
+    def _schedule(self, key: _TokenKey, entry: _CachedToken) -> None:
+        if not self._background_refresh or entry.info is None:
+            return
+        due = entry.info.refresh_on or entry.info.expires_on - self._refresh_margin
+        delay = due - self._refresh_lead - time.time()
+        if entry.timer:
+            entry.timer.cancel()
+            entry.timer = None
+        if delay <= 0:
+            return
+        entry.timer = Timer(delay, self._refresh, args=(key, entry))
+        entry.timer.daemon = True
+        entry.timer.start()
+
+    def _refresh(self, key: _TokenKey, entry: _CachedToken) -> None:
+        entry.timer = None
+        if not entry.used:
+            # Tokens that nobody asked for since the last refresh are acquired on demand.
+            return
+        entry.used = False
+        scopes, tenant_id, enable_cae = key
+        with entry.lock:
+            try:
+                entry.info = self._acquire(scopes, claims=None, tenant_id=tenant_id, enable_cae=enable_cae)
+            except Exception as e:  # pylint: disable=broad-except
+                _LOGGER.warning("Background token refresh for %s failed: %s", scopes, e)
+                return
+            self._schedule(key, entry)
+
+
+_shared: 'WeakValueDictionary[int, SharedTokenCredential]' = WeakValueDictionary()
+_shared_lock = Lock()
+_default_credential: Optional[SharedTokenCredential] = None
+
+
+def shared_token_credential(credential: CredentialType) -> CredentialType:
+    """Return the shared token cache for a credential.
+
+    Every call with the same credential instance returns the same cache, for as long as
+    a client holds on to it. Key, SAS and async credentials are returned unchanged.
+    """
+    if isinstance(credential, SharedTokenCredential):
+        return credential
+    get_token = getattr(credential, 'get_token_info', None) or getattr(credential, 'get_token', None)
+    if get_token is None or inspect.iscoroutinefunction(get_token):
+        return credential
+    with _shared_lock:
+        try:
+            return _shared[id(credential)]
+        except KeyError:
+            shared = _shared[id(credential)] = SharedTokenCredential(credential)
+            return shared
+
+
+def default_credential() -> SharedTokenCredential:
+    """Return the process-wide ``DefaultAzureCredential``, so that the credential chain is only probed once."""
+    global _default_credential  # pylint: disable=global-statement
+    with _shared_lock:
+        if _default_credential is None:
+            from azure.identity import DefaultAzureCredential
+            _default_credential = SharedTokenCredential(DefaultAzureCredential())
+        return _default_credential
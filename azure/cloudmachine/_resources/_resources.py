@@ -25,11 +25,14 @@
 # --------------------------------------------------------------------------
 """Provide access to settings for globally used Azure configuration values.
 """
+import json
 from typing import (
     Any,
     Dict,
     Literal,
+    Mapping,
     Optional,
+    Union,
     Type,
     TypeVar,
     Callable,
@@ -37,7 +40,7 @@ from typing import (
     TYPE_CHECKING
 )
 
-from azure.core.settings import settings as global_settings
+from azure.core.settings import settings as global_settings, convert_bool
 
 from ._client_settings import (
     ClientSettings,
@@ -48,13 +51,80 @@ from ._client_settings import (
 )
 from ._client_types import *
 from ._resource_map import RESOURCE_SDK_MAP
+from ._setting import StoredPrioritizedSetting, invalidate_settings
 
 ClientType = TypeVar('ClientType')
 
 
+def _convert_options(value: Union[str, Mapping[str, Any]]) -> Dict[str, Any]:
+    if isinstance(value, str):
+        return json.loads(value)
+    return dict(value)
+
+
+def _convert_threshold(value: Optional[Any]) -> Optional[float]:
+    if value is None or value == "":
+        return None
+    return float(value)
+
+
 class Resources:
     def __init__(self) -> None:
         self._resource_settings: Dict[str, ClientSettings] = {}
+        self._frozen = False
+        self.metrics: StoredPrioritizedSetting = StoredPrioritizedSetting(
+            name="metrics",
+            env_var="AZURE_CLOUDMACHINE_METRICS",
+            default=True,
+            convert=convert_bool,
+        )
+        """Whether clientlet pipelines record request metrics into the metrics registry."""
+        self.profiling: StoredPrioritizedSetting = StoredPrioritizedSetting(
+            name="profiling",
+            env_var="AZURE_CLOUDMACHINE_PROFILING",
+            default=False,
+            convert=convert_bool,
+        )
+        """Whether clientlet operations record their per-phase wall time into the metrics registry."""
+        self.slow_operation_threshold: StoredPrioritizedSetting = StoredPrioritizedSetting(
+            name="slow_operation_threshold",
+            env_var="AZURE_CLOUDMACHINE_SLOW_OPERATION_THRESHOLD",
+            default=None,
+            convert=_convert_threshold,
+        )
+        """Operations taking longer than this many seconds are logged with their request details."""
+        self.transport: StoredPrioritizedSetting = StoredPrioritizedSetting(
+            name="transport",
+            env_var="AZURE_SDK_TRANSPORT",
+            default="requests",
+        )
+        """The transport shared by the CloudMachineClient clientlets, either 'requests' or 'httpx'."""
+        self.transport_options: StoredPrioritizedSetting = StoredPrioritizedSetting(
+            name="transport_options",
+            env_var="AZURE_CLOUDMACHINE_TRANSPORT_OPTIONS",
+            default={},
+            convert=_convert_options,
+            to_str=json.dumps,
+        )
+        """Connection pool options for the shared transport, such as 'per_host_concurrency' and 'keep_alive'."""
+
+    def invalidate(self) -> None:
+        """Resolve the settings used to build clients again, for example after changing environment variables.
+
+        Settings are read live, but ``ClientSettings.client()`` reuses the values it resolved until
+        one of its settings is set or unset, or a config store is added.
+        """
+        invalidate_settings()
+
+    def freeze(self) -> None:
+        """Freeze the settings of every resource, so that reading a setting is a dict lookup.
+
+        Intended for production, once configuration is complete. Settings of resources that
+        are first used after this call are frozen as they are created.
+        """
+        self._frozen = True
+        for resource_settings in self._resource_settings.values():
+            resource_settings.freeze()
 
     @overload
     def get(self, resource: Literal['storage:blob']) -> StorageClientSettings['BlobServiceClient']:
@@ -108,6 +178,8 @@ class Resources:
             resource=resource,
             settings=global_settings,
         )
+        if self._frozen:
+            new_resource.freeze()
         self._resource_settings[resource] = new_resource
         return new_resource
 
@@ -25,12 +25,26 @@
 # --------------------------------------------------------------------------
 """Provide access to settings for globally used Azure configuration values.
 """
-from typing import Any, Callable, Mapping, Optional, Dict, Tuple, Union, List, TypeVar
+from typing import Any, Callable, Mapping, Optional, Dict, Tuple, Union, List, TypeVar, Literal
 import os
 
 from azure.core.settings import _unset, _Unset, PrioritizedSetting, ValidInputType, ValueType
 
 FallbackType = TypeVar('FallbackType')
+_unresolved = object()
+
+_generation: int = 0
+
+
+def settings_generation() -> int:
+    """The current settings generation. Values snapshotted within a generation may be reused."""
+    return _generation
+
+
+def invalidate_settings() -> None:
+    """Start a new settings generation, so that snapshotted values are resolved again."""
+    global _generation  # pylint: disable=global-statement
+    _generation += 1
 
 
 class StoredPrioritizedSetting(PrioritizedSetting):
@@ -57,6 +71,14 @@ class StoredPrioritizedSetting(PrioritizedSetting):
         self._tostr = to_str or str
         self._env_vars = env_vars or []
         self.config_stores = []
+        # The keys looked up in config stores and the environment, in order of precedence.
+        self._candidates: Tuple[str, ...] = tuple(self._env_vars) + ((env_var,) if env_var else ())
+        self._version = 0
+
+    @property
+    def version(self) -> int:
+        """Incremented whenever the setting is set or unset, or a config store is added to it."""
+        return self._version
 
     def __call__(self, value: Optional[ValidInputType] = None) -> ValueType:
         """Return the setting value according to the standard precedence.
@@ -70,29 +92,35 @@ class StoredPrioritizedSetting(PrioritizedSetting):
         return self._convert(self._raw_value(value))
 
     def _raw_value(self, value: Optional[ValidInputType] = None) -> ValidInputType:
-                # 5. immediate values
+        # 5. immediate values
         if value is not None:
             return value
 
+        resolved = self._resolve()
+        if resolved is _unresolved:
+            raise RuntimeError(
+                "No configured value found for setting %r.\nChecked the following settings:\n%s" % (
+                    self._name, "\n".join(self._candidates)
+                )
+            )
+        return resolved
+
+    def _resolve(self) -> Any:
         # 4. previously user-set value
         if not isinstance(self._user_value, _Unset):
             return self._user_value
 
         # 3. check a config store
-        if self.config_stores:
-            for store in self.config_stores:
-                for env_var in self._env_vars:
-                    if env_var in store:
-                        return store[env_var]
-                if self._env_var and self._env_var in store:
-                    return store[self._env_var]
+        for store in self.config_stores:
+            for key in self._candidates:
+                if key in store:
+                    return store[key]
 
         # 2. environment variable
-        for env_var in self._env_vars:
-            if env_var in os.environ:
-                return os.environ[env_var]
-        if self._env_var and self._env_var in os.environ:
-            return os.environ[self._env_var]
+        environ = os.environ
+        for key in self._candidates:
+            if key in environ:
+                return environ[key]
 
         # 1. system setting
         if self._system_hook:
@@ -101,11 +129,7 @@ class StoredPrioritizedSetting(PrioritizedSetting):
         # 0. implicit default
         if not isinstance(self._default, _Unset):
             return self._default
-
-        all_vars = "\n".join(self._env_vars)
-        if self._env_var:
-            all_vars + f"\n{self._env_var}"
-        raise RuntimeError("No configured value found for setting %r.\nChecked the following settings:\n%s" % (self._name, all_vars))
+        return _unresolved
 
     def set_value(self, value: Union[PrioritizedSetting[ValidInputType, ValueType], ValidInputType]) -> None:
         """Specify a value for this setting programmatically.
@@ -123,6 +147,20 @@ class StoredPrioritizedSetting(PrioritizedSetting):
                 self._user_value = _unset
         else:
             self._user_value = value
+        self._version += 1
+
+    def unset_value(self) -> None:
+        """Unset the previous user value such that the priority is reset."""
+        super().unset_value()
+        self._version += 1
+
+    def add_config_store(self, config: Mapping[str, Any], position: Literal['first', 'last'] = 'first') -> None:
+        """Look up the setting in a config store, before or after the existing ones."""
+        if position == 'first':
+            self.config_stores.insert(0, config)
+        else:
+            self.config_stores.append(config)
+        self._version += 1
 
     def to_dict(self) -> Dict[str, Union[str, float, int, bool, None]]:
         value = self._raw_value()
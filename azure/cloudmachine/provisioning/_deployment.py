@@ -87,6 +87,7 @@ def load_dev_environment(deployment: 'CloudMachineDeployment', label: Optional[s
     )
     values = dotenv_values(os.path.join(azd_dir, env_name, ".env"))
     os.environ.update(values)
+    resources.invalidate()
     print("Loaded env")
     print(values)
     return values
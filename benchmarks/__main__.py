@@ -0,0 +1,64 @@
+# -------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for
+# license information.
+# --------------------------------------------------------------------------
+
+import argparse
+import json
+import sys
+
+from . import bench_import, bench_messaging, bench_storage, bench_tables, bench_text  # pylint: disable=unused-import
+from ._environment import Environment
+from ._harness import REGISTRY, compare, run
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="CloudMachine data plane benchmarks.")
+    parser.add_argument("-k", "--filter", action="append", help="Only run benchmarks matching this glob, e.g. 'storage.*'.")
+    parser.add_argument("--repeat", type=int, default=10, help="Timed runs per case.")
+    parser.add_argument("--warmup", type=int, default=2, help="Untimed runs per case.")
+    parser.add_argument("--min-time", type=float, default=0.0, help="Keep running each case until this many seconds are timed.")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for the generated data.")
+    parser.add_argument("-o", "--output", help="Write the JSON results to this file instead of stdout.")
+    parser.add_argument("--compare", help="Baseline JSON results to compare against.")
+    parser.add_argument("--threshold", type=float, default=0.1, help="Allowed relative slowdown of the median before failing.")
+    parser.add_argument("--list", action="store_true", help="List the available benchmarks and exit.")
+    args = parser.parse_args()
+
+    if args.list:
+        for bench in REGISTRY:
+            print(bench.name, json.dumps(bench.params))
+        return 0
+
+    environment = Environment(seed=args.seed)
+    try:
+        results = run(
+            environment,
+            patterns=args.filter,
+            repeat=args.repeat,
+            warmup=args.warmup,
+            min_time=args.min_time,
+            log=lambda line: print(line, file=sys.stderr),
+        )
+    finally:
+        environment.close()
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as output:
+            json.dump(results, output, indent=2)
+    else:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as baseline:
+            regressions = compare(results, json.load(baseline), args.threshold)
+        for regression in regressions:
+            print(f"Regression: {regression}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,161 @@
+# -------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for
+# license information.
+# --------------------------------------------------------------------------
+
+import functools
+import random
+import re
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler
+
+from azure.core.pipeline.policies import SansIOHTTPPolicy
+
+from azure.cloudmachine._client import CloudMachineTableData, LocalTableData
+from azure.cloudmachine._httpclient._config import CloudMachinePipelineConfig
+from azure.cloudmachine._httpclient._servicebus import CloudMachineServiceBus
+from azure.cloudmachine._httpclient._storage import CloudMachineStorage, StorageHeadersPolicy
+from azure.cloudmachine._local import LocalBlobStorage, LocalServiceBus, build_local_transport
+from azure.cloudmachine._resources._resource_map import DEFAULT_API_VERSIONS
+
+STORAGE_HOST = 'storage.local'
+SERVICEBUS_HOST = 'servicebus.local'
+TABLES_HOST = 'tables.local'
+
+_WORDS = (
+    "the of and to in is was for on that with as by at from it an be this are which or has had have "
+    "cloud machine storage table queue message request response service client data index batch "
+    "stream throughput latency partition sentence token section document parser benchmark"
+).split()
+_CHANGESET = re.compile(rb'boundary=(changeset_[\w-]+)')
+
+
+class _TableBatchHandler(BaseHTTPRequestHandler):
+    """Acknowledges every Table transaction, so that batch writes measure only the client."""
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format: str, *args) -> None:
+        pass
+
+    def do_POST(self) -> None:
+        body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        match = _CHANGESET.search(body)
+        if not match:
+            self.send_response(201)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        changeset = match.group(1)
+        operations = body.count(b'--' + changeset) - 1
+        batch_boundary = f"batchresponse_{uuid.uuid4()}"
+        changeset_boundary = f"changesetresponse_{uuid.uuid4()}"
+        part = (
+            f"--{changeset_boundary}\r\n"
+            "Content-Type: application/http\r\n"
+            "Content-Transfer-Encoding: binary\r\n\r\n"
+            "HTTP/1.1 204 No Content\r\n"
+            "DataServiceVersion: 3.0;\r\n\r\n"
+        )
+        response = (
+            f"--{batch_boundary}\r\n"
+            f"Content-Type: multipart/mixed; boundary={changeset_boundary}\r\n\r\n"
+            + part * operations
+            + f"--{changeset_boundary}--\r\n"
+            f"--{batch_boundary}--\r\n"
+        ).encode()
+        self.send_response(202)
+        self.send_header('Content-Type', f"multipart/mixed; boundary={batch_boundary}")
+        self.send_header('Content-Length', str(len(response)))
+        self.end_headers()
+        self.wfile.write(response)
+
+
+class Environment:
+    """The local stand-ins and clients shared by all benchmarks.
+
+    All traffic is served in-process through the local transport, and all generated
+    data is derived from ``seed``, so that runs are comparable between machines.
+    """
+
+    def __init__(self, seed: int = 0) -> None:
+        self.seed = seed
+        self.blob_server = LocalBlobStorage(containers=['default'])
+        self.servicebus_server = LocalServiceBus(lock_duration=300)
+        self.transport = build_local_transport({
+            STORAGE_HOST: self.blob_server.handler,
+            SERVICEBUS_HOST: self.servicebus_server.handler,
+            TABLES_HOST: _TableBatchHandler,
+        })
+        self.executor = ThreadPoolExecutor(max_workers=8)
+
+    def _config(self, service: str, **kwargs) -> CloudMachinePipelineConfig:
+        return CloudMachinePipelineConfig(
+            authentication_policy=SansIOHTTPPolicy(),
+            transport=self.transport,
+            api_version=DEFAULT_API_VERSIONS[service],
+            metrics_service=service,
+            **kwargs
+        )
+
+    @functools.cached_property
+    def storage(self) -> CloudMachineStorage:
+        return CloudMachineStorage(
+            endpoint=f"http://{STORAGE_HOST}/",
+            account_name='local',
+            credential=None,
+            container_name='default',
+            scope='',
+            executor=self.executor,
+            config=self._config('storage:blob', headers_policy=StorageHeadersPolicy()),
+        )
+
+    @functools.cached_property
+    def messaging(self) -> CloudMachineServiceBus:
+        return CloudMachineServiceBus(
+            endpoint=f"http://{SERVICEBUS_HOST}/",
+            credential=None,
+            scope='',
+            executor=self.executor,
+            config=self._config('servicebus'),
+        )
+
+    @functools.cached_property
+    def table_data(self) -> CloudMachineTableData:
+        return CloudMachineTableData(
+            endpoint=f"http://{TABLES_HOST}",
+            credential=None,
+            scope='',
+            executor=self.executor,
+            config=self._config('storage:table'),
+        )
+
+    @functools.cached_property
+    def local_table_data(self) -> LocalTableData:
+        return LocalTableData(executor=self.executor)
+
+    @functools.lru_cache(maxsize=None)
+    def payload(self, size: int) -> bytes:
+        return random.Random(f"{self.seed}:{size}").getrandbits(size * 8).to_bytes(size, 'little')
+
+    @functools.lru_cache(maxsize=None)
+    def text(self, length: int) -> str:
+        rng = random.Random(f"{self.seed}:text:{length}")
+        sentences = []
+        total = 0
+        while total < length:
+            words = rng.choices(_WORDS, k=rng.randint(6, 24))
+            sentence = " ".join(words).capitalize() + rng.choice(".!?")
+            if rng.random() < 0.1:
+                sentence += "\n\n"
+            sentences.append(sentence)
+            total += len(sentence) + 1
+        return " ".join(sentences)[:length]
+
+    def close(self) -> None:
+        self.blob_server.stop()
+        self.servicebus_server.stop()
+        if 'local_table_data' in self.__dict__:
+            self.local_table_data.close()
+        self.executor.shutdown(wait=False)
@@ -0,0 +1,166 @@
+# -------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for
+# license information.
+# --------------------------------------------------------------------------
+
+import fnmatch
+import itertools
+import json
+import platform
+import statistics
+import sys
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from azure.cloudmachine._version import VERSION
+
+
+@dataclass
+class Case:
+    """A single parameterized benchmark, as returned by a benchmark setup function.
+
+    :param run: The operation to time.
+    :param bytes: The number of bytes moved by each run, to report throughput.
+    :param items: The number of items processed by each run, to report item rate.
+    :param prepare: Untimed work to do before each run, for example recreating deleted data.
+    :param cleanup: Untimed work to do once all runs have finished.
+    """
+    run: Callable[[], Any]
+    bytes: Optional[int] = None
+    items: Optional[int] = None
+    prepare: Optional[Callable[[], Any]] = None
+    cleanup: Optional[Callable[[], Any]] = None
+
+
+@dataclass
+class Benchmark:
+    name: str
+    setup: Callable[..., Case]
+    params: Dict[str, List[Any]] = field(default_factory=dict)
+    group: str = ''
+
+    def cases(self) -> Iterable[Dict[str, Any]]:
+        keys = list(self.params)
+        for values in itertools.product(*(self.params[k] for k in keys)):
+            yield dict(zip(keys, values))
+
+
+REGISTRY: List[Benchmark] = []
+
+
+class Skip(Exception):
+    """Raised by a benchmark setup function when the case can't run in this environment."""
+
+
+def benchmark(name: str, **params: List[Any]) -> Callable[[Callable[..., Case]], Callable[..., Case]]:
+    """Register a benchmark setup function, run once for every combination of ``params``.
+
+    The setup function is called with the shared environment and one value for each
+    parameter, and returns the Case to time.
+    """
+    def decorator(setup: Callable[..., Case]) -> Callable[..., Case]:
+        REGISTRY.append(Benchmark(name=name, setup=setup, params=params, group=name.split('.')[0]))
+        return setup
+    return decorator
+
+
+def _summarize(timings: List[float], case: Case) -> Dict[str, Any]:
+    ordered = sorted(timings)
+    median = statistics.median(ordered)
+    summary = {
+        'runs': len(ordered),
+        'seconds': {
+            'min': ordered[0],
+            'max': ordered[-1],
+            'mean': statistics.fmean(ordered),
+            'median': median,
+            'p95': ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+            'stdev': statistics.stdev(ordered) if len(ordered) > 1 else 0.0,
+        },
+        'ops_per_second': 1 / median if median else None,
+    }
+    if case.bytes is not None:
+        summary['mb_per_second'] = case.bytes / median / (1024 * 1024) if median else None
+    if case.items is not None:
+        summary['items_per_second'] = case.items / median if median else None
+    return summary
+
+
+def run_case(case: Case, *, repeat: int, warmup: int, min_time: float) -> Dict[str, Any]:
+    timings = []
+    try:
+        for index in itertools.count():
+            if case.prepare:
+                case.prepare()
+            start = time.perf_counter()
+            case.run()
+            elapsed = time.perf_counter() - start
+            if index >= warmup:
+                timings.append(elapsed)
+            if len(timings) >= repeat and sum(timings) >= min_time:
+                break
+    finally:
+        if case.cleanup:
+            case.cleanup()
+    return _summarize(timings, case)
+
+
+def run(
+        environment: Any,
+        *,
+        patterns: Optional[List[str]] = None,
+        repeat: int = 10,
+        warmup: int = 2,
+        min_time: float = 0.0,
+        log: Callable[[str], None] = print,
+) -> Dict[str, Any]:
+    results = []
+    for bench in REGISTRY:
+        if patterns and not any(fnmatch.fnmatch(bench.name, p) for p in patterns):
+            continue
+        for params in bench.cases():
+            label = ", ".join(f"{k}={v}" for k, v in params.items())
+            try:
+                case = bench.setup(environment, **params)
+            except Skip as e:
+                log(f"{bench.name}[{label}]: skipped, {e}")
+                continue
+            summary = run_case(case, repeat=repeat, warmup=warmup, min_time=min_time)
+            log(f"{bench.name}[{label}]: median {summary['seconds']['median'] * 1000:.3f}ms")
+            results.append({'name': bench.name, 'params': params, **summary})
+    return {
+        'metadata': {
+            'package_version': VERSION,
+            'python': sys.version.split()[0],
+            'implementation': platform.python_implementation(),
+            'platform': platform.platform(),
+            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'repeat': repeat,
+            'warmup': warmup,
+        },
+        'results': results,
+    }
+
+
+def _key(result: Dict[str, Any]) -> str:
+    return json.dumps([result['name'], result['params']], sort_keys=True)
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> List[str]:
+    """Return a description of every result whose median is slower than the baseline by more than ``threshold``."""
+    previous = {_key(r): r for r in baseline['results']}
+    regressions = []
+    for result in current['results']:
+        try:
+            before = previous[_key(result)]['seconds']['median']
+        except KeyError:
+            continue
+        after = result['seconds']['median']
+        if before and (after - before) / before > threshold:
+            regressions.append(
+                f"{result['name']} {result['params']}: {before * 1000:.3f}ms -> {after * 1000:.3f}ms"
+            )
+    return regressions
@@ -0,0 +1,40 @@
+# -------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for
+# license information.
+# --------------------------------------------------------------------------
+
+import subprocess
+import sys
+
+from ._environment import Environment
+from ._harness import Case, benchmark
+
+# Optional dependencies and features that must not be loaded by importing the package.
+LAZY_MODULES = (
+    'tiktoken',
+    'pypdf',
+    'azure.search.documents',
+    'azure.data.tables',
+    'azure.identity',
+    'azure.cloudmachine.provisioning',
+    'azure.cloudmachine._local',
+)
+
+_CHECK_LAZY = (
+    "import sys, {module}\n"
+    "loaded = [m for m in {lazy!r} if m in sys.modules]\n"
+    "sys.exit('Imported eagerly: ' + ', '.join(loaded) if loaded else 0)\n"
+)
+
+
+def _import(module: str) -> None:
+    subprocess.run([sys.executable, '-c', f'import {module}'], check=True)
+
+
+@benchmark("import.cold", module=['sys', 'azure.core', 'azure.cloudmachine'])
+def cold_import(env: Environment, module: str) -> Case:
+    """Time a fresh interpreter importing a module. 'sys' is the interpreter start-up baseline."""
+    if module == 'azure.cloudmachine':
+        subprocess.run([sys.executable, '-c', _CHECK_LAZY.format(module=module, lazy=LAZY_MODULES)], check=True)
+    return Case(lambda: _import(module))
@@ -0,0 +1,36 @@
+# -------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for
+# license information.
+# --------------------------------------------------------------------------
+
+from ._environment import Environment
+from ._harness import Case, benchmark
+
+
+def _fill(env: Environment, messages: int, size: int) -> None:
+    body = env.payload(size)
+    for _ in range(messages):
+        env.servicebus_server.send(body, topic=env.messaging.default_topic_name)
+
+
+@benchmark("messaging.get_settle", messages=[100], size=[256, 64 * 1024])
+def get_settle(env: Environment, messages: int, size: int) -> Case:
+    bus = env.messaging
+
+    def run() -> None:
+        for _ in range(messages):
+            # The renewal thread is never due during the run, so only receive and complete are measured.
+            message = bus.get(timeout=1, renew_interval=3600)
+            bus.task_done(message)
+    return Case(run, items=messages, bytes=messages * size, prepare=lambda: _fill(env, messages, size))
+
+
+@benchmark("messaging.receive_and_delete", messages=[100], size=[256, 64 * 1024])
+def receive_and_delete(env: Environment, messages: int, size: int) -> Case:
+    bus = env.messaging
+
+    def run() -> None:
+        for _ in range(messages):
+            bus.get(timeout=1, lock=False)
+    return Case(run, items=messages, bytes=messages * size, prepare=lambda: _fill(env, messages, size))
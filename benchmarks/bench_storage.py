@@ -0,0 +1,70 @@
+# -------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for
+# license information.
+# --------------------------------------------------------------------------
+
+from ._environment import Environment
+from ._harness import Case, benchmark
+
+KB = 1024
+MB = 1024 * KB
+_SIZES = [KB, MB, 16 * MB]
+
+
+@benchmark("storage.upload", size=_SIZES)
+def upload(env: Environment, size: int) -> Case:
+    data = env.payload(size)
+    return Case(lambda: env.storage.upload(data, filename=f"upload-{size}", overwrite=True), bytes=size)
+
+
+@benchmark("storage.download", size=_SIZES, chunk_size=[MB, 32 * MB])
+def download(env: Environment, size: int, chunk_size: int) -> Case:
+    filename = f"download-{size}"
+    env.storage.upload(env.payload(size), filename=filename, overwrite=True)
+
+    def run() -> None:
+        with env.storage.download(filename, chunk_size=chunk_size).content as stream:
+            while stream.read(4 * MB):
+                pass
+    return Case(run, bytes=size)
+
+
+@benchmark("storage.stream", pattern=['read', 'read_64k', 'readline'])
+def stream(env: Environment, pattern: str) -> Case:
+    # Text content, so that line-oriented reads see realistic line lengths.
+    data = env.text(8 * MB).encode('utf-8')
+    filename = "stream"
+    env.storage.upload(data, filename=filename, overwrite=True)
+
+    def run() -> None:
+        with env.storage.download(filename, chunk_size=MB).content as content:
+            if pattern == 'read':
+                content.read()
+            elif pattern == 'read_64k':
+                while content.read(64 * KB):
+                    pass
+            else:
+                while content.readline():
+                    pass
+    return Case(run, bytes=len(data))
+
+
+@benchmark("storage.list", blobs=[1000], pagesize=[100, 1000])
+def list_blobs(env: Environment, blobs: int, pagesize: int) -> Case:
+    container = f"list-{blobs}"
+    if not any(True for _ in env.storage.list(container=container, pages=1, pagesize=1)):
+        for index in range(blobs):
+            env.storage.upload(b"x", filename=f"dir{index % 10}/blob-{index:06d}", container=container)
+    return Case(lambda: sum(1 for _ in env.storage.list(container=container, pagesize=pagesize)), items=blobs)
+
+
+@benchmark("storage.batch_delete", blobs=[16, 128, 256])
+def batch_delete(env: Environment, blobs: int) -> Case:
+    container = f"delete-{blobs}"
+    names = [f"blob-{index:06d}" for index in range(blobs)]
+
+    def prepare() -> None:
+        for name in names:
+            env.storage.upload(b"x", filename=name, container=container, overwrite=True)
+    return Case(lambda: env.storage.delete(*names, container=container), items=blobs, prepare=prepare)
@@ -0,0 +1,34 @@
+# -------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for
+# license information.
+# --------------------------------------------------------------------------
+
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List
+
+from ._environment import Environment
+from ._harness import Case, benchmark
+
+
+def _entities(rows: int, partitions: int) -> List[Dict[str, Any]]:
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    return [
+        {
+            'PartitionKey': f"partition-{index % partitions}",
+            'RowKey': f"{index:010d}",
+            'Name': f"entity {index}",
+            'Value': index,
+            'Score': index / 7,
+            'Active': index % 2 == 0,
+            'Created': start + timedelta(seconds=index),
+        }
+        for index in range(rows)
+    ]
+
+
+@benchmark("tables.batch_upsert", backend=['rest', 'local'], rows=[100, 1000], partitions=[1, 10])
+def batch_upsert(env: Environment, backend: str, rows: int, partitions: int) -> Case:
+    data = env.table_data if backend == 'rest' else env.local_table_data
+    entities = _entities(rows, partitions)
+    return Case(lambda: data.upsert('benchmark', *entities), items=rows)
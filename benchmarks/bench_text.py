@@ -0,0 +1,49 @@
+# -------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for
+# license information.
+# --------------------------------------------------------------------------
+
+import json
+from io import BytesIO
+
+from azure.cloudmachine._httpclient._parser import JsonParser, Page, TextParser
+from azure.cloudmachine._httpclient._textsplitter import SentenceTextSplitter, SimpleTextSplitter, _bpe
+
+from ._environment import Environment
+from ._harness import Case, Skip, benchmark
+
+
+def _require_bpe() -> None:
+    # tiktoken downloads the encoding on first use, which needs network access.
+    try:
+        _bpe()
+    except Exception as e:  # pylint: disable=broad-except
+        raise Skip(f"the tiktoken encoding could not be loaded: {e}") from e
+
+
+@benchmark("text.sentence_splitter", chars=[10_000, 100_000], max_tokens=[500])
+def sentence_splitter(env: Environment, chars: int, max_tokens: int) -> Case:
+    _require_bpe()
+    pages = [Page(page_num=0, offset=0, text=env.text(chars))]
+    splitter = SentenceTextSplitter(max_tokens_per_section=max_tokens)
+    return Case(lambda: list(splitter(pages)), bytes=chars)
+
+
+@benchmark("text.simple_splitter", chars=[100_000])
+def simple_splitter(env: Environment, chars: int) -> Case:
+    pages = [Page(page_num=0, offset=0, text=env.text(chars))]
+    splitter = SimpleTextSplitter()
+    return Case(lambda: list(splitter(pages)), bytes=chars)
+
+
+@benchmark("text.parse", parser=['text', 'json'], chars=[1_000_000])
+def parse(env: Environment, parser: str, chars: int) -> Case:
+    text = env.text(chars)
+    if parser == 'text':
+        content = text.encode('utf-8')
+        parse_content = TextParser()
+    else:
+        content = json.dumps([{'id': i, 'text': line} for i, line in enumerate(text.split('. '))]).encode('utf-8')
+        parse_content = JsonParser()
+    return Case(lambda: list(parse_content(BytesIO(content))), bytes=len(content))
@@ -4,10 +4,11 @@
 # license information.
 # --------------------------------------------------------------------------
 
+import functools
 import os
 from datetime import datetime
 
-from flask import Flask, redirect, render_template, request, send_from_directory, url_for
+from flask import Flask, g, redirect, render_template, request, send_from_directory, url_for
 
 from azure.cloudmachine.ext.flask import CloudMachine
 
@@ -28,6 +29,12 @@ cm = CloudMachine(
 )
 
 
+@functools.lru_cache(maxsize=None)
+def ratings_rollup() -> None:
+    # Counted once from the existing reviews, then kept up to date as reviews are written.
+    cm.data.add_rollup(Review, group_by='restaurant', fields=['rating'], rebuild=True)
+
+
 @app.route('/', methods=['GET'])
 def index():
     restaurants = list(cm.data.list(Restaurant))
@@ -79,6 +86,7 @@ def add_review(id):
         review_text=review_text,
         review_date=datetime.now()
     )
+    ratings_rollup()
     cm.data.upsert(review)
     return redirect(url_for('details', id=id))
 
@@ -86,14 +94,13 @@ def add_review(id):
 @app.context_processor
 def utility_processor():
     def star_rating(id):
-        reviews = cm.data.query(Review, '*', id)
-        ratings = []
-        review_count = 0
-        for review in reviews:
-            ratings += [review.rating]
-            review_count += 1
-
-        avg_rating = sum(ratings) / len(ratings) if ratings else 0
+        # Ratings are read from the rollup, once per request.
+        if 'ratings' not in g:
+            ratings_rollup()
+            g.ratings = cm.data.aggregate(Review, group_by='restaurant', fields=['rating'])
+        rating = g.ratings.get(id)
+        review_count = rating.count if rating else 0
+        avg_rating = rating.mean('rating') if rating else 0
         stars_percent = round((avg_rating / 5.0) * 100) if review_count > 0 else 0
         return {'avg_rating': avg_rating, 'review_count': review_count, 'stars_percent': stars_percent}
     return dict(star_rating=star_rating)
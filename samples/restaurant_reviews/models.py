@@ -4,7 +4,7 @@
 # license information.
 # --------------------------------------------------------------------------
 
-from typing import Literal, Optional
+from typing import ClassVar, List, Literal, Optional
 from datetime import datetime
 from uuid import uuid4
 from pydantic import BaseModel, Field, AliasChoices
@@ -19,6 +19,9 @@ class Restaurant(BaseModel):
 
 class Review(BaseModel):
     __table__: Literal['reviews'] = 'reviews'
+    # Kept up to date as reviews are written. Queries on user_name scan the table until the index
+    # has been built over the existing reviews with add_index(Review, fields=['user_name'], rebuild=True).
+    __indexes__: ClassVar[List[str]] = ['user_name']
     id: str = Field(default_factory=lambda: str(uuid4()), serialization_alias='PartitionKey', validation_alias=AliasChoices('id', 'PartitionKey'))
     restaurant: str = Field(serialization_alias='RowKey', validation_alias=AliasChoices('restaurant', 'RowKey'))
     user_name: str
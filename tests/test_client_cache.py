@@ -0,0 +1,98 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from azure.cloudmachine._client import CloudMachineClient, LocalTableData
+from azure.cloudmachine._resources._resources import Resources
+
+
+@pytest.fixture
+def client():
+    client = CloudMachineClient(data='local', event_listener=False)
+    yield client
+    client.close()
+
+
+def test_concurrent_first_access_builds_one_client(client):
+    built = []
+
+    def _build_data():
+        built.append(threading.current_thread().name)
+        time.sleep(0.05)
+        return LocalTableData(), 'local'
+
+    client._build_data = _build_data
+    barrier = threading.Barrier(8)
+
+    def _access(_):
+        barrier.wait()
+        return client.data
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        clients = list(executor.map(_access, range(8)))
+    assert len(built) == 1
+    assert all(data is clients[0] for data in clients)
+    assert client.data is clients[0]
+
+
+class _Client:
+    def __init__(self, endpoint=None, credential=None, **kwargs):
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class _OtherClient(_Client):
+    pass
+
+
+def test_get_client_evicts_a_mismatched_client(client):
+    existing = _Client()
+    settings = Resources().get('storage:table', cls=_Client)
+    client._clients['storage:table'] = (existing, settings)
+    built = []
+
+    def _build_client(client_key, service, sub_resource, **kwargs):
+        built.append(kwargs['cls'])
+        replacement = kwargs['cls']()
+        client._clients[client_key] = (replacement, settings.copy(cls=kwargs['cls']))
+        return replacement
+
+    client._build_client = _build_client
+    assert client.get_client('storage:table') is existing
+    assert client.get_client('storage:table', cls=_Client) is existing
+    assert built == []
+
+    replacement = client.get_client('storage:table', cls=_OtherClient)
+    assert isinstance(replacement, _OtherClient)
+    assert existing.closed
+    assert client._clients['storage:table'][0] is replacement
+    assert client.get_client('storage:table', cls=_OtherClient) is replacement
+    assert built == [_OtherClient]
+
+
+def test_warmup_does_not_start_the_event_listener():
+    client = CloudMachineClient(data='local')
+    storage = _Client()
+    client._build_storage = lambda: (storage, 'local')
+    try:
+        assert client.warmup(['storage', 'data']) == {}
+        assert client._clients['cm:storage:blob'][0] is storage
+        assert not client._listener_thread.is_alive()
+    finally:
+        client.close()
+
+
+def test_warmup_reports_errors(client):
+    def _build_messaging():
+        raise RuntimeError("unavailable")
+
+    client._build_messaging = _build_messaging
+    errors = client.warmup(['messaging', 'data'])
+    assert list(errors) == ['messaging']
+    assert str(errors['messaging']) == "unavailable"
+    with pytest.raises(ValueError):
+        client.warmup(['unknown'])
@@ -0,0 +1,75 @@
+import pytest
+from azure.core.credentials import AzureKeyCredential
+
+from azure.cloudmachine._resources._resources import Resources
+
+
+class _Client:
+    def __init__(self, endpoint, credential, *, api_version=None, table_name=None, **kwargs):
+        self.endpoint = endpoint
+        self.credential = credential
+        self.api_version = api_version
+        self.table_name = table_name
+
+
+@pytest.fixture
+def settings(monkeypatch):
+    for name in ('AZURE_STORAGE_ENDPOINT', 'AZURE_TABLE_ENDPOINT', 'AZURE_STORAGE_TABLE_NAME', 'AZURE_TABLE_TABLE_NAME'):
+        monkeypatch.delenv(name, raising=False)
+    monkeypatch.setenv('AZURE_TABLE_ENDPOINT', 'https://env')
+    settings = Resources().get('storage:table', cls=_Client)
+    settings.credential.set_value(AzureKeyCredential('key'))
+    return settings
+
+
+def _endpoint(settings, **kwargs):
+    return settings.client(**kwargs).endpoint
+
+
+def test_resolved_settings_are_snapshotted(settings, monkeypatch):
+    assert _endpoint(settings) == 'https://env'
+    monkeypatch.setenv('AZURE_TABLE_ENDPOINT', 'https://changed')
+    assert _endpoint(settings) == 'https://env'
+
+
+def test_set_and_unset_invalidate_the_snapshot(settings):
+    assert _endpoint(settings) == 'https://env'
+    settings.set('endpoint', 'https://set')
+    assert _endpoint(settings) == 'https://set'
+    settings.unset('endpoint')
+    assert _endpoint(settings) == 'https://env'
+    settings.set('table_name', 'reviews')
+    assert settings.client().table_name == 'reviews'
+
+
+def test_config_stores_invalidate_the_snapshot(settings):
+    assert _endpoint(settings) == 'https://env'
+    settings.add_config_store({'AZURE_TABLE_ENDPOINT': 'https://store'})
+    assert _endpoint(settings) == 'https://store'
+
+
+def test_invalidate_starts_a_new_snapshot(settings, monkeypatch):
+    from azure.cloudmachine._resources._resources import resources
+
+    assert _endpoint(settings) == 'https://env'
+    monkeypatch.setenv('AZURE_TABLE_ENDPOINT', 'https://changed')
+    resources.invalidate()
+    assert _endpoint(settings) == 'https://changed'
+
+
+def test_other_settings_do_not_invalidate_the_snapshot(settings, monkeypatch):
+    assert _endpoint(settings) == 'https://env'
+    monkeypatch.setenv('AZURE_TABLE_ENDPOINT', 'https://changed')
+    settings.copy(endpoint='https://copy')
+    settings.by_name('reviews').set('endpoint', 'https://group')
+    assert _endpoint(settings) == 'https://env'
+
+
+def test_call_arguments_bypass_the_snapshot(settings):
+    settings.client()
+    credential = AzureKeyCredential('other')
+    client = settings.client(endpoint='https://arg', credential=credential, api_version='2020-01-01')
+    assert (client.endpoint, client.credential, client.api_version) == ('https://arg', credential, '2020-01-01')
+    assert settings.client(client_options={'table_name': 'option'}).table_name == 'option'
+    client = settings.client()
+    assert (client.endpoint, client.api_version) == ('https://env', None)
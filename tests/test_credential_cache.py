@@ -0,0 +1,68 @@
+import threading
+import time
+
+from azure.core.credentials import AccessToken
+
+from azure.cloudmachine._resources._credential_cache import SharedTokenCredential, shared_token_credential
+
+
+class _Credential:
+    def __init__(self, lifetime=3600):
+        self.lifetime = lifetime
+        self.calls = []
+        self.acquired = threading.Event()
+
+    def get_token(self, *scopes, **kwargs):
+        self.calls.append((scopes, kwargs))
+        self.acquired.set()
+        return AccessToken(f"token{len(self.calls)}", time.time() + self.lifetime)
+
+
+def test_tokens_are_cached_by_scope():
+    credential = _Credential()
+    with SharedTokenCredential(credential) as shared:
+        assert shared.get_token('a').token == 'token1'
+        assert shared.get_token('a').token == 'token1'
+        assert shared.get_token('b').token == 'token2'
+        assert shared.get_token('a', tenant_id='t').token == 'token3'
+        assert shared.get_token_info('a').token == 'token1'
+    assert len(credential.calls) == 3
+
+
+def test_claims_are_passed_through():
+    credential = _Credential()
+    with SharedTokenCredential(credential) as shared:
+        shared.get_token('a')
+        assert shared.get_token('a', claims='c').token == 'token2'
+        assert shared.get_token('a').token == 'token1'
+    assert credential.calls[1] == (('a',), {'claims': 'c'})
+
+
+def test_used_tokens_are_refreshed_in_the_background():
+    # Due for refresh 1s after acquisition, refreshed in the background just before.
+    credential = _Credential(lifetime=3)
+    with SharedTokenCredential(credential, refresh_margin=2, refresh_lead=0.5) as shared:
+        shared.get_token('a')
+        credential.acquired.clear()
+        assert credential.acquired.wait(timeout=5)
+        assert shared.get_token('a').token == 'token2'
+
+
+def test_unused_tokens_are_not_refreshed():
+    credential = _Credential(lifetime=3)
+    with SharedTokenCredential(credential, refresh_margin=2, refresh_lead=0.5) as shared:
+        shared.get_token('a')
+        credential.acquired.clear()
+        assert credential.acquired.wait(timeout=5)
+        # Nothing asked for the refreshed token, so the next cycle lets it lapse.
+        credential.acquired.clear()
+        assert not credential.acquired.wait(timeout=1.5)
+    assert len(credential.calls) == 2
+
+
+def test_shared_by_credential_instance():
+    credential = _Credential()
+    assert shared_token_credential(credential) is shared_token_credential(credential)
+    assert shared_token_credential(_Credential()) is not shared_token_credential(credential)
+    shared = shared_token_credential(credential)
+    assert shared_token_credential(shared) is shared
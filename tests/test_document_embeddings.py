@@ -0,0 +1,99 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+pytest.importorskip('openai')
+
+from azure.cloudmachine._httpclient._base import mark_worker_thread
+from azure.cloudmachine._httpclient._documents import CloudMachineDocumentIndex
+
+
+def _index(executor=None, concurrency=4):
+    index = CloudMachineDocumentIndex.__new__(CloudMachineDocumentIndex)
+    index._openai = {'embeddings_concurrency': concurrency}
+    index._executor = executor
+    index.calls = []
+
+    def _create_embeddings(inputs, tokens=None):
+        index.calls.append((threading.current_thread().name, tokens))
+        # Later batches finish first, to check that results keep their order.
+        time.sleep(0.01 * (10 - len(inputs[0])))
+        return [[float(len(text))] for text in inputs]
+
+    index._create_embeddings = _create_embeddings
+    return index
+
+
+BATCHES = [[(i, 'x' * (i + 1))] for i in range(6)]
+EXPECTED = [[float(i + 1)] for i in range(6)]
+
+
+def test_batches_run_inline_without_an_executor():
+    index = _index()
+    assert index._create_embedding_batch(BATCHES, list(range(6))) == EXPECTED
+    assert [tokens for _, tokens in index.calls] == list(range(6))
+
+
+def test_batches_run_concurrently_in_order():
+    with ThreadPoolExecutor(max_workers=4, thread_name_prefix='worker') as executor:
+        index = _index(executor)
+        assert index._create_embedding_batch(BATCHES) == EXPECTED
+    assert all(name.startswith('worker') for name, _ in index.calls)
+
+
+def test_batches_from_an_executor_thread_run_inline():
+    # Batches queued behind the caller would never run on a single worker.
+    with ThreadPoolExecutor(max_workers=1, initializer=mark_worker_thread) as executor:
+        index = _index(executor)
+        future = executor.submit(index._create_embedding_batch, BATCHES)
+        assert future.result(timeout=10) == EXPECTED
+
+
+def _throttled_index(monkeypatch):
+    from openai import RateLimitError
+
+    throttled = RateLimitError.__new__(RateLimitError)
+    throttled.response = type('Response', (), {'headers': {'retry-after-ms': '10'}})
+
+    class _Embeddings:
+        calls = []
+
+        def create(self, **kwargs):
+            self.calls.append(kwargs)
+            if len(self.calls) == 1:
+                raise throttled
+            return type('Response', (), {'data': [type('Data', (), {'embedding': [1.0]})]})
+
+    index = _index()
+    del index._create_embeddings
+    index._openai = {'embeddings_model': 'model'}
+    index._embeddings = type('Client', (), {'embeddings': _Embeddings(), 'base_url': 'https://openai.local/'})
+    index._rate_limiter = None
+    index.sleeps = []
+    monkeypatch.setattr(time, 'sleep', index.sleeps.append)
+    return index, _Embeddings.calls
+
+
+def test_embeddings_are_retried(monkeypatch):
+    index, calls = _throttled_index(monkeypatch)
+    assert index._create_embeddings('pens') == [[1.0]]
+    assert [call['input'] for call in calls] == ['pens', 'pens']
+    assert index.sleeps == [0.01]
+
+
+def test_search_embeds_the_query_with_retries(monkeypatch):
+    pytest.importorskip('azure.search.documents')
+
+    class _SearchClient:
+        def search(self, **kwargs):
+            self.kwargs = kwargs
+            return []
+
+    index, calls = _throttled_index(monkeypatch)
+    index._search_client = _SearchClient()
+    assert index.search(query='pens', semantic_search=False) == []
+    assert len(calls) == 2
+    assert index.sleeps == [0.01]
+    assert index._search_client.kwargs['vector_queries'][0].vector == [1.0]
@@ -0,0 +1,87 @@
+import pytest
+
+from azure.cloudmachine._client import LocalTableData
+from azure.cloudmachine._httpclient._embedding_cache import SqliteEmbeddingCache, TableEmbeddingCache, embedding_key
+
+EMBEDDING = [0.5, -0.25, 1.0]
+
+
+@pytest.fixture(params=['sqlite', 'table'])
+def cache(request, tmp_path):
+    if request.param == 'sqlite':
+        cache = SqliteEmbeddingCache(str(tmp_path / 'embeddings.db'))
+    else:
+        cache = TableEmbeddingCache(LocalTableData())
+    yield cache
+    cache.close()
+
+
+def test_embedding_key():
+    key = embedding_key('text-embedding-3-small', 256, 'hello')
+    assert key[0] == 'text-embedding-3-small:256'
+    assert key == embedding_key('text-embedding-3-small', 256, 'hello')
+    assert key != embedding_key('text-embedding-3-small', 512, 'hello')
+    assert key != embedding_key('text-embedding-3-small', 256, 'hello!')
+    assert embedding_key('ada', None, 'hello')[0] == 'ada:0'
+
+
+def test_roundtrip(cache):
+    hit = embedding_key('model', 3, 'hit')
+    miss = embedding_key('model', 3, 'miss')
+    assert cache.get_many([hit, miss]) == {}
+    cache.set_many({hit: EMBEDDING})
+    assert cache.get_many([hit, miss]) == {hit: EMBEDDING}
+    assert cache.get_many([]) == {}
+
+
+def test_embeddings_are_stored_as_float32(cache):
+    key = embedding_key('model', 1, 'text')
+    cache.set_many({key: [0.1]})
+    assert cache.get_many([key])[key] == [pytest.approx(0.1, rel=1e-6)]
+
+
+def test_scopes_are_kept_apart(cache):
+    first = embedding_key('model', 1, 'text')
+    second = embedding_key('model', 2, 'text')
+    cache.set_many({first: [1.0], second: [2.0]})
+    assert cache.get_many([first, second]) == {first: [1.0], second: [2.0]}
+
+
+def test_sqlite_cache_is_shared_through_the_file(tmp_path):
+    path = str(tmp_path / 'embeddings.db')
+    key = embedding_key('model', 3, 'text')
+    writer = SqliteEmbeddingCache(path)
+    writer.set_many({key: EMBEDDING})
+    reader = SqliteEmbeddingCache(path)
+    assert reader.get_many([key]) == {key: EMBEDDING}
+    writer.close()
+    reader.close()
+
+
+def test_sqlite_lookups_are_chunked():
+    cache = SqliteEmbeddingCache(':memory:')
+    embeddings = {embedding_key('model', 1, str(i)): [float(i)] for i in range(1200)}
+    cache.set_many(embeddings)
+    assert cache.get_many(embeddings) == embeddings
+    cache.close()
+
+
+def test_documents_only_embed_uncached_text():
+    pytest.importorskip('openai')
+    from azure.cloudmachine._httpclient._documents import CloudMachineDocumentIndex
+
+    index = CloudMachineDocumentIndex.__new__(CloudMachineDocumentIndex)
+    index._openai = {'embeddings_model': 'model', 'disable_batch': True}
+    index._embedding_cache = SqliteEmbeddingCache(':memory:')
+    embedded = []
+
+    def _create_embeddings(inputs, tokens=None):
+        embedded.append(inputs)
+        return [[float(len(inputs))]]
+
+    index._create_embeddings = _create_embeddings
+    assert index._embed_parts([(0, 'a'), (1, 'bb'), (2, 'a')]) == [[1.0], [2.0], [1.0]]
+    assert embedded == ['a', 'bb']
+    assert index._embed_parts([(0, 'bb'), (1, 'ccc')]) == [[2.0], [3.0]]
+    assert embedded == ['a', 'bb', 'ccc']
+    index._embedding_cache.close()
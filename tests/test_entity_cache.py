@@ -0,0 +1,97 @@
+import time
+
+import pytest
+
+from azure.cloudmachine._client import LocalTableData
+from azure.cloudmachine._httpclient._utils import LRUCache
+
+
+class _CountingReads:
+    def __init__(self, table, monkeypatch):
+        self.selects = []
+        get_entity = table.get_entity
+
+        def _get_entity(pk, rk, select=None, **kwargs):
+            self.selects.append(select)
+            return get_entity(pk, rk, select=select, **kwargs)
+
+        monkeypatch.setattr(table, 'get_entity', _get_entity)
+
+
+@pytest.fixture
+def data():
+    data = LocalTableData(entity_cache_size=10)
+    data.insert('items', {'PartitionKey': 'a', 'RowKey': '1', 'value': 1})
+    yield data
+    data.close()
+
+
+def _read(data, **kwargs):
+    return next(data.query('items', 'a', '1', **kwargs))
+
+
+def test_point_reads_are_cached(data, monkeypatch):
+    reads = _CountingReads(data._get_table_client('items'), monkeypatch)
+    assert _read(data)['value'] == 1
+    assert _read(data)['value'] == 1
+    assert reads.selects == [None]
+
+
+def test_projections_are_cached_separately(data, monkeypatch):
+    reads = _CountingReads(data._get_table_client('items'), monkeypatch)
+    assert _read(data, select=['value']) == {'value': 1}
+    assert _read(data)['RowKey'] == '1'
+    assert reads.selects == [['value'], None]
+
+
+def test_cached_entities_are_copied(data):
+    _read(data)['value'] = 2
+    assert _read(data)['value'] == 1
+
+
+def test_writes_evict(data):
+    _read(data)
+    data.upsert('items', {'PartitionKey': 'a', 'RowKey': '1', 'value': 2})
+    assert _read(data)['value'] == 2
+    data.delete('items', {'PartitionKey': 'a', 'RowKey': '1'})
+    assert len(data._cache) == 0
+
+
+def test_expired_entries_are_revalidated(monkeypatch):
+    data = LocalTableData(entity_cache_size=10, entity_cache_ttl=0.01)
+    data.insert('items', {'PartitionKey': 'a', 'RowKey': '1', 'value': 1})
+    table = data._get_table_client('items')
+    _read(data)
+    reads = _CountingReads(table, monkeypatch)
+
+    time.sleep(0.02)
+    assert _read(data)['value'] == 1
+    assert reads.selects == [['PartitionKey']]
+
+    # A write that bypasses the client is picked up once the entry expires.
+    table.upsert_entity({'PartitionKey': 'a', 'RowKey': '1', 'value': 2}, mode='replace')
+    time.sleep(0.02)
+    assert _read(data)['value'] == 2
+    assert reads.selects == [['PartitionKey'], ['PartitionKey'], None]
+
+
+def test_lru_eviction():
+    cache = LRUCache(maxsize=2)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    cache.get('a')
+    cache.set('c', 3)
+    assert cache.get('a') == 1
+    with pytest.raises(KeyError):
+        cache.get('b')
+
+
+def test_lru_ttl():
+    cache = LRUCache(ttl=0.01)
+    cache.set('a', 1)
+    time.sleep(0.02)
+    with pytest.raises(KeyError):
+        cache.get('a')
+    assert cache.get('a', stale=True) == 1
+    cache.touch('a')
+    assert cache.get('a') == 1
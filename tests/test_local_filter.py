@@ -0,0 +1,104 @@
+import uuid
+from datetime import datetime, timezone
+
+import pytest
+
+from azure.cloudmachine._client import LocalTableData
+from azure.cloudmachine._local._tables import _FilterParser, _evaluate, _key_conditions
+
+
+def _parse(query):
+    return _FilterParser(query).parse()
+
+
+def _matches(query, entity):
+    return _evaluate(_parse(query), entity) is True
+
+
+def test_precedence():
+    assert _parse("a eq 1 or b eq 2 and not c eq 3") == (
+        'or',
+        ('cmp', 'eq', ('prop', 'a'), ('lit', 1)),
+        ('and', ('cmp', 'eq', ('prop', 'b'), ('lit', 2)), ('not', ('cmp', 'eq', ('prop', 'c'), ('lit', 3))))
+    )
+    assert _parse("(a eq 1 or b eq 2) and c eq 3")[0] == 'and'
+
+
+@pytest.mark.parametrize("literal, value", [
+    ("'it''s'", "it's"),
+    ("42", 42),
+    ("42L", 42),
+    ("-1.5", -1.5),
+    ("2.5e3", 2500.0),
+    ("true", True),
+    ("null", None),
+    ("datetime'2024-01-01T00:00:00Z'", datetime(2024, 1, 1, tzinfo=timezone.utc)),
+    ("guid'00000000-0000-0000-0000-000000000001'", uuid.UUID(int=1)),
+    ("X'00ff'", b'\x00\xff'),
+    ("binary'00FF'", b'\x00\xff'),
+])
+def test_literals(literal, value):
+    assert _parse(f"a eq {literal}") == ('cmp', 'eq', ('prop', 'a'), ('lit', value))
+
+
+@pytest.mark.parametrize("query", [
+    "a eq",
+    "a eq 1 b",
+    "(a eq 1",
+    "a eq 1)",
+    "a eq \"1\"",
+    "a eq 'open",
+])
+def test_invalid_filters(query):
+    with pytest.raises(ValueError):
+        _parse(query)
+
+
+def test_evaluate():
+    entity = {'name': 'pen', 'price': 1.5, 'count': 3}
+    assert _matches("name eq 'pen' and price lt 2", entity)
+    assert _matches("count ge 3 and count le 3 and count ne 4", entity)
+    assert _matches("not (name eq 'ink')", entity)
+    assert not _matches("name gt 'q' or price gt 2", entity)
+
+
+def test_missing_properties_and_mismatched_types_do_not_match():
+    entity = {'name': 'pen'}
+    assert not _matches("missing eq 1", entity)
+    assert not _matches("missing ne 1", entity)
+    assert not _matches("name gt 1", entity)
+    assert _matches("not missing eq 1", entity)
+
+
+def test_key_conditions():
+    query = "PartitionKey eq 'a' and (RowKey ge '1' and RowKey lt '5') and price gt 1"
+    assert list(_key_conditions(_parse(query))) == [
+        ('PartitionKey', '=', 'a'),
+        ('RowKey', '>=', '1'),
+        ('RowKey', '<', '5'),
+    ]
+    # Conditions under an 'or' don't all have to hold.
+    assert list(_key_conditions(_parse("PartitionKey eq 'a' or RowKey eq '1'"))) == []
+
+
+def test_query_with_typed_parameters():
+    data = LocalTableData()
+    added = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    data.insert(
+        'items',
+        {'PartitionKey': 'a', 'RowKey': '1', 'added': added, 'id': uuid.UUID(int=1), 'data': b'\x01'},
+        {'PartitionKey': 'a', 'RowKey': '2', 'added': datetime(2025, 1, 1, tzinfo=timezone.utc)},
+    )
+    for query, parameters in [
+        ("added eq @added", {'added': added}),
+        ("id eq @id", {'id': uuid.UUID(int=1)}),
+        ("data eq @data", {'data': b'\x01'}),
+        ("PartitionKey eq @pk and RowKey lt @rk", {'pk': 'a', 'rk': '2'}),
+    ]:
+        assert [e['RowKey'] for e in data.query('items', query=query, parameters=parameters)] == ['1']
+
+
+def test_table_names_are_escaped():
+    data = LocalTableData()
+    data.insert('say "hi"', {'PartitionKey': 'a', 'RowKey': '1'})
+    assert [e['RowKey'] for e in data.query('say "hi"', query="RowKey eq '1'")] == ['1']
@@ -0,0 +1,178 @@
+from http.server import BaseHTTPRequestHandler
+
+import pytest
+from azure.core.pipeline.policies import SansIOHTTPPolicy
+from azure.core.rest import HttpRequest
+
+from azure.cloudmachine._httpclient._config import CloudMachinePipelineConfig
+from azure.cloudmachine._httpclient._metrics import (
+    DURATION,
+    REQUEST_BYTES,
+    REQUESTS,
+    RESPONSE_BYTES,
+    Histogram,
+    MetricsPolicy,
+    MetricsRegistry,
+    _CLASSIFIERS,
+    _parse_url,
+)
+
+
+def _classify(service, method, url, headers=None):
+    path, params = _parse_url(url)
+    return _CLASSIFIERS[service](method, path, params, headers or {})
+
+
+@pytest.mark.parametrize("method, url, expected", [
+    ('PUT', 'https://a.blob/docs/report%20v1.pdf', ('upload', 'docs')),
+    ('GET', 'https://a.blob/docs/report.pdf', ('download', 'docs')),
+    ('HEAD', 'https://a.blob/docs/report.pdf', ('get_properties', 'docs')),
+    ('DELETE', 'https://a.blob/docs/report.pdf', ('delete', 'docs')),
+    ('GET', 'https://a.blob/docs?restype=container&comp=list', ('list', 'docs')),
+    ('POST', 'https://a.blob/docs?restype=container&comp=batch', ('batch', 'docs')),
+    ('PUT', 'https://a.blob/docs?restype=container', ('put_container', 'docs')),
+    ('PUT', 'https://a.blob/docs/report.pdf?comp=block&blockid=AA', ('put_block', 'docs')),
+])
+def test_classify_storage(method, url, expected):
+    assert _classify('storage:blob', method, url) == expected
+
+
+@pytest.mark.parametrize("method, url, expected", [
+    ('POST', 'https://a.sb/orders/messages', ('send', 'orders')),
+    ('POST', 'https://a.sb/orders/messages/head?timeout=60', ('receive', 'orders')),
+    ('DELETE', 'https://a.sb/orders/messages/head', ('receive_and_delete', 'orders')),
+    ('DELETE', 'https://a.sb/orders/messages/1/lock', ('complete', 'orders')),
+    ('PUT', 'https://a.sb/orders/messages/1/lock', ('abandon', 'orders')),
+    ('POST', 'https://a.sb/orders/messages/1/lock', ('renew_lock', 'orders')),
+    ('POST', 'https://a.sb/events/subscriptions/all/messages/head', ('receive', 'events/subscriptions/all')),
+    ('GET', 'https://a.sb/orders', ('get_runtime_info', 'orders')),
+])
+def test_classify_servicebus(method, url, expected):
+    assert _classify('servicebus', method, url) == expected
+
+
+@pytest.mark.parametrize("method, url, headers, expected", [
+    ('POST', 'https://a.table/$batch', {}, ('batch', '')),
+    ('POST', 'https://a.table/Tables', {}, ('create_table', '')),
+    ('GET', 'https://a.table/Tables', {}, ('list_tables', '')),
+    ('GET', "https://a.table/reviews(PartitionKey='p',RowKey='r')", {}, ('get_entity', 'reviews')),
+    ('GET', "https://a.table/reviews()?$filter=x", {}, ('query', 'reviews')),
+    ('GET', 'https://a.table/reviews', {}, ('query', 'reviews')),
+    ('POST', 'https://a.table/reviews', {}, ('insert', 'reviews')),
+    ('PUT', "https://a.table/reviews(PartitionKey='p',RowKey='r')", {}, ('upsert', 'reviews')),
+    ('MERGE', "https://a.table/reviews(PartitionKey='p',RowKey='r')", {'If-Match': '*'}, ('upsert', 'reviews')),
+    ('PUT', "https://a.table/reviews(PartitionKey='p',RowKey='r')", {'If-Match': 'W/"1"'}, ('update', 'reviews')),
+    ('DELETE', "https://a.table/reviews(PartitionKey='p',RowKey='r')", {}, ('delete', 'reviews')),
+])
+def test_classify_tables(method, url, headers, expected):
+    assert _classify('storage:table', method, url, headers) == expected
+
+
+def test_histogram_quantiles():
+    histogram = Histogram(buckets=(1.0, 2.0, 4.0))
+    assert histogram.quantile(0.5) is None
+    for value in (0.5, 1.5, 1.5, 3.0):
+        histogram.observe(value)
+    assert (histogram.count, histogram.sum) == (4, 6.5)
+    assert histogram.counts == [1, 2, 1, 0]
+    assert histogram.quantile(0.25) == 1.0
+    assert histogram.quantile(0.5) == 1.5
+    assert histogram.quantile(1.0) == 4.0
+    # Values past the last bucket are reported at the last bucket.
+    histogram.observe(10.0)
+    assert histogram.quantile(1.0) == 4.0
+
+
+def test_registry():
+    registry = MetricsRegistry()
+    recorded = []
+    registry.add_listener(lambda *args: recorded.append(args))
+    registry.increment(REQUESTS, service='s', status='200')
+    registry.increment(REQUESTS, 2, status='200', service='s')
+    registry.observe(DURATION, 0.5, service='s')
+    snapshot = registry.snapshot()
+    assert snapshot['counters'] == [{'name': REQUESTS, 'labels': {'service': 's', 'status': '200'}, 'value': 3}]
+    [histogram] = snapshot['histograms']
+    assert (histogram['count'], histogram['sum']) == (1, 0.5)
+    # Quantiles are interpolated within the bucket holding the value.
+    assert 0.256 < histogram['p50'] <= 0.512
+    assert recorded == [
+        ('counter', REQUESTS, 1, {'service': 's', 'status': '200'}),
+        ('counter', REQUESTS, 2, {'status': '200', 'service': 's'}),
+        ('histogram', DURATION, 0.5, {'service': 's'}),
+    ]
+    registry.reset()
+    assert registry.snapshot() == {'counters': [], 'histograms': []}
+
+
+def test_to_prometheus():
+    registry = MetricsRegistry()
+    assert registry.to_prometheus() == "\n"
+    registry.increment(REQUESTS, resource='a"b\\c\nd', status='200')
+    registry.increment('unlabelled_total')
+    registry.observe(DURATION, 0.0015, service='s')
+    lines = registry.to_prometheus().splitlines()
+    assert lines[:4] == [
+        f"# TYPE {REQUESTS} counter",
+        f'{REQUESTS}{{resource="a\\"b\\\\c\\nd",status="200"}} 1',
+        "# TYPE unlabelled_total counter",
+        "unlabelled_total 1",
+    ]
+    assert lines[4] == f"# TYPE {DURATION} histogram"
+    assert lines[5] == f'{DURATION}_bucket{{service="s",le="0.001"}} 0'
+    assert lines[6] == f'{DURATION}_bucket{{service="s",le="0.002"}} 1'
+    assert lines[-3] == f'{DURATION}_bucket{{service="s",le="+Inf"}} 1'
+    assert lines[-2:] == [f'{DURATION}_sum{{service="s"}} 0.0015', f'{DURATION}_count{{service="s"}} 1']
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_PUT(self):
+        self.rfile.read(int(self.headers['Content-Length']))
+        self.send_response(201)
+        self.send_header('Content-Length', '2')
+        self.end_headers()
+        self.wfile.write(b'ok')
+
+    def log_message(self, *args):
+        pass
+
+
+def _config(**kwargs):
+    from azure.cloudmachine._local import build_local_transport
+
+    return CloudMachinePipelineConfig(
+        authentication_policy=SansIOHTTPPolicy(),
+        transport=build_local_transport({'storage.local': _Handler}),
+        **kwargs,
+    )
+
+
+def test_policy_records_requests():
+    registry = MetricsRegistry()
+    config = _config(metrics_service='storage:blob', metrics_registry=registry)
+    request = HttpRequest('PUT', 'http://storage.local/docs/report.pdf', content=b'data')
+    assert config.pipeline.run(request).http_response.status_code == 201
+    labels = {'service': 'storage:blob', 'operation': 'upload', 'resource': 'docs'}
+    counters = {c['name']: c for c in registry.snapshot()['counters']}
+    assert counters[REQUESTS]['labels'] == dict(labels, status='201')
+    assert counters[REQUEST_BYTES]['value'] == 4
+    assert counters[RESPONSE_BYTES]['value'] == 2
+    [histogram] = registry.snapshot()['histograms']
+    assert (histogram['labels'], histogram['count']) == (labels, 1)
+
+    config.pipeline.run(request, metrics_operation='replace')
+    operations = {c['labels']['operation'] for c in registry.snapshot()['counters']}
+    assert operations == {'upload', 'replace'}
+
+
+def _has_metrics_policy(config):
+    return any(isinstance(policy, MetricsPolicy) for policy in config.pipeline._impl_policies)
+
+
+def test_policy_can_be_disabled(monkeypatch):
+    monkeypatch.delenv('AZURE_CLOUDMACHINE_METRICS', raising=False)
+    assert _has_metrics_policy(_config())
+    monkeypatch.setenv('AZURE_CLOUDMACHINE_METRICS', 'false')
+    assert not _has_metrics_policy(_config())
+    # An explicit policy is always used.
+    assert _has_metrics_policy(_config(metrics_policy=MetricsPolicy()))
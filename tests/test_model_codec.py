@@ -0,0 +1,93 @@
+from datetime import datetime, timezone
+from typing import Literal
+
+import pytest
+from pydantic import AliasChoices, BaseModel, Field, computed_field, field_serializer, model_serializer
+
+from azure.cloudmachine._client import LocalTableData, _model_codec
+
+
+class Item(BaseModel):
+    __table__: Literal['items'] = 'items'
+    id: str = Field(serialization_alias='PartitionKey', validation_alias=AliasChoices('id', 'PartitionKey'))
+    name: str = Field(serialization_alias='RowKey', validation_alias=AliasChoices('name', 'RowKey'))
+    price: float
+
+
+class Tagged(Item):
+    tags: list
+
+    @field_serializer('tags')
+    def _join_tags(self, tags: list) -> str:
+        return ','.join(tags)
+
+
+class Priced(Item):
+    @computed_field
+    @property
+    def cents(self) -> int:
+        return int(self.price * 100)
+
+
+class Secret(Item):
+    password: str = Field(exclude=True)
+
+
+class Wrapped(Item):
+    @model_serializer
+    def _serialize(self) -> dict:
+        return {'PartitionKey': self.id, 'RowKey': self.name, 'price': str(self.price)}
+
+
+ITEM = {'id': 'a', 'name': 'pen', 'price': 1.5}
+
+
+def test_plain_models_dump_their_fields():
+    item = Item(**ITEM)
+    codec = _model_codec(Item)
+    assert codec.plain
+    assert codec.dump(item) == item.model_dump(by_alias=True) == {'PartitionKey': 'a', 'RowKey': 'pen', 'price': 1.5}
+
+
+@pytest.mark.parametrize("instance, dumped", [
+    (Tagged(tags=['x', 'y'], **ITEM), {'tags': 'x,y'}),
+    (Priced(**ITEM), {'cents': 150}),
+    (Secret(password='hunter2', **ITEM), {}),
+    (Wrapped(**ITEM), {'price': '1.5'}),
+])
+def test_serializers_are_respected(instance, dumped):
+    codec = _model_codec(type(instance))
+    assert not codec.plain
+    expected = {'PartitionKey': 'a', 'RowKey': 'pen', 'price': 1.5, **dumped}
+    assert codec.dump(instance) == expected
+
+
+def test_serializers_apply_to_writes():
+    data = LocalTableData()
+    data.insert(Tagged(tags=['x', 'y'], **ITEM), Secret(id='b', name='pen', price=1, password='hunter2'))
+    assert next(data.query('items', 'a', 'pen'))['tags'] == 'x,y'
+    assert 'password' not in next(data.query('items', 'b', 'pen'))
+
+
+def test_construct_skips_validation():
+    item = _model_codec(Item).construct({'PartitionKey': 'a', 'RowKey': 'pen', 'price': 'free'})
+    assert (item.id, item.name, item.price) == ('a', 'pen', 'free')
+
+
+def test_read_modes():
+    data = LocalTableData()
+    added = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    data.insert('items', {'PartitionKey': 'a', 'RowKey': 'pen', 'price': 1.5, 'added': added})
+    assert list(data.list(Item)) == [Item(**ITEM)]
+    assert list(data.list(Item, validate=False)) == [Item.model_construct(**ITEM)]
+    assert list(data.list(Item, select=['RowKey', 'price'], tuples=True)) == [('pen', 1.5)]
+    with pytest.raises(ValueError):
+        list(data.list('items', tuples=True))
+
+
+def test_query_many_read_modes():
+    data = LocalTableData()
+    data.insert('items', {'PartitionKey': 'a', 'RowKey': 'pen', 'price': 'free'})
+    with pytest.raises(ValueError):
+        data.query_many(Item, ('a', 'pen'))
+    assert data.query_many(Item, ('a', 'pen'), validate=False)[('a', 'pen')][0].price == 'free'
@@ -0,0 +1,123 @@
+import logging
+import time
+from http.server import BaseHTTPRequestHandler
+
+import pytest
+from azure.core.pipeline.policies import SansIOHTTPPolicy
+from azure.core.rest import HttpRequest
+
+from azure.cloudmachine._httpclient._config import CloudMachinePipelineConfig
+from azure.cloudmachine._httpclient._metrics import metrics
+from azure.cloudmachine._httpclient._profiling import (
+    OPERATION_DURATION,
+    PHASE_DURATION,
+    PHASES,
+    profile_operation,
+    profile_phase,
+    profiled,
+)
+from azure.cloudmachine._local import build_local_transport
+
+NETWORK_DELAY = 0.02
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        time.sleep(NETWORK_DELAY)
+        self.send_response(200)
+        self.send_header('x-ms-request-id', 'request-1')
+        self.send_header('Content-Length', '2')
+        self.end_headers()
+        self.wfile.write(b'ok')
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def pipeline():
+    return CloudMachinePipelineConfig(
+        authentication_policy=SansIOHTTPPolicy(),
+        transport=build_local_transport({'storage.local': _Handler}),
+        metrics_policy=False,
+    ).pipeline
+
+
+@pytest.fixture
+def settings(monkeypatch):
+    monkeypatch.delenv('AZURE_CLOUDMACHINE_PROFILING', raising=False)
+    monkeypatch.delenv('AZURE_CLOUDMACHINE_SLOW_OPERATION_THRESHOLD', raising=False)
+    return monkeypatch
+
+
+def _operation(pipeline, name):
+    with profile_operation(name) as profile:
+        with profile_phase('serialize'):
+            time.sleep(0.01)
+        pipeline.run(HttpRequest('GET', 'http://storage.local/docs/report.pdf?sig=secret'))
+    return profile
+
+
+def test_operations_are_not_profiled_by_default(pipeline, settings):
+    assert _operation(pipeline, 'test.disabled') is None
+
+
+def test_phases_add_up_to_the_duration(pipeline, settings):
+    settings.setenv('AZURE_CLOUDMACHINE_PROFILING', 'true')
+    profile = _operation(pipeline, 'test.phases')
+    assert set(profile.phases) == set(PHASES) | {'other'}
+    assert profile.phases['serialize'] >= 0.01
+    assert profile.phases['network'] >= NETWORK_DELAY
+    assert profile.phases['auth'] == profile.phases['deserialize'] == 0
+    assert sum(profile.phases.values()) == pytest.approx(profile.duration)
+    [request] = profile.requests
+    assert request['url'] == 'http://storage.local/docs/report.pdf'
+    assert (request['method'], request['status'], request['request_id']) == ('GET', 200, 'request-1')
+    assert request['response_bytes'] == '2'
+
+    histograms = {
+        (h['name'], h['labels'].get('phase')): h
+        for h in metrics.snapshot()['histograms']
+        if h['labels']['operation'] == 'test.phases'
+    }
+    assert histograms[(OPERATION_DURATION, None)]['sum'] == pytest.approx(profile.duration)
+    assert histograms[(PHASE_DURATION, 'network')]['sum'] == pytest.approx(profile.phases['network'])
+
+
+def test_nested_operations_are_attributed_to_the_outer_operation(pipeline, settings):
+    settings.setenv('AZURE_CLOUDMACHINE_PROFILING', 'true')
+
+    @profiled('test.inner')
+    def _inner():
+        return _operation(pipeline, 'test.nested')
+
+    with profile_operation('test.outer') as outer:
+        assert _inner() is outer
+        _operation(pipeline, 'test.nested')
+    assert len(outer.requests) == 2
+    assert outer.phases['network'] >= 2 * NETWORK_DELAY
+    operations = {h['labels']['operation'] for h in metrics.snapshot()['histograms']}
+    assert 'test.outer' in operations
+    assert not operations & {'test.inner', 'test.nested'}
+
+
+def test_slow_operations_are_logged(pipeline, settings, caplog):
+    settings.setenv('AZURE_CLOUDMACHINE_SLOW_OPERATION_THRESHOLD', str(NETWORK_DELAY))
+    with caplog.at_level(logging.WARNING, logger='azure.cloudmachine.profiling'):
+        profile = _operation(pipeline, 'test.slow')
+    [record] = caplog.records
+    assert record.getMessage().startswith('Slow operation test.slow took')
+    assert 'network=' in record.getMessage()
+    assert 'request-1' in record.getMessage()
+    assert 'secret' not in record.getMessage()
+    assert profile.duration >= NETWORK_DELAY
+    # The log alone doesn't record metrics.
+    operations = {h['labels']['operation'] for h in metrics.snapshot()['histograms']}
+    assert 'test.slow' not in operations
+
+
+def test_fast_operations_are_not_logged(pipeline, settings, caplog):
+    settings.setenv('AZURE_CLOUDMACHINE_SLOW_OPERATION_THRESHOLD', '10')
+    with caplog.at_level(logging.WARNING, logger='azure.cloudmachine.profiling'):
+        assert _operation(pipeline, 'test.fast') is not None
+    assert caplog.records == []
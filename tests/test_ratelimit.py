@@ -0,0 +1,75 @@
+import time
+
+import pytest
+
+from azure.cloudmachine._httpclient._ratelimit import RateLimiter, rate_limiter
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    # Sleeping advances a fake clock, so the tests don't wait.
+    class _Clock:
+        now = 1000.0
+        sleeps = []
+
+        def time(self):
+            return self.now
+
+        def sleep(self, seconds):
+            self.sleeps.append(seconds)
+            self.now += seconds
+
+    clock = _Clock()
+    monkeypatch.setattr(time, 'time', clock.time)
+    monkeypatch.setattr(time, 'sleep', clock.sleep)
+    return clock
+
+
+def _limiter(tmp_path, **kwargs):
+    return RateLimiter(path=str(tmp_path / 'quota.json'), **kwargs)
+
+
+def test_bursts_are_limited_to_a_fraction_of_the_minute(tmp_path, clock):
+    limiter = _limiter(tmp_path, requests_per_minute=60)
+    for _ in range(10):
+        assert limiter.acquire() == 0
+    assert limiter.acquire() == pytest.approx(1)
+    assert clock.sleeps == [pytest.approx(1)]
+
+
+def test_tokens_refill_over_time(tmp_path, clock):
+    limiter = _limiter(tmp_path, tokens_per_minute=6000)
+    assert limiter.acquire(1000) == 0
+    # 1000 tokens per 10s bucket, refilled at 100 per second.
+    assert limiter.acquire(500) == pytest.approx(5)
+    clock.now += 60
+    assert limiter.acquire(1000) == 0
+
+
+def test_requests_larger_than_the_bucket_wait_for_a_full_bucket(tmp_path, clock):
+    limiter = _limiter(tmp_path, tokens_per_minute=600)
+    assert limiter.acquire(5000) == 0
+    assert limiter.acquire(5000) == pytest.approx(10)
+
+
+def test_both_limits_apply(tmp_path, clock):
+    limiter = _limiter(tmp_path, tokens_per_minute=60000, requests_per_minute=6)
+    assert limiter.acquire(10) == 0
+    assert limiter.acquire(10) == pytest.approx(10)
+
+
+def test_processes_share_the_file(tmp_path, clock):
+    first = _limiter(tmp_path, requests_per_minute=6)
+    second = _limiter(tmp_path, requests_per_minute=6)
+    assert first.acquire() == 0
+    assert second.acquire() == pytest.approx(10)
+
+
+def test_rate_limiter(tmp_path):
+    assert rate_limiter('endpoint') is None
+    limiter = rate_limiter('endpoint', tokens_per_minute=1000)
+    assert rate_limiter('endpoint', tokens_per_minute=1000) is limiter
+    assert rate_limiter('endpoint', tokens_per_minute=2000) is not limiter
+    assert rate_limiter('other', tokens_per_minute=1000).path != limiter.path
+    path = str(tmp_path / 'quota.json')
+    assert rate_limiter('endpoint', tokens_per_minute=1000, path=path).path == path
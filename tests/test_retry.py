@@ -0,0 +1,169 @@
+import email.utils
+import time
+from http.server import BaseHTTPRequestHandler
+
+import pytest
+from azure.core.pipeline import Pipeline
+from azure.core.rest import HttpRequest
+
+from azure.cloudmachine._httpclient import _retry
+from azure.cloudmachine._httpclient._retry import (
+    AdaptiveRetryPolicy,
+    RetryBudget,
+    decorrelated_jitter,
+    parse_retry_after,
+    retry_budget,
+    retry_call,
+)
+from azure.cloudmachine._local import build_local_transport
+
+
+@pytest.fixture(autouse=True)
+def sleeps(monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(time, 'sleep', sleeps.append)
+    monkeypatch.setattr(_retry, '_budgets', {})
+    return sleeps
+
+
+class _Throttled(Exception):
+    def __init__(self, headers=None):
+        super().__init__("throttled")
+        self.headers = headers
+
+
+def _failing(times, error=_Throttled):
+    calls = []
+
+    def _call():
+        calls.append(None)
+        if len(calls) <= times:
+            raise error()
+        return len(calls)
+    return _call, calls
+
+
+@pytest.mark.parametrize("headers, seconds", [
+    ({'retry-after-ms': '1500'}, 1.5),
+    ({'x-ms-retry-after-ms': '250'}, 0.25),
+    ({'retry-after': '3'}, 3.0),
+    ({'retry-after': '-3'}, 0.0),
+    ({'x-ratelimit-remaining-requests': '0', 'x-ratelimit-reset-requests': '20ms'}, 0.02),
+    ({'x-ratelimit-remaining-tokens': '0', 'x-ratelimit-reset-tokens': '6m0s'}, 360.0),
+    ({
+        'x-ratelimit-remaining-requests': '0', 'x-ratelimit-reset-requests': '1s',
+        'x-ratelimit-remaining-tokens': '0', 'x-ratelimit-reset-tokens': '2s',
+    }, 2.0),
+    ({'x-ratelimit-remaining-requests': '5', 'x-ratelimit-reset-requests': '1s'}, None),
+    ({'retry-after': 'soon'}, None),
+    ({}, None),
+])
+def test_parse_retry_after(headers, seconds):
+    assert parse_retry_after(headers) == pytest.approx(seconds)
+
+
+def test_parse_retry_after_date():
+    date = email.utils.formatdate(time.time() + 30, usegmt=True)
+    assert 25 < parse_retry_after({'retry-after': date}) <= 30
+    past = email.utils.formatdate(time.time() - 30, usegmt=True)
+    assert parse_retry_after({'retry-after': past}) == 0
+
+
+def test_decorrelated_jitter_bounds():
+    previous = 0.0
+    for _ in range(100):
+        backoff = decorrelated_jitter(previous, 0.5, 10)
+        assert 0.5 <= backoff <= min(10, max(previous, 0.5) * 3)
+        previous = backoff
+    assert decorrelated_jitter(100, 0.5, 10) <= 10
+
+
+def test_retry_budget():
+    budget = RetryBudget(ratio=0.5, reserve=2)
+    assert budget.withdraw() and budget.withdraw()
+    assert not budget.withdraw()
+    budget.deposit()
+    assert not budget.withdraw()
+    budget.deposit()
+    assert budget.withdraw()
+    for _ in range(10):
+        budget.deposit()
+    assert budget.withdraw() and budget.withdraw()
+    assert not budget.withdraw()
+
+
+def test_budgets_are_shared_by_host():
+    assert retry_budget('https://a.example/x') is retry_budget('https://A.example/y')
+    assert retry_budget('https://a.example') is not retry_budget('https://b.example')
+
+
+def test_retry_call_retries_until_success(sleeps):
+    call, calls = _failing(2)
+    assert retry_call(call, endpoint='https://a.example', retry_on=(_Throttled,), backoff_factor=1) == 3
+    assert len(sleeps) == 2
+    assert all(1 <= s <= 60 for s in sleeps)
+
+
+def test_retry_call_waits_as_asked(sleeps):
+    call, _ = _failing(1, lambda: _Throttled({'retry-after-ms': '1500'}))
+    retry_call(call, endpoint='https://a.example', retry_on=(_Throttled,), get_headers=lambda e: e.headers)
+    assert sleeps == [1.5]
+
+
+def test_retry_call_gives_up(sleeps):
+    call, calls = _failing(5)
+    with pytest.raises(_Throttled):
+        retry_call(call, endpoint='https://a.example', retry_on=(_Throttled,), retries=2)
+    assert len(calls) == 3
+
+    call, calls = _failing(1, ValueError)
+    with pytest.raises(ValueError):
+        retry_call(call, endpoint='https://a.example', retry_on=(_Throttled,))
+    assert len(calls) == 1
+
+
+def test_retry_call_stops_when_the_budget_is_exhausted(sleeps):
+    _retry._budgets['b.example'] = RetryBudget(reserve=2)
+    call, calls = _failing(10)
+    with pytest.raises(_Throttled):
+        retry_call(call, endpoint='https://b.example', retry_on=(_Throttled,))
+    assert len(calls) == 3
+
+
+def _throttling_handler(times):
+    class _Handler(BaseHTTPRequestHandler):
+        requests = []
+
+        def do_GET(self):
+            self.requests.append(self.path)
+            status = 429 if len(self.requests) <= times else 200
+            self.send_response(status)
+            self.send_header('retry-after-ms', '10')
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+    return _Handler
+
+
+def _send(handler, **kwargs):
+    pipeline = Pipeline(
+        transport=build_local_transport({'service.local': handler}),
+        policies=[AdaptiveRetryPolicy(**kwargs)],
+    )
+    return pipeline.run(HttpRequest('GET', 'http://service.local/')).http_response
+
+
+def test_policy_waits_as_asked(sleeps):
+    handler = _throttling_handler(2)
+    assert _send(handler).status_code == 200
+    assert len(handler.requests) == 3
+    assert sleeps == [0.01, 0.01]
+
+
+def test_policy_stops_when_the_budget_is_exhausted(sleeps):
+    _retry._budgets['service.local'] = RetryBudget(ratio=0, reserve=1)
+    handler = _throttling_handler(5)
+    assert _send(handler).status_code == 429
+    assert len(handler.requests) == 2
@@ -0,0 +1,152 @@
+import json
+import threading
+import time
+from queue import Empty
+
+import pytest
+from azure.core.exceptions import HttpResponseError
+from azure.core.pipeline.policies import SansIOHTTPPolicy
+from azure.core.rest import HttpRequest
+
+from azure.cloudmachine._httpclient._config import CloudMachinePipelineConfig
+from azure.cloudmachine._httpclient._servicebus import CloudMachineServiceBus, LockedMessage
+from azure.cloudmachine._local import LocalServiceBus, build_local_transport
+from azure.cloudmachine._resources._resource_map import DEFAULT_API_VERSIONS
+
+
+def _messaging(server):
+    return CloudMachineServiceBus(
+        endpoint="http://servicebus.local/",
+        credential=None,
+        scope='',
+        config=CloudMachinePipelineConfig(
+            authentication_policy=SansIOHTTPPolicy(),
+            transport=build_local_transport({'servicebus.local': server.handler}),
+            api_version=DEFAULT_API_VERSIONS['servicebus'],
+        ),
+    )
+
+
+@pytest.fixture
+def server():
+    server = LocalServiceBus()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def messaging(server):
+    return _messaging(server)
+
+
+def _send(messaging, body, topic='cm_default_topic', **properties):
+    request = HttpRequest(
+        'POST',
+        f"{topic}/messages",
+        content=body,
+        headers={'BrokerProperties': json.dumps(properties)}
+    )
+    return messaging._send_request(request)
+
+
+def test_send_receive_complete(messaging):
+    assert _send(messaging, b'hello', MessageId='first').status_code == 201
+    assert messaging.qsize() == 1
+    message = messaging.get(timeout=1)
+    assert isinstance(message, LockedMessage)
+    assert (message.content, message.id, message.delivery_count) == (b'hello', 'first', 1)
+    # Locked messages are still counted until they are completed.
+    assert messaging.qsize() == 1
+    messaging.task_done(message)
+    assert messaging.qsize() == 0
+    assert messaging.empty()
+    with pytest.raises(Empty):
+        messaging.get(timeout=0)
+
+
+def test_messages_are_received_in_order(messaging):
+    for body in (b'1', b'2', b'3'):
+        _send(messaging, body)
+    messages = [messaging.get(timeout=0) for _ in range(3)]
+    assert [m.content for m in messages] == [b'1', b'2', b'3']
+    assert [m.sequence_number for m in messages] == sorted(m.sequence_number for m in messages)
+    for message in messages:
+        messaging.task_done(message)
+
+
+def test_abandoned_messages_are_redelivered(messaging):
+    _send(messaging, b'retry')
+    message = messaging.get(timeout=0)
+    messaging.task_done(message, delete=False)
+    redelivered = messaging.get(timeout=0)
+    assert (redelivered.id, redelivered.delivery_count) == (message.id, 2)
+    messaging.task_done(redelivered)
+
+
+def test_receive_and_delete(messaging):
+    _send(messaging, b'once')
+    message = messaging.get(timeout=0, lock=False)
+    assert not isinstance(message, LockedMessage)
+    assert message.content == b'once'
+    assert messaging.qsize() == 0
+
+
+def test_queues(server, messaging):
+    server.send(b'job', queue='jobs')
+    assert messaging.qsize(queue='jobs') == 1
+    message = messaging.get(timeout=0, queue='jobs')
+    assert message.content == b'job'
+    messaging.task_done(message, queue='jobs')
+    assert messaging.qsize(queue='jobs') == 0
+    assert messaging.qsize() == 0
+
+
+def test_receive_waits_for_a_message(server, messaging):
+    timer = threading.Timer(0.05, server.send, args=(b'late',), kwargs={'topic': 'cm_default_topic'})
+    timer.start()
+    start = time.monotonic()
+    message = messaging.get(timeout=5)
+    assert message.content == b'late'
+    assert time.monotonic() - start < 5
+    messaging.task_done(message)
+
+
+def test_expired_locks_are_released():
+    with LocalServiceBus(lock_duration=0.05) as server:
+        messaging = _messaging(server)
+        _send(messaging, b'slow')
+        message = messaging.get(timeout=0)
+        message._stop_renew.set()
+        time.sleep(0.1)
+        redelivered = messaging.get(timeout=0)
+        assert redelivered.delivery_count == 2
+        with pytest.raises(HttpResponseError) as error:
+            messaging.task_done(message)
+        assert error.value.status_code == 404
+        messaging.task_done(redelivered)
+
+
+def test_renewed_locks_are_kept():
+    with LocalServiceBus(lock_duration=0.2) as server:
+        messaging = _messaging(server)
+        _send(messaging, b'renewed')
+        message = messaging.get(timeout=0, renew_interval=0.05)
+        time.sleep(0.4)
+        with pytest.raises(Empty):
+            messaging.get(timeout=0)
+        messaging.task_done(message)
+
+
+def test_messages_past_the_delivery_count_are_dead_lettered():
+    with LocalServiceBus(max_delivery_count=1) as server:
+        messaging = _messaging(server)
+        _send(messaging, b'poison')
+        messaging.task_done(messaging.get(timeout=0), delete=False)
+        with pytest.raises(Empty):
+            messaging.get(timeout=0)
+
+
+def test_unknown_paths(messaging):
+    with pytest.raises(HttpResponseError) as error:
+        messaging._send_request(HttpRequest('PUT', 'cm_default_topic'))
+    assert error.value.status_code == 404
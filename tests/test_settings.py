@@ -0,0 +1,84 @@
+import pytest
+
+from azure.cloudmachine._resources._resources import Resources
+from azure.cloudmachine._resources._setting import StoredPrioritizedSetting
+
+
+@pytest.fixture
+def settings(monkeypatch):
+    for name in ('AZURE_STORAGE_ENDPOINT', 'AZURE_TABLE_ENDPOINT', 'AZURE_STORAGE_INDEX_NAME', 'AZURE_TABLE_INDEX_NAME'):
+        monkeypatch.delenv(name, raising=False)
+    return Resources().get('storage:table')
+
+
+def test_environment_is_read_live(settings, monkeypatch):
+    assert settings.get('endpoint') is None
+    monkeypatch.setenv('AZURE_TABLE_ENDPOINT', 'https://table')
+    assert settings.get('endpoint') == 'https://table'
+    # Earlier names take precedence.
+    monkeypatch.setenv('AZURE_STORAGE_ENDPOINT', 'https://storage')
+    assert settings.get('endpoint') == 'https://storage'
+    monkeypatch.delenv('AZURE_STORAGE_ENDPOINT')
+    assert settings.endpoint() == 'https://table'
+
+
+def test_unknown_settings_are_read_live(settings, monkeypatch):
+    assert settings.get('index_name', 'default') == 'default'
+    monkeypatch.setenv('AZURE_TABLE_INDEX_NAME', 'reviews')
+    assert settings.get('index_name', 'default') == 'reviews'
+
+
+def test_precedence(settings, monkeypatch):
+    monkeypatch.setenv('AZURE_TABLE_ENDPOINT', 'https://env')
+    store = {'AZURE_TABLE_ENDPOINT': 'https://store'}
+    settings.add_config_store(store)
+    assert settings.get('endpoint') == 'https://store'
+    settings.set('endpoint', 'https://set')
+    assert settings.get('endpoint') == 'https://set'
+    settings.unset('endpoint')
+    assert settings.get('endpoint') == 'https://store'
+    # Config stores are read live too.
+    del store['AZURE_TABLE_ENDPOINT']
+    assert settings.get('endpoint') == 'https://env'
+
+
+def test_versions_track_changes_to_a_setting():
+    setting = StoredPrioritizedSetting('endpoint', env_var='AZURE_TEST_ENDPOINT')
+    other = StoredPrioritizedSetting('other')
+    setting.set_value('a')
+    setting.unset_value()
+    setting.add_config_store({}, position='last')
+    assert (setting.version, other.version) == (3, 0)
+
+
+def test_frozen_settings_are_resolved_once(settings, monkeypatch):
+    monkeypatch.setenv('AZURE_TABLE_ENDPOINT', 'https://table')
+    settings.freeze()
+    assert settings.frozen
+    monkeypatch.setenv('AZURE_TABLE_ENDPOINT', 'https://changed')
+    assert settings.get('endpoint') == 'https://table'
+    # Misses and names first read after freezing are frozen too.
+    assert settings.get('index_name', 'default') == 'default'
+    monkeypatch.setenv('AZURE_TABLE_INDEX_NAME', 'reviews')
+    assert settings.get('index_name', 'default') == 'default'
+
+
+def test_frozen_settings_reject_changes(settings):
+    settings.freeze()
+    with pytest.raises(RuntimeError):
+        settings.set('endpoint', 'https://set')
+    with pytest.raises(RuntimeError):
+        settings.unset('endpoint')
+    with pytest.raises(RuntimeError):
+        settings.add_config_store({})
+
+
+def test_resources_freeze_later_resources(monkeypatch):
+    monkeypatch.setenv('AZURE_TABLE_ENDPOINT', 'https://table')
+    resources = Resources()
+    resources.freeze()
+    settings = resources.get('storage:table')
+    assert settings.frozen
+    assert settings.by_name('reviews').frozen
+    monkeypatch.setenv('AZURE_TABLE_ENDPOINT', 'https://changed')
+    assert settings.get('endpoint') == 'https://table'
@@ -0,0 +1,149 @@
+import io
+import time
+import uuid
+from email.utils import formatdate
+
+import pytest
+from azure.core import MatchConditions
+from azure.core.exceptions import HttpResponseError
+from azure.core.pipeline.policies import SansIOHTTPPolicy
+from azure.core.rest import HttpRequest
+
+from azure.cloudmachine._httpclient._config import CloudMachinePipelineConfig
+from azure.cloudmachine._httpclient._storage import CloudMachineStorage, StorageBatchError, StorageHeadersPolicy
+from azure.cloudmachine._local import LocalBlobStorage, build_local_transport
+from azure.cloudmachine._resources._resource_map import DEFAULT_API_VERSIONS
+
+
+@pytest.fixture
+def storage():
+    server = LocalBlobStorage(containers=['default'])
+    storage = CloudMachineStorage(
+        endpoint="http://storage.local/",
+        account_name='local',
+        credential=None,
+        container_name='default',
+        scope='',
+        config=CloudMachinePipelineConfig(
+            authentication_policy=SansIOHTTPPolicy(),
+            transport=build_local_transport({'storage.local': server.handler}),
+            api_version=DEFAULT_API_VERSIONS['storage:blob'],
+            headers_policy=StorageHeadersPolicy(),
+        ),
+    )
+    yield storage
+    server.stop()
+
+
+class _NamedFile(io.BytesIO):
+    filename = 'named.txt'
+
+
+def test_upload_filename(storage):
+    assert storage.upload(b'data', filename='given.txt').filename == 'given.txt'
+    assert storage.upload(_NamedFile(b'data')).filename == 'named.txt'
+    assert storage.upload(_NamedFile(b'data'), filename='given2.txt').filename == 'given2.txt'
+    uuid.UUID(storage.upload(b'data').filename)
+
+
+def test_download_in_chunks(storage):
+    data = bytes(range(256)) * 1024
+    storage.upload(data, filename='chunked')
+    with storage.download('chunked', chunk_size=64 * 1024).content as stream:
+        assert stream.read() == data
+
+
+@pytest.mark.parametrize("content_range", [
+    (0, None),
+    (1000, None),
+    (1000, 200000),
+    (1000, 1000 + 64 * 1024 - 1),
+    (0, 10),
+    (250000, 300000),
+])
+def test_ranged_download_in_chunks(storage, content_range):
+    data = bytes(range(256)) * 1024
+    storage.upload(data, filename='ranged')
+    start, end = content_range
+    expected = data[start:] if end is None else data[start:end + 1]
+    with storage.download('ranged', range=content_range, chunk_size=64 * 1024).content as stream:
+        assert len(stream) == len(expected)
+        assert stream.read() == expected
+
+
+def _status(excinfo):
+    return excinfo.value.status_code, excinfo.value.response.headers.get('x-ms-error-code')
+
+
+def test_upload_conditions(storage):
+    first = storage.upload(b'first', filename='conditional')
+    # Uploads only create new blobs by default.
+    with pytest.raises(HttpResponseError) as error:
+        storage.upload(b'second', filename='conditional')
+    assert _status(error) == (409, 'BlobAlreadyExists')
+    second = storage.upload(b'second', filename='conditional', overwrite=True)
+    assert second.etag != first.etag
+    with pytest.raises(HttpResponseError) as error:
+        storage.upload(b'third', filename='conditional', condition=MatchConditions.IfNotModified, etag=first.etag)
+    assert _status(error) == (412, 'ConditionNotMet')
+    storage.upload(b'third', filename='conditional', condition=MatchConditions.IfNotModified, etag=second.etag)
+    with pytest.raises(HttpResponseError) as error:
+        storage.upload(b'data', filename='missing', condition=MatchConditions.IfPresent)
+    assert _status(error) == (412, 'ConditionNotMet')
+    with storage.download('conditional').content as stream:
+        assert stream.read() == b'third'
+
+
+def test_download_conditions(storage):
+    first = storage.upload(b'first', filename='conditional')
+    with pytest.raises(HttpResponseError) as error:
+        storage.download('conditional', condition=MatchConditions.IfModified, etag=first.etag)
+    assert error.value.status_code == 304
+    second = storage.upload(b'second', filename='conditional', overwrite=True)
+    with storage.download('conditional', condition=MatchConditions.IfModified, etag=first.etag).content as stream:
+        assert stream.read() == b'second'
+    with pytest.raises(HttpResponseError) as error:
+        storage.download('conditional', condition=MatchConditions.IfNotModified, etag=first.etag)
+    assert _status(error) == (412, 'ConditionNotMet')
+    with storage.download('conditional', condition=MatchConditions.IfNotModified, etag=second.etag).content as stream:
+        assert stream.read() == b'second'
+    with pytest.raises(HttpResponseError) as error:
+        storage.download('missing')
+    assert _status(error) == (404, 'BlobNotFound')
+
+
+@pytest.mark.parametrize("header, offset, status", [
+    ('If-Modified-Since', -60, 200),
+    ('If-Modified-Since', 60, 304),
+    ('If-Unmodified-Since', 60, 200),
+    ('If-Unmodified-Since', -60, 412),
+])
+def test_date_conditions(storage, header, offset, status):
+    storage.upload(b'data', filename='dated')
+    request = HttpRequest(
+        'GET',
+        'http://storage.local/default/dated',
+        headers={header: formatdate(time.time() + offset, usegmt=True)}
+    )
+    assert storage._client.send_request(request).status_code == status
+
+
+def test_batch_delete(storage):
+    for name in ('a', 'b', 'c/d'):
+        storage.upload(b'data', filename=name)
+    storage.delete('a', 'c/d', 'missing')
+    assert [f.filename for f in storage.list()] == ['b']
+    # Deleting blobs that are already gone succeeds.
+    storage.delete('a', 'b')
+    assert list(storage.list()) == []
+
+
+def test_batch_delete_conditions(storage):
+    stale = storage.upload(b'data', filename='stale')
+    storage.upload(b'changed', filename='stale', overwrite=True)
+    current = storage.upload(b'data', filename='current')
+    with pytest.raises(StorageBatchError) as error:
+        storage.delete(stale, current, condition=MatchConditions.IfNotModified)
+    assert error.value.succeeded == [current]
+    assert [file for file, _ in error.value.failed] == [stale]
+    assert [f.filename for f in storage.list()] == ['stale']
@@ -0,0 +1,112 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from azure.cloudmachine._client import _ROLLUP_TABLE, Aggregate, LocalTableData
+from azure.cloudmachine._httpclient._base import mark_worker_thread
+
+
+def _review(pk, restaurant, rating):
+    return {'PartitionKey': pk, 'RowKey': 'review', 'restaurant': restaurant, 'rating': rating}
+
+
+@pytest.fixture
+def data():
+    data = LocalTableData()
+    yield data
+    data.close()
+
+
+def _scanned(data):
+    return data.aggregate('reviews', group_by='restaurant', fields=['rating'], query="rating ge 0")
+
+
+def _rolled_up(data):
+    return data.aggregate('reviews', group_by='restaurant', fields=['rating'])
+
+
+def _rollup_rows(data):
+    return {
+        e['RowKey']: e['count']
+        for e in data.query(_ROLLUP_TABLE, 'reviews:restaurant', '*')
+    }
+
+
+def test_aggregate_scan(data):
+    data.insert('reviews', _review('1', 'a', 4), _review('2', 'a', 2), _review('3', 'b', 5))
+    data.insert('reviews', {'PartitionKey': '4', 'RowKey': 'review'})
+    result = data.aggregate('reviews', group_by='restaurant', fields=['rating'])
+    assert result == {'a': Aggregate(count=2, sum={'rating': 6}), 'b': Aggregate(count=1, sum={'rating': 5})}
+    assert result['a'].mean('rating') == 3
+
+
+def test_rollup_rebuild_counts_existing_entities(data):
+    data.insert('reviews', _review('1', 'a', 4), _review('2', 'b', 5))
+    data.add_rollup('reviews', group_by='restaurant', fields=['rating'], rebuild=True)
+    assert _rolled_up(data) == _scanned(data)
+
+
+def test_rollup_tracks_writes(data):
+    data.add_rollup('reviews', group_by='restaurant', fields=['rating'])
+    data.insert('reviews', _review('1', 'a', 4), _review('2', 'a', 2), _review('3', 'b', 5))
+    assert _rolled_up(data) == _scanned(data)
+
+    # Replaces adjust the sum, and moving an entity to another group moves its count.
+    data.upsert('reviews', _review('1', 'a', 1), _review('3', 'a', 5))
+    assert _rolled_up(data) == _scanned(data) == {'a': Aggregate(count=3, sum={'rating': 8})}
+    assert _rollup_rows(data) == {'a': 3}
+
+    # Merges keep the values they don't specify.
+    data.update('reviews', {'PartitionKey': '2', 'RowKey': 'review', 'rating': 3}, overwrite=False)
+    data.upsert('reviews', {'PartitionKey': '1', 'RowKey': 'review', 'text': 'ok'}, overwrite=False)
+    assert _rolled_up(data) == _scanned(data) == {'a': Aggregate(count=3, sum={'rating': 9})}
+
+    # Deletes only need the keys.
+    data.delete('reviews', {'PartitionKey': '1', 'RowKey': 'review'}, {'PartitionKey': '2', 'RowKey': 'review'})
+    assert _rolled_up(data) == _scanned(data) == {'a': Aggregate(count=1, sum={'rating': 5})}
+
+
+def test_rollup_does_not_scan_the_table(data, monkeypatch):
+    data.add_rollup('reviews', group_by='restaurant', fields=['rating'])
+    data.insert('reviews', _review('1', 'a', 4))
+    table = data._get_table_client('reviews')
+
+    def _scan(*args, **kwargs):
+        raise AssertionError("The table was scanned.")
+
+    monkeypatch.setattr(table, 'list_entities', _scan)
+    monkeypatch.setattr(data, '_recompute_rollup_row', _scan)
+    data.upsert('reviews', _review('1', 'b', 3))
+    data.delete('reviews', _review('1', 'b', 3))
+    assert _rolled_up(data) == {}
+
+
+def test_empty_groups_are_removed(data):
+    data.add_rollup('reviews', group_by='restaurant', fields=['rating'])
+    data.insert('reviews', _review('1', 'a', 4))
+    data.delete('reviews', _review('1', 'a', 4))
+    assert _rollup_rows(data) == {}
+
+
+def test_add_rollup_is_idempotent(data):
+    data.add_rollup('reviews', group_by='restaurant', fields=['rating'])
+    data.add_rollup('reviews', group_by='restaurant', fields=['rating'])
+    data.insert('reviews', _review('1', 'a', 4))
+    assert _rolled_up(data) == {'a': Aggregate(count=1, sum={'rating': 4})}
+
+
+def test_query_many(data):
+    data.insert('reviews', _review('1', 'a', 4), _review('2', 'b', 5))
+    result = data.query_many('reviews', ('1', 'review'), ('2', '*'), ('*', 'review'), ('3', 'review'))
+    assert result[('1', 'review')] == [_review('1', 'a', 4)]
+    assert result[('2', '*')] == [_review('2', 'b', 5)]
+    assert len(result[('*', 'review')]) == 2
+    assert result[('3', 'review')] == []
+
+
+def test_query_many_from_an_executor_thread():
+    with ThreadPoolExecutor(max_workers=1, initializer=mark_worker_thread) as executor:
+        data = LocalTableData(executor=executor)
+        data.insert('reviews', _review('1', 'a', 4), _review('2', 'b', 5))
+        future = executor.submit(data.query_many, 'reviews', ('1', 'review'), ('2', 'review'))
+        assert len(future.result(timeout=10)) == 2
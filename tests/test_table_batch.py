@@ -0,0 +1,90 @@
+from concurrent.futures import Executor, ThreadPoolExecutor
+
+import pytest
+
+from azure.cloudmachine._client import (
+    _MAX_BATCH_OPERATIONS,
+    LocalTableData,
+    TableBatchError,
+    _split_transactions,
+)
+from azure.cloudmachine._httpclient._base import fan_out_executor, mark_worker_thread, run_as_worker
+
+
+def _entity(pk, rk, **properties):
+    return {'PartitionKey': pk, 'RowKey': str(rk), **properties}
+
+
+def test_split_by_partition():
+    batch = [('create', _entity(pk, rk)) for rk in range(3) for pk in 'ab']
+    transactions = list(_split_transactions(batch))
+    assert [[o[1]['PartitionKey'] for o in t] for t in transactions] == [['a'] * 3, ['b'] * 3]
+
+
+def test_split_by_operation_count():
+    batch = [('upsert', _entity('a', rk), {'mode': 'merge'}) for rk in range(_MAX_BATCH_OPERATIONS * 2 + 1)]
+    transactions = list(_split_transactions(batch))
+    assert [len(t) for t in transactions] == [_MAX_BATCH_OPERATIONS, _MAX_BATCH_OPERATIONS, 1]
+
+
+def test_split_by_payload_size():
+    batch = [('create', _entity('a', rk, text='x' * 1024 * 1024)) for rk in range(5)]
+    transactions = list(_split_transactions(batch))
+    assert [len(t) for t in transactions] == [3, 2]
+
+
+def test_failed_transactions_are_reported():
+    data = LocalTableData()
+    data.insert('items', _entity('a', 1))
+    with pytest.raises(TableBatchError) as error:
+        data.insert('items', _entity('a', 1), _entity('a', 2), _entity('b', 1))
+    assert [e['PartitionKey'] for e in error.value.succeeded] == ['b']
+    assert sorted(e['RowKey'] for e, _ in error.value.failed) == ['1', '2']
+    # The failed transaction is atomic, so its other entity wasn't written.
+    assert list(data.query('items', 'a', '*')) == [_entity('a', 1)]
+    assert list(data.query('items', 'b', '*')) == [_entity('b', 1)]
+
+
+def test_batches_fan_out_on_the_executor():
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        data = LocalTableData(executor=executor)
+        data.insert('items', *(_entity(pk, 1) for pk in 'abcd'))
+        assert len(list(data.list('items'))) == 4
+
+
+def test_batch_written_from_an_executor_thread():
+    # Waiting on transactions queued behind the calling task would deadlock a single worker.
+    with ThreadPoolExecutor(max_workers=1, initializer=mark_worker_thread) as executor:
+        data = LocalTableData(executor=executor)
+        future = executor.submit(data.insert, 'items', *(_entity(pk, 1) for pk in 'abcd'))
+        future.result(timeout=10)
+        assert len(list(data.list('items'))) == 4
+
+
+def test_marked_workers_run_fan_outs_inline():
+    with ThreadPoolExecutor(max_workers=1, initializer=mark_worker_thread) as executor:
+        assert executor.submit(fan_out_executor, executor).result(timeout=10) is None
+        assert fan_out_executor(executor) is executor
+    assert fan_out_executor(None) is None
+
+
+def test_fanned_out_tasks_run_nested_fan_outs_inline():
+    class _Executor(Executor):
+        # Not a ThreadPoolExecutor, so only the marks tell its workers apart.
+        def __init__(self):
+            self._pool = ThreadPoolExecutor(max_workers=1)
+
+        def submit(self, fn, /, *args, **kwargs):
+            return self._pool.submit(fn, *args, **kwargs)
+
+        def shutdown(self, wait=True, **kwargs):
+            self._pool.shutdown(wait)
+
+    with _Executor() as executor:
+        assert executor.submit(fan_out_executor, executor).result(timeout=10) is executor
+        assert executor.submit(run_as_worker, fan_out_executor, executor).result(timeout=10) is None
+        # The mark only lasts for the task.
+        assert executor.submit(fan_out_executor, executor).result(timeout=10) is executor
+        data = LocalTableData(executor=executor)
+        data.insert('items', *(_entity(pk, 1) for pk in 'abcd'))
+        assert len(list(data.list('items'))) == 4
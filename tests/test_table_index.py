@@ -0,0 +1,127 @@
+from typing import ClassVar, List, Literal
+
+import pytest
+from pydantic import AliasChoices, BaseModel, Field
+
+from azure.cloudmachine._client import _INDEX_TABLE, LocalTableData
+
+
+class Review(BaseModel):
+    __table__: Literal['reviews'] = 'reviews'
+    __indexes__: ClassVar[List[str]] = ['user_name']
+    id: str = Field(serialization_alias='PartitionKey', validation_alias=AliasChoices('id', 'PartitionKey'))
+    restaurant: str = Field(serialization_alias='RowKey', validation_alias=AliasChoices('restaurant', 'RowKey'))
+    user_name: str
+    rating: int
+
+
+@pytest.fixture
+def data():
+    data = LocalTableData()
+    yield data
+    data.close()
+
+
+def _by_user(data, user_name):
+    return sorted(r.id for r in data.query(Review, query="user_name eq @user", parameters={'user': user_name}))
+
+
+def _index_rows(data):
+    return sorted(
+        (e['PartitionKey'], e['partition'])
+        for e in data.list(_INDEX_TABLE) if 'partition' in e
+    )
+
+
+def _no_scans(data, monkeypatch):
+    table = data._get_table_client('reviews')
+    query_entities = table.query_entities
+
+    def _point_queries(query, **kwargs):
+        assert query.startswith("PartitionKey eq"), "The table was scanned."
+        return query_entities(query, **kwargs)
+
+    monkeypatch.setattr(table, 'query_entities', _point_queries)
+
+
+def test_unbuilt_index_falls_back_to_a_scan(data):
+    # Written before the model declared an index.
+    data.insert('reviews', {'PartitionKey': '1', 'RowKey': 'a', 'user_name': 'ann', 'rating': 4})
+    data.insert(Review(id='2', restaurant='a', user_name='ann', rating=5))
+    assert _by_user(data, 'ann') == ['1', '2']
+
+
+def test_built_index_is_queried(data, monkeypatch):
+    data.insert('reviews', {'PartitionKey': '1', 'RowKey': 'a', 'user_name': 'ann', 'rating': 4})
+    data.add_index(Review, fields=['user_name'], rebuild=True)
+    data.insert(Review(id='2', restaurant='a', user_name='ann', rating=5))
+    _no_scans(data, monkeypatch)
+    assert _by_user(data, 'ann') == ['1', '2']
+
+
+def test_built_index_is_used_by_new_clients(tmp_path):
+    path = str(tmp_path / 'tables.db')
+    data = LocalTableData(path)
+    data.insert(Review(id='1', restaurant='a', user_name='ann', rating=4))
+    data.add_index(Review, fields=['user_name'], rebuild=True)
+    data.close()
+
+    data = LocalTableData(path)
+    data.add_index(Review, fields=['user_name'])
+    assert data._match_index('reviews', "user_name eq 'ann'", None) == ('user_name', 'ann')
+    data.close()
+
+
+def test_index_rows_follow_writes(data):
+    data.add_index(Review, fields=['user_name'], rebuild=True)
+    data.insert(Review(id='1', restaurant='a', user_name='ann', rating=4))
+    assert _index_rows(data) == [('reviews:user_name:ann', '1')]
+
+    data.upsert(Review(id='1', restaurant='a', user_name='bob', rating=4))
+    assert _index_rows(data) == [('reviews:user_name:bob', '1')]
+    assert _by_user(data, 'ann') == []
+    assert _by_user(data, 'bob') == ['1']
+
+    # A merge that doesn't specify the indexed column leaves it indexed.
+    data.upsert('reviews', {'PartitionKey': '1', 'RowKey': 'a', 'rating': 2}, overwrite=False)
+    assert _index_rows(data) == [('reviews:user_name:bob', '1')]
+
+    data.delete('reviews', {'PartitionKey': '1', 'RowKey': 'a'})
+    assert _index_rows(data) == []
+
+
+def test_rebuild_removes_stale_rows(data):
+    data.add_index('reviews', fields=['user_name'])
+    data.insert('reviews', {'PartitionKey': '1', 'RowKey': 'a', 'user_name': 'ann'})
+    data._get_table_client('reviews').upsert_entity(
+        {'PartitionKey': '1', 'RowKey': 'a', 'user_name': 'bob'}, mode='replace'
+    )
+    data.add_index('reviews', fields=['user_name'], rebuild=True)
+    assert _index_rows(data) == [('reviews:user_name:bob', '1')]
+
+
+def test_prefetch_only_for_writes_that_touch_indexed_columns(data, monkeypatch):
+    data.add_index('reviews', fields=['user_name'], rebuild=True)
+    data.insert('reviews', {'PartitionKey': '1', 'RowKey': 'a', 'user_name': 'ann', 'rating': 1})
+    lookups = []
+    query_many = data.query_many
+
+    def _query_many(table, *keys, select=None):
+        lookups.append((keys, select))
+        return query_many(table, *keys, select=select)
+
+    monkeypatch.setattr(data, 'query_many', _query_many)
+    data.upsert('reviews', {'PartitionKey': '1', 'RowKey': 'a', 'rating': 2}, overwrite=False)
+    assert lookups == []
+    data.upsert('reviews', {'PartitionKey': '1', 'RowKey': 'a', 'user_name': 'bob'}, overwrite=False)
+    assert lookups == [((('1', 'a'),), ['PartitionKey', 'RowKey', 'user_name'])]
+
+
+def test_indexed_queries_skip_validation_when_asked(data):
+    data.add_index(Review, fields=['user_name'], rebuild=True)
+    data.insert('reviews', {'PartitionKey': '1', 'RowKey': 'a', 'user_name': 'ann', 'rating': 'great'})
+    assert data._match_index('reviews', "user_name eq 'ann'", None) == ('user_name', 'ann')
+    rows = list(data.query(Review, query="user_name eq 'ann'", validate=False))
+    assert [r.rating for r in rows] == ['great']
+    with pytest.raises(ValueError):
+        list(data.query(Review, query="user_name eq 'ann'"))
@@ -0,0 +1,48 @@
+from typing import Literal
+
+import pytest
+from pydantic import AliasChoices, BaseModel, Field
+
+from azure.cloudmachine._client import LocalTableData, _build_select
+
+
+class Item(BaseModel):
+    __table__: Literal['items'] = 'items'
+    id: str = Field(serialization_alias='PartitionKey', validation_alias=AliasChoices('id', 'PartitionKey'))
+    name: str = Field(serialization_alias='RowKey', validation_alias=AliasChoices('name', 'RowKey'))
+    price: float
+
+
+@pytest.fixture
+def data():
+    data = LocalTableData()
+    data.insert('items', {'PartitionKey': 'a', 'RowKey': 'pen', 'price': 1.5, 'notes': 'blue'})
+    yield data
+    data.close()
+
+
+def test_build_select():
+    assert _build_select('items', None) is None
+    assert _build_select('items', 'price') == ['price']
+    assert _build_select(Item, None) == ['PartitionKey', 'RowKey', 'price']
+    assert _build_select(Item, '*') is None
+
+
+def test_table_reads_return_full_entities(data):
+    assert list(data.list('items')) == [{'PartitionKey': 'a', 'RowKey': 'pen', 'price': 1.5, 'notes': 'blue'}]
+
+
+def test_select_projects_columns(data):
+    assert list(data.list('items', select=['price'])) == [{'price': 1.5}]
+    assert list(data.query('items', 'a', 'pen', select='notes')) == [{'notes': 'blue'}]
+    assert list(data.query('items', query="price gt 1", select=['RowKey'])) == [{'RowKey': 'pen'}]
+
+
+def test_models_fetch_their_columns(data):
+    assert list(data.list(Item)) == [Item(id='a', name='pen', price=1.5)]
+    assert list(data.query(Item, 'a', '*')) == [Item(id='a', name='pen', price=1.5)]
+
+
+def test_pagesize(data):
+    data.insert('items', *({'PartitionKey': 'b', 'RowKey': str(n)} for n in range(5)))
+    assert len(list(data.query('items', 'b', '*', pagesize=2))) == 5
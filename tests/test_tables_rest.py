@@ -0,0 +1,125 @@
+import base64
+import hashlib
+import hmac
+import math
+import time
+
+import pytest
+from azure.core.credentials import AccessToken, AzureNamedKeyCredential, AzureSasCredential
+from azure.core.pipeline.transport import HttpTransport
+from azure.core.rest import HttpRequest
+
+from azure.cloudmachine._client import CloudMachineTableData
+from azure.cloudmachine._httpclient._storage import CloudMachineStorage
+from azure.cloudmachine._httpclient._tables import (
+    deserialize_entity,
+    format_filter,
+    serialize_entity,
+)
+
+
+class _Sent(Exception):
+    pass
+
+
+class _CapturingTransport(HttpTransport):
+    def __init__(self):
+        self.requests = []
+
+    def send(self, request, **kwargs):
+        self.requests.append(request)
+        raise _Sent()
+
+    def open(self):
+        pass
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+
+class _TokenCredential:
+    def get_token(self, *scopes, **kwargs):
+        return AccessToken("token", int(time.time()) + 3600)
+
+
+def _send(data: CloudMachineTableData) -> HttpRequest:
+    transport = data._config.transport
+    with pytest.raises(_Sent):
+        data._client.send_request(HttpRequest('GET', f"{data.endpoint}/Tables('reviews')"))
+    return transport.requests[-1]
+
+
+def _table_data(credential) -> CloudMachineTableData:
+    return CloudMachineTableData(
+        'https://account.table.core.windows.net',
+        credential,
+        transport=_CapturingTransport(),
+        scope='https://storage.azure.com/.default',
+        retry_total=0,
+    )
+
+
+def test_format_filter_substitutes_in_a_single_pass():
+    query = format_filter(
+        "id eq @id and other eq @id2 and name eq @name",
+        {'id': 'a@id2', 'id2': 2, 'name': "o'neil"}
+    )
+    assert query == "id eq 'a@id2' and other eq 2 and name eq 'o''neil'"
+
+
+def test_format_filter_leaves_literals_and_unknown_names():
+    query = format_filter("email eq 'me@id.com' and id eq @id and x eq @missing", {'id': 1})
+    assert query == "email eq 'me@id.com' and id eq 1 and x eq @missing"
+
+
+@pytest.mark.parametrize("value, serialized", [
+    (float('nan'), "NaN"),
+    (float('inf'), "Infinity"),
+    (float('-inf'), "-Infinity"),
+    (1.5, 1.5),
+])
+def test_serialize_special_doubles(value, serialized):
+    body = serialize_entity({'PartitionKey': 'p', 'RowKey': 'r', 'score': value})
+    assert body['score'] == serialized
+    assert body['score@odata.type'] == "Edm.Double"
+    roundtrip = deserialize_entity(body)['score']
+    assert roundtrip == value or (math.isnan(roundtrip) and math.isnan(value))
+
+
+def test_requests_are_dated():
+    request = _send(_table_data(_TokenCredential()))
+    assert request.headers['x-ms-date']
+    assert request.headers['Authorization'] == "Bearer token"
+
+
+def test_shared_key_lite_signature():
+    key = base64.b64encode(b"secret").decode('utf-8')
+    request = _send(_table_data(AzureNamedKeyCredential('account', key)))
+    string_to_sign = f"{request.headers['x-ms-date']}\n/account/Tables('reviews')"
+    expected = base64.b64encode(
+        hmac.new(b"secret", string_to_sign.encode('utf-8'), hashlib.sha256).digest()
+    ).decode('utf-8')
+    assert request.headers['Authorization'] == f"SharedKeyLite account:{expected}"
+
+
+def test_sas_credential():
+    request = _send(_table_data(AzureSasCredential('sv=2019&sig=abc')))
+    assert 'sig=abc' in request.url
+    assert 'Authorization' not in request.headers
+
+
+def test_account_key_unsupported_by_other_clients():
+    with pytest.raises(TypeError, match="account key"):
+        CloudMachineStorage(
+            'https://account.blob.core.windows.net',
+            'account',
+            AzureNamedKeyCredential('account', 'a2V5'),
+            container_name='default',
+            scope='https://storage.azure.com/.default',
+        )
@@ -0,0 +1,103 @@
+import pytest
+from azure.core.pipeline.transport import RequestsTransport
+
+from azure.cloudmachine._client import CloudMachineClient
+from azure.cloudmachine._httpclient._transport import build_async_transport, build_transport
+from azure.cloudmachine._resources._client_settings import _convert_sync_transport
+
+
+def _adapter(transport):
+    return transport.session.get_adapter('https://account.blob.core.windows.net')
+
+
+def test_requests_transport():
+    transport = build_transport('Requests', max_workers=4)
+    assert isinstance(transport, RequestsTransport)
+    adapter = _adapter(transport)
+    # One connection per executor thread, and one for the calling thread.
+    assert (adapter._pool_connections, adapter._pool_maxsize) == (25, 5)
+    assert transport.session.get_adapter('http://127.0.0.1') is adapter
+    assert transport.session.headers['Connection'] == 'keep-alive'
+    transport.close()
+
+
+def test_requests_transport_options():
+    transport = build_transport(
+        'requests',
+        max_workers=4,
+        per_host_concurrency=2,
+        pool_connections=3,
+        keep_alive=False
+    )
+    adapter = _adapter(transport)
+    assert (adapter._pool_connections, adapter._pool_maxsize) == (3, 2)
+    assert transport.session.headers['Connection'] == 'close'
+    transport.close()
+
+
+def test_httpx_transport():
+    httpx = pytest.importorskip('httpx')
+    experimental = pytest.importorskip('azure.core.experimental.transport')
+    transport = build_transport('httpx', max_workers=4, keep_alive_timeout=30)
+    assert isinstance(transport, experimental.HttpXTransport)
+    assert isinstance(transport.client, httpx.Client)
+    transport.close()
+
+
+@pytest.mark.parametrize("name, message", [
+    ('curl', "Unexpected transport type: 'curl'."),
+    ('aiohttp', "'aiohttp' is an async transport, use 'build_async_transport' to build it."),
+])
+def test_invalid_transports(name, message):
+    with pytest.raises(ValueError) as error:
+        build_transport(name)
+    assert str(error.value) == message
+
+
+@pytest.mark.parametrize("name, message", [
+    ('curl', "Unexpected transport type: 'curl'."),
+    ('requests', "'requests' is a sync transport, use 'build_transport' to build it."),
+])
+def test_invalid_async_transports(name, message):
+    with pytest.raises(ValueError) as error:
+        build_async_transport(name)
+    assert str(error.value) == message
+
+
+def test_convert_sync_transport():
+    transport = RequestsTransport()
+    assert _convert_sync_transport(transport) is transport
+    assert isinstance(_convert_sync_transport('requests'), RequestsTransport)
+    assert isinstance(_convert_sync_transport(RequestsTransport), RequestsTransport)
+    with pytest.raises(ValueError):
+        _convert_sync_transport('curl')
+    with pytest.raises(ValueError):
+        _convert_sync_transport(42)
+
+
+def test_convert_sync_transport_httpx():
+    pytest.importorskip('httpx')
+    experimental = pytest.importorskip('azure.core.experimental.transport')
+    assert isinstance(_convert_sync_transport('httpx'), experimental.HttpXTransport)
+
+
+def test_shared_transport_options(monkeypatch):
+    monkeypatch.delenv('AZURE_SDK_TRANSPORT', raising=False)
+    monkeypatch.setenv('AZURE_CLOUDMACHINE_TRANSPORT_OPTIONS', '{"per_host_concurrency": 3, "keep_alive": false}')
+    client = CloudMachineClient(data='local', event_listener=False, max_workers=2)
+    transport = client.http_transport._transport
+    assert isinstance(transport, RequestsTransport)
+    assert _adapter(transport)._pool_maxsize == 3
+    assert transport.session.headers['Connection'] == 'close'
+    client.close()
+    transport.close()
+
+
+def test_shared_transport_is_sized_for_the_executor(monkeypatch):
+    monkeypatch.delenv('AZURE_SDK_TRANSPORT', raising=False)
+    monkeypatch.delenv('AZURE_CLOUDMACHINE_TRANSPORT_OPTIONS', raising=False)
+    client = CloudMachineClient(data='local', event_listener=False, max_workers=6)
+    transport = client.http_transport._transport
+    assert _adapter(transport)._pool_maxsize == 7
+    client.close()
+    transport.close()